@@ -1,22 +1,52 @@
 import abc
 import logging
+import sys
+import time
+from collections.abc import Sequence
+from contextlib import contextmanager
 from enum import Flag
 
 from PySide6.QtCore import QCoreApplication
 from PySide6.QtWidgets import QApplication
 
+from applicationframework.handles import from_handle, ref, sizeof, to_handle
+
 
 logger = logging.getLogger(__name__)
 
 
+def union_flags(a: Flag | None, b: Flag | None) -> Flag | None:
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return a | b
+
+
 class Base(metaclass=abc.ABCMeta):
 
+    __slots__ = ('flags',)
+
+    spilled = False
+
     def __init__(self, flags: Flag | None = None):
         self.flags = flags
 
     def __call__(self):
         return self.redo()
 
+    def __getstate__(self) -> dict:
+        state = dict(getattr(self, '__dict__', {}))
+        for cls in type(self).__mro__:
+            for name in getattr(cls, '__slots__', ()):
+                if hasattr(self, name):
+                    state[name] = getattr(self, name)
+        return state
+
+    def __setstate__(self, state: dict):
+        for name, value in state.items():
+            setattr(self, name, value)
+
     def app(self) -> QCoreApplication:
         return QApplication.instance()
 
@@ -31,9 +61,61 @@ class Base(metaclass=abc.ABCMeta):
     def destroy(self):
         ...
 
+    def size(self) -> int:
+        """
+        Return an estimate of the memory held by this action in bytes. Used by
+        the manager to enforce its history budget.
+
+        """
+        return sys.getsizeof(self)
+
+    def references(self) -> list:
+        """
+        Return the live objects this action edits. These must keep their
+        identity if the action is serialised, eg to an undo journal.
+
+        """
+        return []
+
+    def touched(self) -> list[tuple[Sequence, str | None]]:
+        """
+        Return (objects, field name) pairs this action changes, used to bump
+        the document's generation counters. A name of None means the field is
+        unknown.
+
+        """
+        return [(self.references(), None)]
+
+    def load(self) -> 'Base':
+        """Return the resident action. Overridden by spilled placeholders."""
+        return self
+
+    def action_type(self) -> type:
+        """Return the class of the resident action, eg for display."""
+        return type(self)
+
+    def can_merge(self, other: 'Base') -> bool:
+        """
+        Return True if the given action, pushed straight after this one, can be
+        collapsed into it.
+
+        """
+        return False
+
+    def merge(self, other: 'Base') -> bool:
+        """
+        Collapse the given action into this one. The original old value is kept
+        while the new value is taken from the other action. Returns False if
+        the action couldn't be merged, in which case it's pushed as normal.
+
+        """
+        return False
+
 
 class Composite(Base):
 
+    __slots__ = ('actions',)
+
     def __init__(self, actions: list[Base], **kwargs):
         super().__init__(**kwargs)
 
@@ -53,101 +135,612 @@ class Composite(Base):
         for action in self.actions:
             action.destroy()
 
+    def references(self) -> list:
+        return [obj for action in self.actions for obj in action.references()]
+
+    def touched(self) -> list[tuple[Sequence, str | None]]:
+        return [item for action in self.actions for item in action.touched()]
+
+    def size(self) -> int:
+        return (
+            super().size() +
+            sys.getsizeof(self.actions) +
+            sum(action.size() for action in self.actions)
+        )
+
 
 class Edit(Base):
 
+    __slots__ = ('_ref',)
+
     def __init__(self, obj, **kwargs):
         super().__init__(**kwargs)
 
-        # TODO: Maybe don't use weak ref, as certain actions that remove an
-        # object (and thus result in it being garbage collected) are never
-        # retrievable.
-        #self._ref = weakref.ref(obj)
+        # The edited object is weakly referenced where possible. Actions that
+        # remove an object hold it as a value, so an object that is only
+        # reachable through edits in the history is no longer in the document.
         self.obj = obj
 
+    def __getstate__(self) -> dict:
+        state = super().__getstate__()
+        state['obj'] = state.pop('_ref')()
+        return state
+
+    @property
+    def obj(self):
+        return self._ref()
+
+    @obj.setter
+    def obj(self, obj):
+        self._ref = ref(obj)
+
+    def references(self) -> list:
+        return [self.obj]
+
 
 class SetAttribute(Edit):
 
+    __slots__ = ('name', 'value', 'old_value')
+
     def __init__(self, name: str, value, *args, **kwargs):
         super().__init__(*args,  **kwargs)
         self.name = name
-        self.value = value
-        self.old_value = getattr(self.obj, name)
+        self.value = to_handle(value)
+        self.old_value = to_handle(getattr(self.obj, name))
 
     def undo(self):
-        setattr(self.obj, self.name, self.old_value)
+        obj = self.obj
+        if obj is not None:
+            setattr(obj, self.name, from_handle(self.old_value))
         return self.flags
 
     def redo(self):
-        setattr(self.obj, self.name, self.value)
+        obj = self.obj
+        if obj is not None:
+            setattr(obj, self.name, from_handle(self.value))
         return self.flags
 
+    def size(self) -> int:
+        return super().size() + sizeof(self.value) + sizeof(self.old_value)
+
+    def touched(self) -> list[tuple[Sequence, str | None]]:
+        return [((self.obj,), self.name)]
+
+    def can_merge(self, other: Base) -> bool:
+        return (
+            type(other) is type(self) and
+            other.obj is self.obj and
+            other.name == self.name and
+            other.flags == self.flags
+        )
+
+    def merge(self, other: 'SetAttribute') -> bool:
+        self.value = other.value
+        return True
+
 
-class SetAttributes(Composite):
+class SetAttributes(Base):
+
+    """
+    Sets the same attribute to the same value on many objects. Objects and
+    their old values are stored in parallel tuples rather than as one child
+    action per object. Objects are referenced the same way as Edit.obj.
+
+    """
+
+    __slots__ = ('name', 'value', '_refs', 'old_values')
 
     def __init__(self, name: str, value, *objs, **kwargs):
-        actions = [SetAttribute(name, value, obj) for obj in objs]
-        super().__init__(actions, **kwargs)
+        super().__init__(**kwargs)
+        self.name = name
+        self.value = to_handle(value)
+        self.objs = objs
+        self.old_values = tuple(to_handle(getattr(obj, name)) for obj in objs)
+
+    def __getstate__(self) -> dict:
+        state = super().__getstate__()
+        state['objs'] = tuple(obj_ref() for obj_ref in state.pop('_refs'))
+        return state
+
+    @property
+    def objs(self) -> tuple:
+        return tuple(obj_ref() for obj_ref in self._refs)
+
+    @objs.setter
+    def objs(self, objs):
+        self._refs = tuple(ref(obj) for obj in objs)
+
+    def undo(self):
+        name = self.name
+        for obj_ref, old_value in zip(self._refs, self.old_values):
+            obj = obj_ref()
+            if obj is not None:
+                setattr(obj, name, from_handle(old_value))
+        return self.flags
+
+    def redo(self):
+        name, value = self.name, from_handle(self.value)
+        for obj_ref in self._refs:
+            obj = obj_ref()
+            if obj is not None:
+                setattr(obj, name, value)
+        return self.flags
+
+    def references(self) -> list:
+        return list(self.objs)
+
+    def touched(self) -> list[tuple[Sequence, str | None]]:
+        return [(self.objs, self.name)]
+
+    def size(self) -> int:
+        return (
+            super().size() +
+            sys.getsizeof(self._refs) +
+            sizeof(self.value) +
+            sizeof(self.old_values)
+        )
+
+    def can_merge(self, other: Base) -> bool:
+        return (
+            type(other) is type(self) and
+            other.name == self.name and
+            other.flags == self.flags and
+            len(other._refs) == len(self._refs) and
+            all(a() is b() for a, b in zip(self._refs, other._refs))
+        )
+
+    def merge(self, other: 'SetAttributes') -> bool:
+        self.value = other.value
+        return True
 
 
 class SetKey(Edit):
 
+    __slots__ = ('key', 'value', 'old_value')
+
     def __init__(self, key, value, *args):
         super().__init__(*args)
         self.key = key
-        self.value = value
+        self.value = to_handle(value)
 
         # TODO: use old_in to potentially delete a key...?
-        self.old_value = self.obj.get(key)
+        self.old_value = to_handle(self.obj.get(key))
 
     def undo(self):
-        self.obj[self.key] = self.old_value
+        obj = self.obj
+        if obj is not None:
+            obj[self.key] = from_handle(self.old_value)
         return self.flags
 
     def redo(self):
-        self.obj[self.key] = self.value
+        obj = self.obj
+        if obj is not None:
+            obj[self.key] = from_handle(self.value)
         return self.flags
 
+    def size(self) -> int:
+        return super().size() + sizeof(self.value) + sizeof(self.old_value)
+
 
 class Manager:
 
-    def __init__(self):
+    """
+    Maintains the undo and redo queues. The history can optionally be bounded
+    by a maximum number of undo actions and / or by an estimate of the memory
+    held by the actions in both queues. When either limit is exceeded the
+    oldest undo actions are evicted and destroyed.
+
+    Consecutive pushes of mergeable actions, eg a stream of SetAttribute
+    actions for the same object and attribute, are collapsed into a single
+    undo entry if they occur within merge_window seconds of each other or
+    inside an interaction() scope.
+
+    If a journal is given, undo actions older than the max_resident most
+    recent ones are spilled to it and reloaded when undo reaches them.
+
+    If a recovery log is set, every push, undo and redo is also recorded to it
+    so that unsaved changes can be replayed after a crash.
+
+    If a profiler is set, the time spent executing, undoing and redoing each
+    action class and in the resulting document updates is recorded to it.
+    Execution is only timed for actions run through execute(), not for those
+    pushed and then called directly.
+
+    """
+
+    def __init__(
+        self,
+        max_depth: int | None = None,
+        max_bytes: int | None = None,
+        merge_window: float | None = None,
+        journal=None,
+        max_resident: int | None = None,
+    ):
         self.undos = []
         self.redos = []
+        self.max_depth = max_depth
+        self.max_bytes = max_bytes
+        self.merge_window = merge_window
+        self.journal = journal
+        self.max_resident = max_resident
+        self.recovery_log = None
+        self.profiler = None
+        self._sizes = {}
+        self._interaction_depth = 0
+        self._last_pushed = None
+        self._last_push_time = 0.0
+        self._transactions = []
+        self._deferred_flags = None
+        self._deferred_dirty = False
 
     def app(self) -> QCoreApplication:
         return QApplication.instance()
 
+    def _track(self, action: Base):
+        self._sizes[id(action)] = action.size()
+
+    def _untrack(self, action: Base):
+        self._sizes.pop(id(action), None)
+
+    def _destroy(self, action: Base):
+        self._untrack(action)
+        action.destroy()
+
+    def _record(self, op: str, action: Base | None = None):
+        if self.recovery_log is not None:
+            self.recovery_log.record(op, action)
+
+    def _bump(self, action: Base):
+        doc = getattr(self.app(), 'doc', None)
+        if doc is not None:
+            doc.bump_many(action.touched())
+
+    def _run(self, action: Base, op: str) -> Flag | None:
+        fn = action.redo if op == 'execute' else getattr(action, op)
+        if self.profiler is None:
+            flags = fn()
+        else:
+            with self.profiler.timer(type(action).__name__, op):
+                flags = fn()
+        self._bump(action)
+        return flags
+
+    def _updated(self, flags: Flag | None, name: str, dirty: bool = True):
+        if self.profiler is None:
+            self.app().doc.updated(flags, dirty=dirty)
+            return
+        with self.profiler.timer(name, 'update'):
+            self.app().doc.updated(flags, dirty=dirty)
+        self._sample()
+
+    def _sample(self):
+        if self.profiler is not None:
+            self.profiler.sample(len(self.undos), len(self.redos), self.memory_usage())
+
+    def memory_usage(self) -> int:
+        """Return the estimated number of bytes held by the undo history."""
+        return sum(self._sizes.values())
+
+    def spill(self):
+        """
+        Write undo actions older than the max_resident most recent ones to the
+        journal, replacing them with lightweight placeholders.
+
+        """
+        if self.journal is None or self.max_resident is None:
+            return
+        for i in range(len(self.undos) - self.max_resident - 1, -1, -1):
+            action = self.undos[i]
+            if action.spilled:
+                break
+            try:
+                entry = self.journal.write(action)
+            except Exception as e:
+                logger.error(f'Failed to spill action to journal: {action} error: {e}')
+                continue
+            self._untrack(action)
+            self.undos[i] = entry
+            self._track(entry)
+
+    def evict(self):
+        """
+        Destroy the oldest undo actions until the history fits in the budget.
+        The most recent action is always kept so it can be undone. Redo actions
+        are never evicted as they are cleared on the next push anyway.
+
+        """
+        num_evict = 0
+        if self.max_depth is not None:
+            num_evict = max(0, len(self.undos) - self.max_depth)
+        if self.max_bytes is not None:
+            usage = self.memory_usage()
+            for action in self.undos[:num_evict]:
+                usage -= self._sizes.get(id(action), 0)
+            while usage > self.max_bytes and num_evict < len(self.undos) - 1:
+                usage -= self._sizes.get(id(self.undos[num_evict]), 0)
+                num_evict += 1
+        if not num_evict:
+            return
+        logger.debug(f'Evicting {num_evict} actions from undo queue')
+        evicted = self.undos[:num_evict]
+        del self.undos[:num_evict]
+        for action in evicted:
+            self._destroy(action)
+
+    @property
+    def index(self) -> int:
+        """
+        Return the current position in the history, ie the number of actions
+        that are currently applied.
+
+        """
+        return len(self.undos)
+
+    def history(self) -> 'History':
+        """Return a live, read-only view over the combined history."""
+        return History(self)
+
     def undo(self):
         if not self.undos:
             logger.warning('Undo queue is empty')
         else:
-            action = self.undos.pop()
-            self.redos.append(action)
-            self.app().doc.updated(action.undo())
+            self.undo_to(self.index - 1)
 
     def redo(self):
         if not self.redos:
             logger.warning('Redo queue is empty')
         else:
-            action = self.redos.pop()
-            self.undos.append(action)
-            self.app().doc.updated(action.redo())
+            self.redo_to(self.index + 1)
+
+    def undo_once(self) -> Flag | None:
+        """
+        Undo the most recent action without emitting an update. Returns the
+        action's flags.
+
+        """
+        action = self.undos.pop()
+        if action.spilled:
+            entry, action = action, action.load()
+            self._destroy(entry)
+            self._track(action)
+        self.redos.append(action)
+        self._record('undo')
+        return self._run(action, 'undo')
+
+    def redo_once(self) -> Flag | None:
+        """
+        Redo the most recently undone action without emitting an update.
+        Returns the action's flags.
+
+        """
+        action = self.redos.pop()
+        self.undos.append(action)
+        self._record('redo')
+        return self._run(action, 'redo')
+
+    def undo_to(self, index: int):
+        """
+        Undo actions until the history position equals the given index. All
+        actions are applied back to back and a single update is emitted with
+        the union of their flags.
+
+        """
+        if not 0 <= index <= self.index:
+            raise IndexError(f'Undo index out of range: {index}')
+        if index == self.index:
+            return
+        flags = None
+        name = self.undos[-1].action_type().__name__ if self.index - index == 1 else 'multiple'
+        while len(self.undos) > index:
+            flags = union_flags(flags, self.undo_once())
+        self._updated(flags, name)
+
+    def redo_to(self, index: int):
+        """
+        Redo actions until the history position equals the given index. All
+        actions are applied back to back and a single update is emitted with
+        the union of their flags.
+
+        """
+        if not self.index <= index <= self.index + len(self.redos):
+            raise IndexError(f'Redo index out of range: {index}')
+        if index == self.index:
+            return
+        flags = None
+        name = self.redos[-1].action_type().__name__ if index - self.index == 1 else 'multiple'
+        while len(self.undos) < index:
+            flags = union_flags(flags, self.redo_once())
+        self._updated(flags, name)
+
+    def go_to(self, index: int):
+        """Undo or redo to the given history position."""
+        if index < self.index:
+            self.undo_to(index)
+        else:
+            self.redo_to(index)
 
     def reset_undo(self):
         while self.undos:
             action = self.undos.pop()
-            action.destroy()
+            self._destroy(action)
 
     def reset_redo(self):
         while self.redos:
             action = self.redos.pop()
-            action.destroy()
+            self._destroy(action)
 
     def reset(self):
         self.reset_undo()
         self.reset_redo()
-
-    def push(self, action):
-        self.undos.append(action)
-        self.reset_redo()
+        if self.journal is not None:
+            self.journal.clear()
+
+    def take_history(self) -> tuple[list[Base], list[Base]]:
+        """
+        Remove and return the undo and redo actions without destroying them,
+        eg to store them elsewhere while their document is paged out.
+
+        """
+        undos, redos = self.undos, self.redos
+        self.undos, self.redos = [], []
+        for action in undos + redos:
+            self._untrack(action)
+        return undos, redos
+
+    def restore_history(self, undos: list[Base], redos: list[Base]):
+        """Replace the history with actions returned by take_history()."""
+        self.reset()
+        self.undos, self.redos = undos, redos
+        for action in undos + redos:
+            self._track(action)
+        self.spill()
+
+    @contextmanager
+    def interaction(self):
+        """
+        Context manager for a continuous user interaction, eg dragging a
+        gradient stop. Mergeable actions pushed inside the scope are collapsed
+        into a single undo entry.
+
+        """
+        if not self._interaction_depth:
+            self._last_pushed = None
+        self._interaction_depth += 1
+        try:
+            yield
+        finally:
+            self._interaction_depth -= 1
+            if not self._interaction_depth:
+                self._last_pushed = None
+
+    def in_transaction(self) -> bool:
+        return bool(self._transactions)
+
+    def defer_update(self, flags: Flag, dirty: bool) -> bool:
+        """
+        Called by the document before emitting an update. Returns True if the
+        update was swallowed by an open transaction, in which case it will be
+        merged into the single update emitted when the transaction commits.
+
+        """
+        if not self._transactions:
+            return False
+        self._deferred_flags = union_flags(self._deferred_flags, flags)
+        self._deferred_dirty |= dirty
+        return True
+
+    @contextmanager
+    def transaction(self, flags: Flag | None = None):
+        """
+        Context manager that groups all actions pushed inside it into a single
+        Composite action. Document updates are deferred until the outermost
+        transaction commits, at which point one update is emitted with the
+        union of the flags of all child actions. If an exception is raised the
+        child actions are undone and discarded.
+
+        """
+        composite = Composite([], flags=flags)
+        self._transactions.append(composite)
+        try:
+            yield composite
+        except BaseException:
+            self._transactions.pop()
+            logger.debug(f'Rolling back transaction of {len(composite.actions)} actions')
+            composite.undo()
+            self._bump(composite)
+            composite.destroy()
+            if not self._transactions:
+                self._deferred_flags = None
+                self._deferred_dirty = False
+            raise
+        self._transactions.pop()
+        for action in composite.actions:
+            composite.flags = union_flags(composite.flags, action.flags)
+        if composite.actions:
+            self.push(composite)
+        if self._transactions:
+            return
+
+        # Emit a single update for the outermost transaction.
+        deferred_flags = self._deferred_flags
+        update_flags = union_flags(composite.flags, deferred_flags)
+        dirty = self._deferred_dirty or bool(composite.actions)
+        self._deferred_flags = None
+        self._deferred_dirty = False
+        if composite.actions or deferred_flags is not None:
+            self._updated(update_flags, type(composite).__name__, dirty=dirty)
+
+    def _should_merge(self, action: Base, now: float) -> bool:
+        if (
+            self._last_pushed is None or
+            self.redos or
+            not self.undos or
+            self.undos[-1] is not self._last_pushed
+        ):
+            return False
+        if not self._interaction_depth and (
+            self.merge_window is None or
+            now - self._last_push_time > self.merge_window
+        ):
+            return False
+        return self._last_pushed.can_merge(action)
+
+    def push(self, action, merge: bool = True):
+        if self._transactions:
+            self._transactions[-1].actions.append(action)
+            return
+        now = time.monotonic()
+        if merge and self._should_merge(action, now) and self._last_pushed.merge(action):
+            logger.debug(f'Merged action: {action}')
+            self._track(self._last_pushed)
+            self._record('merge', action)
+            action.destroy()
+        else:
+            self.undos.append(action)
+            self.reset_redo()
+            self._track(action)
+            self._record('push', action)
+            self._last_pushed = action
+        self._last_push_time = now
+        self.spill()
+        self.evict()
+        self._sample()
+
+    def execute(self, action: Base):
+        """
+        Push the action, run it and emit an update with its flags. Inside a
+        transaction the update is deferred until the transaction commits.
+
+        """
+        self.push(action)
+        flags = self._run(action, 'execute')
+        self._updated(flags, type(action).__name__)
+
+
+class History(Sequence):
+
+    """
+    Read-only view over a manager's undo and redo queues, ordered from oldest
+    to newest. Indices below manager.index are applied actions, the rest are
+    actions that can be redone. The view does not copy the queues so it is
+    always current.
+
+    """
+
+    def __init__(self, manager: Manager):
+        self.manager = manager
+
+    def __len__(self):
+        return len(self.manager.undos) + len(self.manager.redos)
+
+    def __getitem__(self, index: int):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        num_undos = len(self.manager.undos)
+        if 0 <= index < num_undos:
+            return self.manager.undos[index]
+        elif num_undos <= index < len(self):
+            return self.manager.redos[num_undos - index - 1]
+        raise IndexError(f'History index out of range: {index}')
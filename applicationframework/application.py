@@ -1,5 +1,10 @@
+import inspect
+import logging
+import time
+import weakref
 from enum import Flag
 from pathlib import Path
+from typing import Callable
 
 from PySide6.QtCore import Signal
 from PySide6.QtGui import QIcon
@@ -8,10 +13,40 @@ from PySide6.QtWidgets import QApplication
 from applicationframework.actions import Manager as ActionManager
 from applicationframework.document import Document
 from applicationframework.preferencesmanager import PreferencesManager
+from applicationframework.profiler import Stats
+
+
+logger = logging.getLogger(__name__)
+
+
+class _Subscriber:
+
+    """
+    A subscribed handler. Bound methods are held weakly so that subscribing
+    doesn't keep their owner alive; other callables are held strongly.
+
+    """
+
+    __slots__ = ('ref', 'flags', 'name', 'stats')
+
+    def __init__(self, handler: Callable, flags: Flag | None):
+        if inspect.ismethod(handler):
+            self.ref = weakref.WeakMethod(handler)
+        else:
+            self.ref = lambda: handler
+        self.flags = flags
+        self.name = getattr(handler, '__qualname__', repr(handler))
+        self.stats = Stats()
 
 
 class Application(QApplication):
 
+    """
+    Listeners can either connect to the updated signal, which receives every
+    update, or subscribe() to the flags they care about.
+
+    """
+
     updated = Signal(Document, Flag)
 
     def __init__(self, organization: str, application: str, *args, **kwargs):
@@ -23,6 +58,69 @@ class Application(QApplication):
         self.doc = None
         self.action_manager = ActionManager()
         self.preferences_manager = PreferencesManager()
+        self.content_cache = None
+
+        self._subscribers: list[_Subscriber] = []
+        self.updated.connect(self._dispatch_updated)
+
+    def subscribe(self, handler: Callable[[Document, Flag], None], flags: Flag | None = None):
+        """
+        Call the handler with (doc, flags) when an update is emitted whose
+        flags intersect the given flags. If no flags are given the handler
+        receives every update. Bound methods are unsubscribed automatically
+        once their owner is garbage collected. Subscribing a handler again
+        replaces its flags and keeps its stats.
+
+        """
+        subscriber = self._find_subscriber(handler)
+        if subscriber is not None:
+            subscriber.flags = flags
+        else:
+            self._subscribers.append(_Subscriber(handler, flags))
+
+    def unsubscribe(self, handler: Callable[[Document, Flag], None]):
+        self._subscribers = [s for s in self._subscribers if s.ref() is not None and s.ref() != handler]
+
+    def _find_subscriber(self, handler: Callable) -> _Subscriber | None:
+        for subscriber in self._subscribers:
+            if subscriber.ref() == handler:
+                return subscriber
+        return None
+
+    def subscriber_report(self) -> list[dict]:
+        """Return the time spent in each subscriber, most expensive first."""
+        report = [
+            {
+                'handler': subscriber.name,
+                'mean': subscriber.stats.mean,
+                'count': subscriber.stats.count,
+                'total': subscriber.stats.total,
+                'max': subscriber.stats.max,
+            }
+            for subscriber in self._subscribers
+        ]
+        return sorted(report, key=lambda item: -item['total'])
+
+    def _dispatch_updated(self, doc: Document, flags: Flag):
+        dead = False
+        for subscriber in list(self._subscribers):
+            if subscriber.flags is not None and not flags & subscriber.flags:
+                continue
+            handler = subscriber.ref()
+            if handler is None:
+                dead = True
+                continue
+
+            # A failing handler is logged rather than raised so that the
+            # remaining subscribers still receive the update.
+            start = time.perf_counter()
+            try:
+                handler(doc, flags)
+            except Exception:
+                logger.exception(f'Subscriber failed: {subscriber.name}')
+            subscriber.stats.add(time.perf_counter() - start)
+        if dead:
+            self._subscribers = [s for s in self._subscribers if s.ref() is not None]
 
     @property
     def icons_path(self) -> Path:
@@ -0,0 +1,365 @@
+import dataclasses
+import lzma
+import struct
+import types
+import typing
+import zlib
+from enum import Enum
+from operator import attrgetter
+from typing import Any, Callable
+
+from PySide6.QtGui import QColor
+
+from applicationframework.contentbase import ContentBase
+from gradientwidget.widget import Gradient
+from propertygrid.types import FilePathQImage
+
+# noinspection PyUnresolvedReferences
+from __feature__ import snake_case
+
+
+MAGIC = b'QXBC'
+HEADER = struct.Struct('<4sBI')
+LENGTH = struct.Struct('<I')
+PRESENT = struct.Struct('<?')
+STOP = struct.Struct('<dI')
+
+NONE = 0
+ZLIB = 1
+LZMA = 2
+COMPRESSORS = {
+    None: (NONE, lambda data: data),
+    'zlib': (ZLIB, zlib.compress),
+    'lzma': (LZMA, lzma.compress),
+}
+DECOMPRESSORS = {
+    NONE: lambda data: data,
+    ZLIB: zlib.decompress,
+    LZMA: lzma.decompress,
+}
+
+# Encoders append bytes to a list, decoders take the payload and an offset and
+# return the value and the new offset.
+Encoder = Callable[[Any, list], None]
+Decoder = Callable[[bytes, int], tuple[Any, int]]
+
+
+def _scalar(tp) -> tuple[str, Callable | None, Callable | None] | None:
+    """
+    Return the struct code and the functions converting to and from the packed
+    value if the type packs to a fixed size, otherwise None.
+
+    """
+    if tp is bool:
+        return '?', None, None
+    elif tp is int:
+        return 'q', None, None
+    elif tp is float:
+        return 'd', None, None
+    elif tp is QColor:
+        return 'I', QColor.rgba, QColor.from_rgba
+    elif isinstance(tp, type) and issubclass(tp, Enum) and all(isinstance(member.value, int) for member in tp):
+        return 'q', attrgetter('value'), tp
+    return None
+
+
+def _encode_str(value: str, out: list):
+    data = value.encode()
+    out.append(LENGTH.pack(len(data)))
+    out.append(data)
+
+
+def _decode_str(buffer: bytes, pos: int) -> tuple[str, int]:
+    length, = LENGTH.unpack_from(buffer, pos)
+    pos += LENGTH.size
+    return str(buffer[pos:pos + length], 'utf-8'), pos + length
+
+
+def _encode_gradient(value: Gradient, out: list):
+    out.append(LENGTH.pack(len(value)))
+    out.extend(STOP.pack(stop.position, stop.colour.rgba()) for stop in value)
+
+
+def _decode_gradient(buffer: bytes, pos: int) -> tuple[Gradient, int]:
+    length, = LENGTH.unpack_from(buffer, pos)
+    pos += LENGTH.size
+    stops = []
+    for position, rgba in STOP.iter_unpack(buffer[pos:pos + length * STOP.size]):
+        stops.append((position, QColor.from_rgba(rgba)))
+    return Gradient(stops), pos + length * STOP.size
+
+
+def _compile_str_backed(to_str: Callable, from_str: Callable) -> tuple[Encoder, Decoder]:
+
+    def encode(value, out: list):
+        _encode_str(to_str(value), out)
+
+    def decode(buffer: bytes, pos: int) -> tuple[Any, int]:
+        value, pos = _decode_str(buffer, pos)
+        return from_str(value), pos
+
+    return encode, decode
+
+
+def _compile_list(item_type) -> tuple[Encoder, Decoder]:
+    scalar = _scalar(item_type)
+    if scalar is not None and scalar[1] is None:
+
+        # Homogeneous lists of plain numbers are packed in one call.
+        code = scalar[0]
+
+        def encode(value: list, out: list):
+            out.append(LENGTH.pack(len(value)))
+            out.append(struct.pack(f'<{len(value)}{code}', *value))
+
+        def decode(buffer: bytes, pos: int) -> tuple[list, int]:
+            length, = LENGTH.unpack_from(buffer, pos)
+            pos += LENGTH.size
+            fmt = f'<{length}{code}'
+            return list(struct.unpack_from(fmt, buffer, pos)), pos + struct.calcsize(fmt)
+
+        return encode, decode
+
+    if dataclasses.is_dataclass(item_type):
+
+        # Resolved lazily so that dataclasses may refer to themselves, but only
+        # once per list rather than once per item.
+        def item_coders() -> tuple[Encoder, Decoder]:
+            codec = get_codec(item_type)
+            return codec.encode_to, codec.decode_from
+    else:
+        coders = _compile(item_type)
+        item_coders = lambda: coders
+
+    def encode(value: list, out: list):
+        out.append(LENGTH.pack(len(value)))
+        encode_item = item_coders()[0]
+        for item in value:
+            encode_item(item, out)
+
+    def decode(buffer: bytes, pos: int) -> tuple[list, int]:
+        length, = LENGTH.unpack_from(buffer, pos)
+        pos += LENGTH.size
+        decode_item = item_coders()[1]
+        items = []
+        for _ in range(length):
+            item, pos = decode_item(buffer, pos)
+            items.append(item)
+        return items, pos
+
+    return encode, decode
+
+
+def _compile_optional(value_type) -> tuple[Encoder, Decoder]:
+    encode_value, decode_value = _compile(value_type)
+
+    def encode(value, out: list):
+        out.append(PRESENT.pack(value is not None))
+        if value is not None:
+            encode_value(value, out)
+
+    def decode(buffer: bytes, pos: int) -> tuple[Any, int]:
+        present, = PRESENT.unpack_from(buffer, pos)
+        pos += PRESENT.size
+        return decode_value(buffer, pos) if present else (None, pos)
+
+    return encode, decode
+
+
+def _compile(tp) -> tuple[Encoder, Decoder]:
+    scalar = _scalar(tp)
+    if scalar is not None:
+        packer = struct.Struct('<' + scalar[0])
+        to_packed, from_packed = scalar[1], scalar[2]
+
+        def encode(value, out: list):
+            out.append(packer.pack(to_packed(value) if to_packed is not None else value))
+
+        def decode(buffer: bytes, pos: int) -> tuple[Any, int]:
+            value, = packer.unpack_from(buffer, pos)
+            return from_packed(value) if from_packed is not None else value, pos + packer.size
+
+        return encode, decode
+
+    origin, args = typing.get_origin(tp), typing.get_args(tp)
+    if tp is str:
+        return _encode_str, _decode_str
+    elif tp is Gradient:
+        return _encode_gradient, _decode_gradient
+    elif tp is FilePathQImage:
+        return _compile_str_backed(attrgetter('file_path'), FilePathQImage)
+    elif isinstance(tp, type) and issubclass(tp, Enum):
+        return _compile_str_backed(attrgetter('name'), tp.__getitem__)
+    elif dataclasses.is_dataclass(tp):
+
+        # Resolved lazily so that dataclasses may refer to themselves.
+        return (
+            lambda value, out: get_codec(tp).encode_to(value, out),
+            lambda buffer, pos: get_codec(tp).decode_from(buffer, pos),
+        )
+    elif origin is list and len(args) == 1:
+        return _compile_list(args[0])
+    elif origin in (typing.Union, types.UnionType) and len(args) == 2 and type(None) in args:
+        return _compile_optional(args[0] if args[1] is type(None) else args[1])
+    raise TypeError(f'Unsupported field type: {tp}')
+
+
+def _describe(tp, seen: set) -> str:
+    """Describe the layout of a type, used to detect files written by an older layout."""
+    if dataclasses.is_dataclass(tp):
+        if tp in seen:
+            return tp.__qualname__
+        seen.add(tp)
+        hints = typing.get_type_hints(tp)
+        fields = ','.join(f'{field.name}:{_describe(hints[field.name], seen)}' for field in dataclasses.fields(tp))
+        return f'{tp.__qualname__}({fields})'
+    elif isinstance(tp, type) and issubclass(tp, Enum):
+        return f'{tp.__qualname__}[{",".join(tp.__members__)}]'
+    args = typing.get_args(tp)
+    if args:
+        return f'{typing.get_origin(tp)}[{",".join(_describe(arg, seen) for arg in args)}]'
+    return getattr(tp, '__qualname__', repr(tp))
+
+
+class Codec:
+
+    """
+    Binary encoder and decoder for a dataclass, generated once from its fields
+    as straight-line functions. Consecutive fixed size fields (bool, int,
+    float, int valued enums and colours) are packed with a single struct call,
+    other fields are length prefixed. The payload may be compressed with zlib
+    or lzma.
+
+    Use get_codec() rather than constructing one directly so the compiled
+    codec is shared.
+
+    """
+
+    def __init__(self, cls: type):
+        self.cls = cls
+        self.fingerprint = zlib.crc32(_describe(cls, set()).encode())
+
+        hints = typing.get_type_hints(cls)
+        namespace = {'LENGTH': LENGTH, 'cls': cls}
+        encode_lines, decode_lines, group = [], [], []
+        for i, field in enumerate(dataclasses.fields(cls)):
+            tp = hints[field.name]
+            scalar = _scalar(tp)
+            if scalar is not None:
+                group.append((i, field.name, scalar))
+                continue
+            self._add_group(group, namespace, encode_lines, decode_lines)
+            group = []
+            if tp is str:
+                encode_lines += [
+                    f'data = obj.{field.name}.encode()',
+                    'out.append(LENGTH.pack(len(data)))',
+                    'out.append(data)',
+                ]
+                decode_lines += [
+                    'length, = LENGTH.unpack_from(buffer, pos)',
+                    'pos += 4',
+                    f'v{i} = str(buffer[pos:pos + length], "utf-8")',
+                    'pos += length',
+                ]
+            else:
+                namespace[f'E{i}'], namespace[f'D{i}'] = _compile(tp)
+                encode_lines.append(f'E{i}(obj.{field.name}, out)')
+                decode_lines.append(f'v{i}, pos = D{i}(buffer, pos)')
+        self._add_group(group, namespace, encode_lines, decode_lines)
+
+        fields = dataclasses.fields(cls)
+        values = ''.join(f'v{i}, ' for i in range(len(fields)))
+        init_args = ', '.join(f'{field.name}=v{i}' for i, field in enumerate(fields) if field.init)
+        construct = [f'obj = cls({init_args})']
+        construct += [f'obj.{field.name} = v{i}' for i, field in enumerate(fields) if not field.init]
+        source = '\n'.join((
+            'def encode_to(obj, out):',
+            *(f'    {line}' for line in encode_lines or ['pass']),
+            'def decode_values(buffer, pos):',
+            *(f'    {line}' for line in decode_lines),
+            f'    return ({values}), pos',
+            'def decode_from(buffer, pos):',
+            *(f'    {line}' for line in decode_lines + construct),
+            '    return obj, pos',
+        ))
+        exec(compile(source, f'<codec {cls.__qualname__}>', 'exec'), namespace)
+        self.names = tuple(field.name for field in fields)
+        self.encode_to: Encoder = namespace['encode_to']
+        self.decode_from: Decoder = namespace['decode_from']
+        self._decode_values = namespace['decode_values']
+
+    @staticmethod
+    def _add_group(group: list, namespace: dict, encode_lines: list, decode_lines: list):
+        """Pack a run of fixed size fields with a single struct."""
+        if not group:
+            return
+        first = group[0][0]
+        packer = namespace[f'S{first}'] = struct.Struct('<' + ''.join(scalar[0] for _, _, scalar in group))
+        args = []
+        for i, name, (_, to_packed, from_packed) in group:
+            if to_packed is not None:
+                namespace[f'T{i}'], namespace[f'F{i}'] = to_packed, from_packed
+                args.append(f'T{i}(obj.{name})')
+            else:
+                args.append(f'obj.{name}')
+        encode_lines.append(f'out.append(S{first}.pack({", ".join(args)}))')
+        decode_lines.append(f'{"".join(f"v{i}, " for i, _, _ in group)}= S{first}.unpack_from(buffer, pos)')
+        decode_lines.append(f'pos += {packer.size}')
+        decode_lines += [f'v{i} = F{i}(v{i})' for i, _, scalar in group if scalar[2] is not None]
+
+    def decode_values(self, buffer: bytes, pos: int) -> tuple[dict, int]:
+        values, pos = self._decode_values(buffer, pos)
+        return dict(zip(self.names, values)), pos
+
+    def encode(self, obj, compression: str | None = None) -> bytes:
+        compression_id, compress = COMPRESSORS[compression]
+        out = []
+        self.encode_to(obj, out)
+        return HEADER.pack(MAGIC, compression_id, self.fingerprint) + compress(b''.join(out))
+
+    def _payload(self, data: bytes) -> bytes:
+        magic, compression_id, fingerprint = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError('Not a binary content file')
+        if fingerprint != self.fingerprint:
+            raise ValueError(f'File was written with a different layout of {self.cls.__qualname__}')
+        return DECOMPRESSORS[compression_id](data[HEADER.size:])
+
+    def decode(self, data: bytes) -> Any:
+        return self.decode_from(self._payload(data), 0)[0]
+
+    def decode_into(self, obj, data: bytes):
+        """Decode the fields onto an existing instance, eg the document content."""
+        values, _ = self.decode_values(self._payload(data), 0)
+        for name, value in values.items():
+            setattr(obj, name, value)
+
+
+_codecs: dict[type, Codec] = {}
+
+
+def get_codec(cls: type) -> Codec:
+    codec = _codecs.get(cls)
+    if codec is None:
+        codec = _codecs[cls] = Codec(cls)
+    return codec
+
+
+class BinaryContentBase(ContentBase):
+
+    """
+    Content for dataclasses that loads and saves itself with the generated
+    binary codec. Set compression to 'zlib' or 'lzma' to compress the file.
+
+    """
+
+    compression = None
+
+    def load(self, file_path: str):
+        with open(file_path, 'rb') as f:
+            get_codec(type(self)).decode_into(self, f.read())
+
+    def save(self, file_path: str):
+        with open(file_path, 'wb') as f:
+            f.write(get_codec(type(self)).encode(self, self.compression))
@@ -1,8 +1,58 @@
 import abc
+import json
+import os
+import threading
+from enum import Flag
+from typing import Any, Callable
+
+from applicationframework.fileutils import atomic_write, hash_bytes
+
+
+class Cancelled(Exception):
+
+    pass
+
+
+class Progress:
+
+    """
+    Passed to content loading and saving when run in the background. Content
+    can report how far through it is and should call check() periodically so
+    that the operation can be cancelled.
+
+    """
+
+    def __init__(self, callback: Callable[[float], None] | None = None):
+        self._callback = callback
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def check(self):
+        if self.cancelled:
+            raise Cancelled()
+
+    def report(self, fraction: float):
+        self.check()
+        if self._callback is not None:
+            self._callback(fraction)
 
 
 class ContentBase(metaclass=abc.ABCMeta):
 
+    # Set if save() already writes atomically and knows how to skip unchanged
+    # data, in which case the document won't go via a temporary file.
+    writes_atomically = False
+
+    # Clear if the parsed content can't be restored from a content cache, eg
+    # because it depends on more than the single file being loaded.
+    cacheable = True
+
     @abc.abstractmethod
     def load(self, file_path: str):
         ...
@@ -10,3 +60,218 @@ class ContentBase(metaclass=abc.ABCMeta):
     @abc.abstractmethod
     def save(self, file_path: str):
         ...
+
+    def load_with_progress(self, file_path: str, progress: Progress):
+        """
+        Override to report progress and support cancellation when loading in
+        the background.
+
+        """
+        self.load(file_path)
+
+    def save_with_progress(self, file_path: str, progress: Progress):
+        """
+        Override to report progress and support cancellation when saving in
+        the background.
+
+        """
+        self.save(file_path)
+
+    def content_hash(self) -> str | None:
+        """
+        Override to return a hash of the in-memory content. If it matches the
+        hash at the last save the document skips writing altogether.
+
+        """
+        return None
+
+    def memory_usage(self) -> int | None:
+        """
+        Override to return the estimated number of bytes held by the content,
+        used to decide which documents a workspace pages out.
+
+        """
+        return None
+
+
+class ChunkedContentBase(ContentBase):
+
+    """
+    Content saved as a directory of independently written sections plus a
+    manifest. Sections are hashed when saved and only those that changed since
+    the last load or save are written. Section files are named after the
+    section and its hash so a save never overwrites a file the current
+    manifest points at; the manifest is switched atomically and the sections
+    it no longer references are removed afterwards.
+
+    """
+
+    writes_atomically = True
+    cacheable = False
+    manifest_name = 'manifest.json'
+
+    def __init__(self):
+        self._section_hashes = {}
+
+    @abc.abstractmethod
+    def dump_sections(self) -> dict[str, bytes]:
+        ...
+
+    @abc.abstractmethod
+    def load_sections(self, sections: dict[str, bytes]):
+        ...
+
+    @staticmethod
+    def section_file_name(name: str, section_hash: str) -> str:
+        return f'{name}.{section_hash}'
+
+    def load(self, file_path: str):
+        with open(os.path.join(file_path, self.manifest_name)) as f:
+            manifest = json.load(f)
+        sections = {}
+        for name, section_hash in manifest.items():
+            with open(os.path.join(file_path, self.section_file_name(name, section_hash)), 'rb') as f:
+                data = f.read()
+            if hash_bytes(data) != section_hash:
+                raise ValueError(f'Section "{name}" does not match its hash in the manifest: {file_path}')
+            sections[name] = data
+        self._section_hashes = manifest
+        self.load_sections(sections)
+
+    def save(self, file_path: str):
+        os.makedirs(file_path, exist_ok=True)
+        manifest_path = os.path.join(file_path, self.manifest_name)
+        section_hashes = {}
+        for name, data in self.dump_sections().items():
+            section_hash = hash_bytes(data)
+            section_path = os.path.join(file_path, self.section_file_name(name, section_hash))
+            if not os.path.exists(section_path):
+                atomic_write(section_path, data)
+            section_hashes[name] = section_hash
+
+        # The manifest is switched last so a crash before this point leaves the
+        # previous manifest pointing at its own, untouched sections.
+        if section_hashes != self._section_hashes or not os.path.exists(manifest_path):
+            atomic_write(manifest_path, json.dumps(section_hashes, indent=4).encode())
+        for name, section_hash in self._section_hashes.items():
+            if section_hashes.get(name) != section_hash:
+                section_path = os.path.join(file_path, self.section_file_name(name, section_hash))
+                if os.path.exists(section_path):
+                    os.remove(section_path)
+        self._section_hashes = section_hashes
+
+
+class ChangeSet:
+
+    """Fields that changed, grouped by the object they belong to."""
+
+    def __init__(self):
+        self._changes: dict[int, tuple[Any, set[str]]] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self._changes)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.fields()
+
+    def __getstate__(self) -> dict:
+        return {'changes': list(self._changes.values())}
+
+    def __setstate__(self, state: dict):
+
+        # Entries are keyed by id, which doesn't survive a round trip.
+        self._changes = {id(obj): (obj, names) for obj, names in state['changes']}
+
+    def add(self, obj, name: str):
+        entry = self._changes.get(id(obj))
+        if entry is None:
+            entry = self._changes[id(obj)] = (obj, set())
+        entry[1].add(name)
+
+    def objects(self) -> list:
+        return [obj for obj, _ in self._changes.values()]
+
+    def fields(self, obj=None) -> set[str]:
+        if obj is not None:
+            entry = self._changes.get(id(obj))
+            return set(entry[1]) if entry is not None else set()
+        return {name for _, names in self._changes.values() for name in names}
+
+
+class ChangeTracker:
+
+    """
+    Collects field changes from observable objects. Changes are kept both since
+    the last update and since the last save.
+
+    """
+
+    def __init__(self):
+        self.since_update = ChangeSet()
+        self.since_save = ChangeSet()
+
+    def add(self, obj, name: str):
+        self.since_update.add(obj, name)
+        self.since_save.add(obj, name)
+
+    def take_update(self) -> ChangeSet:
+        changes, self.since_update = self.since_update, ChangeSet()
+        return changes
+
+    def clear_save(self):
+        self.since_save = ChangeSet()
+
+    def clear(self):
+        """Forget all changes, eg once the content has been loaded."""
+        self.since_update = ChangeSet()
+        self.since_save = ChangeSet()
+
+
+class Observable:
+
+    """
+    Mixin for dataclasses that reports assignments to dataclass fields to a
+    change tracker, if one has been attached.
+
+    """
+
+    def __setattr__(self, name: str, value):
+        tracker = self.__dict__.get('_tracker')
+        if tracker is not None and name in self.__dataclass_fields__:
+            old_value = getattr(self, name, None)
+            if old_value is not value and not old_value == value:
+                tracker.add(self, name)
+        super().__setattr__(name, value)
+
+
+class ObservableContentBase(Observable, ContentBase):
+
+    """
+    Content that records which dataclass fields changed. The subclass should
+    be a dataclass. Nested Observable objects are tracked once passed to
+    track(). The update flags for a set of changes are derived from
+    field_flags, a mapping of field name to flag.
+
+    """
+
+    field_flags: dict[str, Flag] = {}
+
+    @property
+    def tracker(self) -> ChangeTracker:
+        tracker = self.__dict__.get('_tracker')
+        if tracker is None:
+            tracker = self.__dict__['_tracker'] = ChangeTracker()
+        return tracker
+
+    def track(self, *objs: Observable):
+        """Start tracking changes to this content and the given objects."""
+        for obj in (self,) + objs:
+            obj.__dict__['_tracker'] = self.tracker
+
+    def flags_for(self, changes: ChangeSet) -> Flag | None:
+        flags = None
+        for name in changes.fields():
+            flag = self.field_flags.get(name)
+            if flag is not None:
+                flags = flag if flags is None else flags | flag
+        return flags
@@ -0,0 +1,165 @@
+import dataclasses
+import hashlib
+import io
+import logging
+import os
+import pickle
+import struct
+import threading
+
+from PySide6.QtCore import QStandardPaths, QThreadPool
+
+from applicationframework.codec import get_codec
+from applicationframework.contentbase import ContentBase, Progress
+from applicationframework.fileutils import atomic_write
+from applicationframework.handles import Pickler
+from applicationframework.task import Task
+
+# noinspection PyUnresolvedReferences
+from __feature__ import snake_case
+
+
+logger = logging.getLogger(__name__)
+
+
+MAGIC = b'QXCC'
+HEADER = struct.Struct('<4sBqqI')
+
+CODEC = 0
+PICKLE = 1
+
+
+class ContentCache:
+
+    """
+    On-disk cache of parsed document content, keyed by the source file's path,
+    mtime and size. Dataclass content is stored with the binary codec, other
+    content is pickled. Entries are touched when used and the least recently
+    used are removed once the cache grows beyond max_bytes.
+
+    """
+
+    extension = '.cache'
+
+    def __init__(self, dir_path: str | None = None, max_bytes: int = 256 * 1024 * 1024):
+        if dir_path is None:
+            cache_path = QStandardPaths.writable_location(QStandardPaths.StandardLocation.CacheLocation)
+            dir_path = os.path.join(cache_path, 'content')
+        self.dir_path = dir_path
+        self.max_bytes = max_bytes
+        self._prefetched: dict[str, bytes] = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.dir_path, exist_ok=True)
+
+    def get_entry_path(self, file_path: str) -> str:
+        name = hashlib.sha1(os.path.abspath(file_path).encode()).hexdigest()
+        return os.path.join(self.dir_path, name + self.extension)
+
+    def _read(self, file_path: str) -> bytes | None:
+        with self._lock:
+            data = self._prefetched.pop(os.path.abspath(file_path), None)
+        if data is not None:
+            return data
+        try:
+            with open(self.get_entry_path(file_path), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def load(self, file_path: str, content: ContentBase) -> bool:
+        """
+        Load the content from the cache if there is an entry matching the
+        current mtime and size of the file. Returns True on a hit.
+
+        """
+        data = self._read(file_path)
+        if data is None:
+            return False
+        entry_path = self.get_entry_path(file_path)
+        try:
+            stat = os.stat(file_path)
+            magic, format_, mtime, size, path_length = HEADER.unpack_from(data, 0)
+            path = data[HEADER.size:HEADER.size + path_length].decode()
+            if magic != MAGIC or path != os.path.abspath(file_path):
+                raise ValueError('Entry does not belong to this file')
+            if mtime != stat.st_mtime_ns or size != stat.st_size:
+                logger.debug(f'Cache entry out of date: {file_path}')
+                os.remove(entry_path)
+                return False
+            payload = data[HEADER.size + path_length:]
+            if format_ == CODEC:
+                get_codec(type(content)).decode_into(content, payload)
+            else:
+                vars(content).update(vars(pickle.loads(payload)))
+        except Exception as e:
+            logger.warning(f'Failed to load cache entry: {file_path} error: {e}')
+            if os.path.exists(entry_path):
+                os.remove(entry_path)
+            return False
+
+        # Touch the entry so eviction removes the least recently used first.
+        if os.path.exists(entry_path):
+            os.utime(entry_path)
+        logger.debug(f'Loaded content from cache: {file_path}')
+        return True
+
+    def store(self, file_path: str, content: ContentBase, stat: os.stat_result):
+        """
+        Store the content parsed from the file. The stat should be taken before
+        parsing so that a file changed meanwhile won't match the entry.
+
+        """
+        try:
+            if dataclasses.is_dataclass(content):
+                format_, payload = CODEC, get_codec(type(content)).encode(content)
+            else:
+                buffer = io.BytesIO()
+                Pickler(buffer, protocol=pickle.HIGHEST_PROTOCOL).dump(content)
+                format_, payload = PICKLE, buffer.getvalue()
+        except Exception as e:
+            logger.debug(f'Content cannot be cached: {file_path} error: {e}')
+            return
+        path = os.path.abspath(file_path).encode()
+        header = HEADER.pack(MAGIC, format_, stat.st_mtime_ns, stat.st_size, len(path))
+        atomic_write(self.get_entry_path(file_path), header + path + payload)
+        logger.debug(f'Stored content in cache: {file_path}')
+        self.evict()
+
+    def prefetch(self, file_path: str, pool: QThreadPool | None = None) -> Task:
+        """Read the entry for the given file into memory on a worker thread."""
+
+        def prefetch(progress: Progress):
+            try:
+                with open(self.get_entry_path(file_path), 'rb') as f:
+                    data = f.read()
+            except FileNotFoundError:
+                return
+            with self._lock:
+                self._prefetched[os.path.abspath(file_path)] = data
+
+        task = Task(prefetch)
+        (pool or QThreadPool.global_instance()).start(task)
+        return task
+
+    def disk_usage(self) -> int:
+        """Return the total number of bytes of the entries on disk."""
+        return sum(entry.stat().st_size for entry in self._entries())
+
+    def _entries(self) -> list[os.DirEntry]:
+        return [entry for entry in os.scandir(self.dir_path) if entry.name.endswith(self.extension)]
+
+    def evict(self):
+        entries = sorted(self._entries(), key=lambda entry: entry.stat().st_mtime)
+        total = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if total <= self.max_bytes:
+                break
+            logger.debug(f'Evicting cache entry: {entry.path}')
+            total -= entry.stat().st_size
+            os.remove(entry.path)
+
+    def clear(self):
+        with self._lock:
+            self._prefetched.clear()
+        for entry in self._entries():
+            os.remove(entry.path)
@@ -0,0 +1,313 @@
+import copy
+import dataclasses
+from collections.abc import Sequence
+from contextlib import contextmanager
+from enum import Enum, Flag
+
+from PySide6.QtWidgets import QApplication
+from shiboken6 import Shiboken
+
+from applicationframework.actions import Edit, Manager
+from applicationframework.handles import from_handle, sizeof, to_handle
+
+
+SET = 0
+SPLICE = 1
+UPDATE = 2
+
+# Snapshot kinds.
+ATTRS = 0
+ITEMS = 1
+LIST = 2
+MEMBERS = 3
+
+# Values that can't be changed in place so are held by reference.
+IMMUTABLE_TYPES = (str, bytes, int, float, complex, bool, type(None), tuple, frozenset, Enum, type)
+
+
+class _Missing:
+
+    """Stands in for an attribute or key that didn't exist."""
+
+    def __repr__(self):
+        return 'MISSING'
+
+    def __reduce__(self):
+        return 'MISSING'
+
+
+MISSING = _Missing()
+
+
+class _Snapshot:
+
+    """
+    Structural snapshot of a mutable value. Children are snapshots of the
+    attributes of objects, the items of dicts and lists, or the leaf values
+    themselves. Sets are held as a frozen copy of their items.
+
+    """
+
+    __slots__ = ('obj', 'kind', 'children')
+
+    def __init__(self, obj, kind: int, children):
+        self.obj = obj
+        self.kind = kind
+        self.children = children
+
+
+def _attrs(value) -> dict | None:
+
+    # Qt wrappers keep their state in C++, so they're copied rather than
+    # recursed into.
+    if isinstance(value, Shiboken.Object):
+        return None
+    if dataclasses.is_dataclass(value):
+        return {field.name: getattr(value, field.name) for field in dataclasses.fields(value)}
+    attrs = dict(vars(value)) if isinstance(getattr(value, '__dict__', None), dict) else None
+    for cls in type(value).__mro__:
+        slots = getattr(cls, '__slots__', ())
+        for name in (slots,) if isinstance(slots, str) else slots:
+            if name not in ('__dict__', '__weakref__') and hasattr(value, name):
+                attrs = attrs if attrs is not None else {}
+                attrs[name] = getattr(value, name)
+    return attrs
+
+
+def snapshot(value, memo: dict | None = None):
+    """
+    Take a structural snapshot of a value. Objects, dicts, lists and sets are
+    recursed into, immutable values are held by reference and other values,
+    eg Qt value types, are copied. All are compared by equality when diffing.
+    A TypeError is raised for values that can't be tracked.
+
+    """
+    if isinstance(value, IMMUTABLE_TYPES):
+        return value
+    memo = {} if memo is None else memo
+    if id(value) in memo:
+        return memo[id(value)]
+    if isinstance(value, list):
+        result = memo[id(value)] = _Snapshot(value, LIST, None)
+        result.children = tuple(snapshot(item, memo) for item in value)
+    elif isinstance(value, dict):
+        result = memo[id(value)] = _Snapshot(value, ITEMS, None)
+        result.children = {key: snapshot(item, memo) for key, item in value.items()}
+    elif isinstance(value, set):
+        result = memo[id(value)] = _Snapshot(value, MEMBERS, frozenset(value))
+    else:
+        attrs = _attrs(value)
+        if attrs is None:
+            try:
+                return copy.copy(value)
+            except Exception as e:
+                raise TypeError(f'Cannot track changes to value: {value!r}') from e
+        result = memo[id(value)] = _Snapshot(value, ATTRS, None)
+        result.children = {name: snapshot(item, memo) for name, item in attrs.items()}
+    return result
+
+
+def _original(before):
+    return before.obj if isinstance(before, _Snapshot) else before
+
+
+def _same(before, value) -> bool:
+    if isinstance(before, _Snapshot):
+        return before.obj is value
+    return before is value or before == value
+
+
+def _diff(before, value, path: tuple, owner: tuple, ops: list, touched: list, seen: set):
+    if not isinstance(before, _Snapshot) or before.obj is not value:
+        if not _same(before, value):
+            ops.append((SET, path, to_handle(_original(before)), to_handle(value)))
+            touched.append(owner)
+        return
+    if id(before) in seen:
+        return
+    seen.add(id(before))
+    if before.kind == MEMBERS:
+        removed, added = before.children - value, value - before.children
+        if removed or added:
+            ops.append((UPDATE, path, tuple(removed), tuple(added)))
+            touched.append(owner)
+        return
+    if before.kind != LIST:
+        current = value if before.kind == ITEMS else _attrs(value)
+        for key, child in before.children.items():
+            child_owner = owner if before.kind == ITEMS else ((value,), key)
+            _diff(child, current.get(key, MISSING), path + (key,), child_owner, ops, touched, seen)
+        for key in current.keys() - before.children.keys():
+            ops.append((SET, path + (key,), MISSING, to_handle(current[key])))
+            touched.append(owner if before.kind == ITEMS else ((value,), key))
+        return
+
+    # Trim the unchanged head and tail of the list, recursing into them in case
+    # their contents changed, and splice whatever is left in the middle.
+    old = before.children
+    num_old, num_new = len(old), len(value)
+    start = 0
+    while start < min(num_old, num_new) and _same(old[start], value[start]):
+        start += 1
+    end = 0
+    while end < min(num_old, num_new) - start and _same(old[num_old - end - 1], value[num_new - end - 1]):
+        end += 1
+    for i in range(start):
+        _diff(old[i], value[i], path + (i,), owner, ops, touched, seen)
+    for i in range(end):
+        _diff(old[num_old - i - 1], value[num_new - i - 1], path + (num_old - i - 1,), owner, ops, touched, seen)
+    if start == num_old - end and start == num_new - end:
+        return
+
+    # Items that were kept but moved are recursed into at their old index
+    # before the middle is replaced, so that undo restores their contents once
+    # they're back in place.
+    new_ids = {id(item) for item in value[start:num_new - end]}
+    for i in range(start, num_old - end):
+        item = old[i]
+        if isinstance(item, _Snapshot) and id(item.obj) in new_ids and (num_old != num_new or item.obj is not value[i]):
+            _diff(item, item.obj, path + (i,), owner, ops, touched, seen)
+    if num_old == num_new:
+        for i in range(start, num_old - end):
+            _diff(old[i], value[i], path + (i,), owner, ops, touched, seen)
+    else:
+        old_items = tuple(to_handle(_original(item)) for item in old[start:num_old - end])
+        new_items = tuple(to_handle(item) for item in value[start:num_new - end])
+        ops.append((SPLICE, path, start, old_items, new_items))
+        touched.append(owner)
+
+
+def diff(before: _Snapshot, value, touched: list | None = None) -> tuple:
+    """
+    Return the operations that turn the snapshot into the current value. If a
+    list is given the (objects, field name) pairs that changed are appended
+    to it. Changes to dict items, list elements and set members are reported
+    against the field holding the container.
+
+    """
+    ops = []
+    _diff(before, value, (), ((value,), None), ops, [] if touched is None else touched, set())
+    return tuple(ops)
+
+
+class Delta(Edit):
+
+    """
+    Stores the difference between two structural snapshots of an object, ie
+    only the changed attributes, dict items, list elements and set members.
+    Useful for bulk operations where one SetAttribute per change would cost
+    more than the diff.
+
+    """
+
+    __slots__ = ('ops', '_touched')
+
+    def __init__(self, obj, ops: tuple, **kwargs):
+        super().__init__(obj, **kwargs)
+
+        self.ops = ops
+        self._touched = []
+
+    def __getstate__(self) -> dict:
+        state = super().__getstate__()
+        state.pop('_touched', None)
+        return state
+
+    def __setstate__(self, state: dict):
+        self._touched = []
+        super().__setstate__(state)
+
+    @classmethod
+    @contextmanager
+    def record(cls, obj, manager: Manager | None = None, flags: Flag | None = None):
+        """
+        Snapshot the given object, run the body of the with statement and push
+        a Delta of whatever changed. A single update is emitted if anything
+        changed. If an exception is raised the changes are reverted.
+
+        """
+        manager = manager or QApplication.instance().action_manager
+        before = snapshot(obj)
+        try:
+            yield
+        except BaseException:
+            cls(obj, diff(before, obj)).undo()
+            raise
+        touched = []
+        action = cls(obj, diff(before, obj, touched), flags=flags)
+        if action.ops:
+            action._touched = touched
+            manager.push(action)
+            manager._bump(action)
+            manager.app().doc.updated(flags)
+
+    def _resolve(self, path: tuple):
+        target = self.obj
+        for key in path:
+            target = target[key] if isinstance(target, (list, dict)) else getattr(target, key)
+        return target
+
+    def _owner(self, path: tuple) -> tuple:
+        owner, name, target = self.obj, None, self.obj
+        for i, key in enumerate(path):
+            container = isinstance(target, (list, dict))
+            if not container:
+                owner, name = target, key
+            if i < len(path) - 1:
+                target = target[key] if container else getattr(target, key)
+        return (owner,), name
+
+    def _set(self, path: tuple, value):
+        if not path:
+            raise ValueError('Cannot replace the root object of a delta')
+        parent, key = self._resolve(path[:-1]), path[-1]
+        if isinstance(parent, (list, dict)):
+            if value is MISSING:
+                del parent[key]
+            else:
+                parent[key] = from_handle(value)
+        elif value is MISSING:
+            delattr(parent, key)
+        else:
+            setattr(parent, key, from_handle(value))
+
+    def _apply(self, op: tuple, forward: bool):
+        self._touched.append(self._owner(op[1]))
+        if op[0] == SET:
+            _, path, old_value, new_value = op
+            self._set(path, new_value if forward else old_value)
+        elif op[0] == UPDATE:
+            _, path, removed, added = op
+            members = self._resolve(path)
+            members.difference_update(removed if forward else added)
+            members.update(added if forward else removed)
+        else:
+            _, path, start, old_items, new_items = op
+            items, replaced = (new_items, old_items) if forward else (old_items, new_items)
+            self._resolve(path)[start:start + len(replaced)] = [from_handle(item) for item in items]
+
+    def undo(self):
+        self._touched = []
+        if self.obj is not None:
+            for op in reversed(self.ops):
+                self._apply(op, False)
+        return self.flags
+
+    def redo(self):
+        self._touched = []
+        if self.obj is not None:
+            for op in self.ops:
+                self._apply(op, True)
+        return self.flags
+
+    def touched(self) -> list[tuple[Sequence, str | None]]:
+        """
+        Return the (objects, field name) pairs changed by the last undo or
+        redo, or by the recorded edit. Paths are resolved as the ops are
+        applied as list indices only hold while the ops run in order.
+
+        """
+        return self._touched
+
+    def size(self) -> int:
+        return super().size() + sizeof(self.ops)
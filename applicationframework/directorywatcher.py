@@ -1,25 +1,143 @@
 import logging
 import os
+import re
+import select
+import time
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Callable
+from typing import Callable, Iterable
 
 from PySide6 import QtCore
 
+from applicationframework import inotify
+from applicationframework.hashcache import HashCache
+from applicationframework.pathfilter import PathFilter
+from applicationframework.scanner import Scanner
+
 
 logger = logging.getLogger(__name__)
 
 
+AUTO = 'auto'
+INOTIFY = 'inotify'
+POLL = 'poll'
+
+ADDED = 'added'
+REMOVED = 'removed'
+MODIFIED = 'modified'
+
+# Net change of a file given its pending change and a new one. None means the
+# changes cancel out, eg a temporary file that was added then removed.
+MERGED = {
+    (ADDED, ADDED): ADDED,
+    (ADDED, REMOVED): None,
+    (ADDED, MODIFIED): ADDED,
+    (REMOVED, ADDED): MODIFIED,
+    (REMOVED, REMOVED): REMOVED,
+    (REMOVED, MODIFIED): MODIFIED,
+    (MODIFIED, ADDED): MODIFIED,
+    (MODIFIED, REMOVED): REMOVED,
+    (MODIFIED, MODIFIED): MODIFIED,
+}
+
+WATCH_MASK = (
+    inotify.IN_CREATE |
+    inotify.IN_DELETE |
+    inotify.IN_MODIFY |
+    inotify.IN_ATTRIB |
+    inotify.IN_MOVED_FROM |
+    inotify.IN_MOVED_TO |
+    inotify.IN_ONLYDIR |
+    inotify.IN_DONT_FOLLOW
+)
+
+
+@dataclass
+class FileChanges:
+
+    added: list[Path] = field(default_factory=list)
+    removed: list[Path] = field(default_factory=list)
+    modified: list[Path] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.modified)
+
+
+class _PendingChanges:
+
+    """Net change per file collected during a debounce window."""
+
+    def __init__(self):
+        self._changes: dict[str, str] = {}
+        self.first = 0.0
+        self.last = 0.0
+
+    def __bool__(self) -> bool:
+        return bool(self._changes)
+
+    def add(self, kind: str, file_paths: list[str]):
+        if not file_paths:
+            return
+        now = time.monotonic()
+        if not self._changes:
+            self.first = now
+        self.last = now
+        for file_path in file_paths:
+            old_kind = self._changes.get(file_path)
+            new_kind = kind if old_kind is None else MERGED[old_kind, kind]
+            if new_kind is None:
+                del self._changes[file_path]
+            else:
+                self._changes[file_path] = new_kind
+
+    def take(self) -> FileChanges:
+        changes = FileChanges()
+        for file_path, kind in self._changes.items():
+            getattr(changes, kind).append(Path(file_path))
+        self._changes = {}
+        return changes
+
+
 class DirectoryWatcher(QtCore.QThread):
 
     """
-    Class for watching a directory and all subdirectories below it for 
+    Class for watching a directory and all subdirectories below it for
     changes.
 
-    TODO: Possibly to keep in line with Qt standards the handlers should be
-    signals?
+    On Linux changes are reported from inotify events, with watches added for
+    new subdirectories as they appear. Elsewhere, or if the inotify instance
+    or watch limit is reached, the tree is polled instead with an incremental
+    Scanner. Pass backend='poll' to always poll.
+
+    Changes are collected until none arrive for debounce seconds, or at most
+    max_delay seconds, and merged so that each file is reported once with its
+    net change. The batch is then emitted as signals, which are delivered on
+    the thread the watcher was created on, usually the GUI thread. The
+    on_added etc. callbacks are still called but from the watcher thread.
+
+    Include and exclude rules, see PathFilter, are applied while walking so
+    excluded directories are neither scanned nor watched, and to events before
+    they are collected.
+
+    If verify_content is True, files whose mtime changed but size didn't are
+    hashed on a thread pool and only reported as modified if their content
+    changed, so a touch or a save of identical bytes goes unreported. Added
+    files are hashed in the background to give a baseline, other files are
+    reported unverified the first time they change.
 
     """
 
+    changed = QtCore.Signal(FileChanges)
+    added = QtCore.Signal(list)
+    removed = QtCore.Signal(list)
+    modified = QtCore.Signal(list)
+
+    # Milliseconds to sleep between polls.
+    poll_interval = 1
+
+    # Seconds to wait for inotify events before checking for stop().
+    select_timeout = 0.1
+
     def __init__(
         self,
         directory: Path | str | None = None,
@@ -27,10 +145,27 @@ class DirectoryWatcher(QtCore.QThread):
         on_removed: Callable | None = None,
         on_modified: Callable | None = None,
         *args,
+        backend: str = AUTO,
+        debounce: float = 0.1,
+        max_delay: float = 1.0,
+        include: Iterable[str | re.Pattern] = (),
+        exclude: Iterable[str | re.Pattern] = (),
+        verify_content: bool = False,
         **kwargs,
     ):
         super().__init__(*args, **kwargs)
 
+        self.backend = backend
+        self.path_filter = PathFilter(include, exclude)
+        self.hash_cache = HashCache() if verify_content else None
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self._pending = _PendingChanges()
+        self._stopped = False
+        self._watching = False
+        self._wds: dict[int, str] = {}
+        self._dir_files: dict[str, set[str]] = {}
+
         if directory is not None:
             self.set_directory(directory)
 
@@ -38,59 +173,242 @@ class DirectoryWatcher(QtCore.QThread):
         self.on_removed_fn = on_removed
         self.on_modified_fn = on_modified
 
-    def _recurse(self, dir_path):
-        """
-        
-        """
-        file_dict = {}
+    def set_directory(self, dir_path):
+        """Set the directory for watching."""
+        self.dir_path = dir_path
+        self.scanner = Scanner(dir_path, path_filter=self.path_filter)
+        self.scanner.scan()
 
-        def set_dict(key):
-            try:
-                file_dict[key] = os.path.getmtime(key)
-            except Exception as e:
-                logger.error(f'Failed to get modified time for file: {key}')
+    def stop(self):
+        """Ask the watcher to stop and wait for it to finish."""
+        self._stopped = True
+        self.wait()
 
-        for dir_path, dir_names, file_names in os.walk(dir_path, True):
-            for file_name in file_names:
-                file_path = Path(dir_path).joinpath(file_name)
-                set_dict(file_path)
+    def _dispatch(self, added: list[str], removed: list[str], modified: list[str]):
+        if self.hash_cache is not None:
+            self.hash_cache.forget(removed)
+            self.hash_cache.track(added)
+            modified = self.hash_cache.verify(modified)
+        self._pending.add(ADDED, added)
+        self._pending.add(REMOVED, removed)
+        self._pending.add(MODIFIED, modified)
+        self._flush()
 
-        return file_dict
+    def _flush_in(self) -> float | None:
+        """Return the seconds until pending changes are due, or None if there are none."""
+        if not self._pending:
+            return None
+        due = min(self._pending.last + self.debounce, self._pending.first + self.max_delay)
+        return max(0.0, due - time.monotonic())
 
-    def set_directory(self, dir_path):
-        """Set the directory for watching."""
-        self.dir_path = dir_path
-        self.before = self._recurse(self.dir_path)
+    def _flush(self, force: bool = False):
+        flush_in = self._flush_in()
+        if flush_in is None or flush_in > 0 and not force:
+            return
+        changes = self._pending.take()
+        logger.debug(f'Emitting file changes: {changes}')
+        self.changed.emit(changes)
+        if changes.added:
+            self.added.emit(changes.added)
+            self.on_added(changes.added)
+        if changes.removed:
+            self.removed.emit(changes.removed)
+            self.on_removed(changes.removed)
+        if changes.modified:
+            self.modified.emit(changes.modified)
+            self.on_modified(changes.modified)
 
     def run(self):
         """
-        Main watcher function. Don't use this to start the watcher, use 
+        Main watcher function. Don't use this to start the watcher, use
         start() to run the daemon instead.
-        
+
         """
-        while True:
-            after = self._recurse(self.dir_path)
-
-            # Work out which files were added, removed or modified.
-            added = [f for f in after if not f in self.before]
-            removed = [f for f in self.before if not f in after]
-            modified = [
-                f for f in after
-                if f in self.before and after[f] != self.before[f]
-            ]
-
-            # Call handlers.
-            if added:
-                self.on_added(added)
-            if removed:
-                self.on_removed(removed)
-            if modified:
-                self.on_modified(modified)
-
-            self.before = after
+        self._stopped = False
+        try:
+            if self.backend != POLL and inotify.is_available():
+                self._watching = False
+                try:
+                    self._run_inotify()
+                    return
+                except inotify.InotifyLimitError as e:
+                    logger.warning(f'Falling back to polling, inotify limit reached: {e}')
+                    if self._watching:
+                        self._resume_poll()
+            elif self.backend == INOTIFY:
+                logger.warning('inotify is not available, falling back to polling')
+            self._run_poll()
+        finally:
+            self._flush(force=True)
+            if self.hash_cache is not None:
+                self.hash_cache.close()
+
+    def _run_poll(self):
+        while not self._stopped:
+            self._dispatch(*self.scanner.scan())
 
             # Sleep a bit so we don't max out the thread.
-            self.msleep(1)
+            self.msleep(self.poll_interval)
+
+    def _resume_poll(self):
+        """
+        Bring the scanner up to date after watching with inotify, skipping
+        changes that inotify events already reported.
+
+        """
+        known = {os.path.join(d, name) for d, names in self._dir_files.items() for name in names}
+        added, removed, modified = self.scanner.scan()
+        self._dispatch(
+            [file_path for file_path in added if file_path not in known],
+            [file_path for file_path in removed if file_path in known],
+            modified,
+        )
+
+    def _watch_tree(self, notifier: inotify.Inotify, root: str) -> list[str]:
+        """
+        Add watches for the given directory and all directories below it.
+        Returns the paths of the files found.
+
+        """
+        file_paths, dir_paths = [], []
+        for dir_path, dir_names, file_names in os.walk(root):
+            if self.path_filter:
+                prefix = self._relative(dir_path) + '/' if dir_path != os.fspath(self.dir_path) else ''
+                dir_names[:] = [name for name in dir_names if self.path_filter.accepts_dir(prefix + name)]
+                file_names = [name for name in file_names if self.path_filter.accepts_file(prefix + name)]
+            try:
+                wd = notifier.add_watch(dir_path, WATCH_MASK)
+            except inotify.InotifyLimitError:
+
+                # The files found so far are never reported, so forget them
+                # and let the poll fallback pick them up.
+                for path in dir_paths:
+                    self._dir_files.pop(path, None)
+                raise
+            except OSError as e:
+                logger.debug(f'Failed to watch directory: {dir_path} error: {e}')
+                continue
+            self._wds[wd] = dir_path
+            self._dir_files[dir_path] = set(file_names)
+            dir_paths.append(dir_path)
+            file_paths.extend(os.path.join(dir_path, file_name) for file_name in file_names)
+        return file_paths
+
+    def _unwatch_tree(self, notifier: inotify.Inotify, root: str) -> list[str]:
+        """
+        Forget the given directory and all directories below it. Returns the
+        paths of the files that were in them.
+
+        """
+        prefix = root + os.sep
+        file_paths = []
+        for dir_path in [path for path in self._dir_files if path == root or path.startswith(prefix)]:
+            file_names = self._dir_files.pop(dir_path)
+            file_paths.extend(os.path.join(dir_path, file_name) for file_name in file_names)
+        for wd in [wd for wd, path in self._wds.items() if path == root or path.startswith(prefix)]:
+            notifier.rm_watch(wd)
+            del self._wds[wd]
+        return file_paths
+
+    def _run_inotify(self):
+        notifier = inotify.Inotify()
+        self._wds.clear()
+        self._dir_files.clear()
+        try:
+            self._watch_tree(notifier, os.fspath(self.dir_path))
+
+            # Catch up on anything that changed since set_directory().
+            self._dispatch(*self.scanner.scan())
+            self._watching = True
+
+            while not self._stopped:
+                flush_in = self._flush_in()
+                timeout = self.select_timeout if flush_in is None else min(flush_in, self.select_timeout)
+                ready, _, _ = select.select([notifier], [], [], timeout)
+                if not ready:
+                    self._flush()
+                    continue
+                added, removed, modified = {}, {}, {}
+                try:
+                    for event in notifier.read():
+                        self._handle_event(notifier, event, added, removed, modified)
+                except inotify.InotifyLimitError:
+
+                    # Report the events handled so far before falling back to
+                    # polling, which skips changes already known to inotify.
+                    self._dispatch(list(added), list(removed), list(modified))
+                    raise
+                self._dispatch(list(added), list(removed), list(modified))
+        finally:
+            notifier.close()
+
+    def _handle_event(self, notifier: inotify.Inotify, event: tuple, added: dict, removed: dict, modified: dict):
+        """
+        Sort an inotify event into the added, removed and modified files. These
+        are dicts used as ordered sets so a burst of events for one file is
+        reported once.
+
+        """
+        wd, mask, cookie, name = event
+        if mask & inotify.IN_Q_OVERFLOW:
+            logger.warning('inotify queue overflowed, rescanning')
+            before = set(os.path.join(d, f) for d, names in self._dir_files.items() for f in names)
+            for wd in list(self._wds):
+                notifier.rm_watch(wd)
+            self._wds.clear()
+            self._dir_files.clear()
+            after = set(self._watch_tree(notifier, os.fspath(self.dir_path)))
+            added.update(dict.fromkeys(after - before))
+            removed.update(dict.fromkeys(before - after))
+            return
+        if mask & inotify.IN_IGNORED:
+            self._wds.pop(wd, None)
+            return
+        dir_path = self._wds.get(wd)
+        if dir_path is None or not name:
+            return
+        file_path = os.path.join(dir_path, name)
+        if self.path_filter:
+            rel_path = self._relative(file_path)
+            is_dir = mask & inotify.IN_ISDIR
+            if is_dir and not self.path_filter.accepts_dir(rel_path):
+                return
+            elif not is_dir and not self.path_filter.accepts_file(rel_path):
+                return
+        if mask & inotify.IN_ISDIR:
+            if mask & (inotify.IN_CREATE | inotify.IN_MOVED_TO):
+                added.update(dict.fromkeys(self._watch_tree(notifier, file_path)))
+            elif mask & (inotify.IN_DELETE | inotify.IN_MOVED_FROM):
+                for path in self._unwatch_tree(notifier, file_path):
+                    self._remove(path, added, removed, modified)
+            return
+        file_names = self._dir_files.setdefault(dir_path, set())
+        if mask & (inotify.IN_CREATE | inotify.IN_MOVED_TO):
+            if name in file_names or file_path in removed:
+
+                # Replaced, eg by an atomic save.
+                removed.pop(file_path, None)
+                modified[file_path] = None
+            else:
+                added[file_path] = None
+            file_names.add(name)
+        elif mask & (inotify.IN_DELETE | inotify.IN_MOVED_FROM):
+            file_names.discard(name)
+            self._remove(file_path, added, removed, modified)
+        elif mask & (inotify.IN_MODIFY | inotify.IN_ATTRIB):
+            if file_path not in added:
+                modified[file_path] = None
+
+    def _relative(self, path: str) -> str:
+        return PathFilter.relative(os.fspath(self.dir_path), path)
+
+    @staticmethod
+    def _remove(file_path: str, added: dict, removed: dict, modified: dict):
+        modified.pop(file_path, None)
+        if file_path in added:
+            del added[file_path]
+        else:
+            removed[file_path] = None
 
     def on_added(self, file_paths):
         if self.on_added_fn is not None:
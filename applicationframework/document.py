@@ -1,12 +1,19 @@
 import logging
 import os
+from collections.abc import Iterable, Sequence
 from enum import EnumMeta, Flag
 
-from PySide6.QtCore import QCoreApplication
+from PySide6.QtCore import QCoreApplication, QThreadPool, QTimer
 from PySide6.QtWidgets import QApplication
 
-from applicationframework.contentbase import ContentBase
+from applicationframework.contentbase import ChangeSet, ContentBase, ObservableContentBase, Progress
+from applicationframework.fileutils import atomic_path, hash_file
+from applicationframework.handles import ref
 from applicationframework.mixins import HasAppMixin
+from applicationframework.task import Task
+
+# noinspection PyUnresolvedReferences
+from __feature__ import snake_case
 
 
 logger = logging.getLogger(__name__)
@@ -14,10 +21,61 @@ logger = logging.getLogger(__name__)
 
 class Document(HasAppMixin):
 
-    def __init__(self, file_path: str | None, content: ContentBase, UpdateFlag: EnumMeta):
+    """
+    If coalesce_updates is set, calls to updated() accumulate their flags and
+    a single merged update is emitted on the next event loop iteration. Call
+    flush() to deliver a pending update immediately.
+
+    If the content is observable, updated() without flags derives them from
+    the fields that changed, and handlers can inspect doc.changes to see what
+    changed since the previous update.
+
+    The document keeps monotonically increasing generation numbers so caches
+    can be validated with an integer compare. generation is bumped by every
+    update and once per action run, generation_of() returns the generation at
+    which an object or one of its fields last changed through an action or an
+    observed change. Generations are stored per field in flat dicts keyed by
+    object id, and those of objects that no longer exist are pruned.
+
+    Changes to more than bulk_threshold objects at once, eg a SetAttributes
+    over a large selection, are recorded per class and field instead, so
+    generation_of() may report a change for an object of that class that
+    wasn't touched. That only costs a spurious cache rebuild.
+
+    """
+
+    # Number of tracked objects at which dead ones are first pruned.
+    prune_threshold = 1024
+
+    # Number of objects changed at once above which generations are recorded
+    # per class and field rather than per object.
+    bulk_threshold = 1000
+
+    def __init__(
+        self,
+        file_path: str | None,
+        content: ContentBase,
+        UpdateFlag: EnumMeta,
+        coalesce_updates: bool = False,
+    ):
         self.file_path = file_path
         self.content = content
         self.dirty = False
+        self.coalesce_updates = coalesce_updates
+        self._pending_flags = None
+        self.changes = ChangeSet()
+        self.generation = 0
+        self._refs = {}
+        self._generations = {None: {}}
+        self._class_generations = {}
+        self._prune_size = self.prune_threshold
+        if isinstance(content, ObservableContentBase):
+            content.track()
+
+        # Hashes of what was last loaded / saved, used to skip redundant saves.
+        self._saved_path = None
+        self._saved_content_hash = None
+        self._saved_file_hash = None
 
         # Build the update all flag.
         all_mbr = UpdateFlag(0)
@@ -44,23 +102,219 @@ class Document(HasAppMixin):
     def load_flags(self):
         return self.default_flags
 
+    def _load_content(self, progress: Progress | None = None):
+        """
+        Load the content, from the application's content cache if it holds an
+        entry matching the file, otherwise by parsing the file and storing the
+        result in the cache.
+
+        """
+        cache = getattr(self.app(), 'content_cache', None) if self.content.cacheable else None
+        if cache is None or not cache.load(self.file_path, self.content):
+            stat = os.stat(self.file_path) if cache is not None else None
+            if progress is None:
+                self.content.load(self.file_path)
+            else:
+                self.content.load_with_progress(self.file_path, progress)
+            if cache is not None:
+                cache.store(self.file_path, self.content, stat)
+        self._set_saved(self.file_path, self.content.content_hash())
+
+        # Fields set while loading aren't unsaved changes.
+        if isinstance(self.content, ObservableContentBase):
+            self.content.tracker.clear()
+
     def load(self):
         logger.debug(f'Loading content: {self.file_path}')
-        self.content.load(self.file_path)
+        self._load_content()
         self.updated(flags=self.load_flags, dirty=False)
 
+    def _set_saved(self, file_path: str, content_hash: str | None, file_hash: str | None = None):
+        self._saved_path = file_path
+        self._saved_content_hash = content_hash
+        self._saved_file_hash = file_hash
+
+    def _save_content(self, file_path: str, progress: Progress | None = None):
+        """
+        Save the content to a temporary file that is renamed over the target
+        once complete. Nothing is written if the content hash matches the last
+        save, and the rename is skipped if the bytes written are identical.
+
+        """
+        content_hash = self.content.content_hash()
+        is_saved_path = file_path == self._saved_path and os.path.exists(file_path)
+        if content_hash is not None and is_saved_path and content_hash == self._saved_content_hash:
+            logger.debug(f'Content unchanged, skipping save: {file_path}')
+            return
+
+        def write(path: str):
+            if progress is None:
+                self.content.save(path)
+            else:
+                self.content.save_with_progress(path, progress)
+
+        if self.content.writes_atomically:
+            write(file_path)
+            self._set_saved(file_path, content_hash)
+            return
+        with atomic_path(file_path) as temp_path:
+            write(temp_path)
+            file_hash = hash_file(temp_path)
+            if is_saved_path and file_hash == self._saved_file_hash:
+                logger.debug(f'Saved bytes unchanged, keeping existing file: {file_path}')
+                os.remove(temp_path)
+        self._set_saved(file_path, content_hash, file_hash)
+
     def save(self, file_path: str = None):
         file_path = file_path or self.file_path
         logger.debug(f'Saving content: {file_path}')
-        self.content.save(file_path)
+        self._save_content(file_path)
+        self._on_saved()
+
+    def load_async(self, pool: QThreadPool | None = None) -> Task:
+        """
+        Load the content on a worker thread. The returned task reports progress
+        and can be cancelled. When it finishes the update is emitted on the GUI
+        thread.
+
+        """
+        logger.debug(f'Loading content in background: {self.file_path}')
+
+        def load(progress: Progress):
+            self._load_content(progress)
+
+        task = Task(load)
+        task.signals.finished.connect(self._on_loaded)
+        (pool or QThreadPool.global_instance()).start(task)
+        return task
+
+    def save_async(self, file_path: str = None, pool: QThreadPool | None = None) -> Task:
+        """
+        Save the content on a worker thread. The content must not be edited
+        until the returned task has finished.
+
+        """
+        file_path = file_path or self.file_path
+        logger.debug(f'Saving content in background: {file_path}')
+
+        def save(progress: Progress):
+            self._save_content(file_path, progress)
+
+        task = Task(save)
+        task.signals.finished.connect(self._on_saved)
+        (pool or QThreadPool.global_instance()).start(task)
+        return task
+
+    def _on_loaded(self):
+        self.updated(flags=self.load_flags, dirty=False)
+
+    def _on_saved(self):
         self.dirty = False
+        if isinstance(self.content, ObservableContentBase):
+            self.content.tracker.clear_save()
+
+    @property
+    def unsaved_changes(self) -> ChangeSet:
+        if isinstance(self.content, ObservableContentBase):
+            return self.content.tracker.since_save
+        return ChangeSet()
 
     def _emit_updated(self, flags: Flag):
         logger.debug(f'Emitting updated: {flags}')
+        if isinstance(self.content, ObservableContentBase):
+            self.changes = self.content.tracker.take_update()
+            self.bump_many([((obj,), name) for obj in self.changes.objects() for name in self.changes.fields(obj)])
+        else:
+            self.bump()
         self.app().updated.emit(self, flags)
 
+    def bump(self, obj=None, name: str | None = None) -> int:
+        """
+        Increment the generation. If an object is given its generation and, if
+        given, that of its field are set to the new value.
+
+        """
+        return self.bump_many(() if obj is None else [((obj,), name)])
+
+    def bump_many(self, touched: Iterable[tuple[Sequence, str | None]]) -> int:
+        """
+        Increment the generation once and set the generation of the objects
+        in each of the given (objects, field name) pairs, and of that field,
+        to it, eg for everything an action changed. A name of None only sets
+        the objects' generation.
+
+        """
+        generation = self.generation = self.generation + 1
+        refs, generations = self._refs, self._generations
+        obj_generations = generations[None]
+        for objs, name in touched:
+            if len(objs) > self.bulk_threshold:
+                class_generations = self._class_generations
+                for cls in set(map(type, objs)) - {type(None)}:
+                    class_generations[cls, None] = generation
+                    if name is not None:
+                        class_generations[cls, name] = generation
+                continue
+            field_generations = None if name is None else generations.setdefault(name, {})
+            for obj in objs:
+                if obj is None:
+                    continue
+                key = id(obj)
+                obj_ref = refs.get(key)
+                if obj_ref is None or obj_ref() is not obj:
+                    if obj_ref is not None:
+                        self._forget(key)
+                    refs[key] = ref(obj)
+                obj_generations[key] = generation
+                if field_generations is not None:
+                    field_generations[key] = generation
+        if len(refs) > self._prune_size:
+            self._prune()
+        return generation
+
+    def _forget(self, key: int):
+        del self._refs[key]
+        for field_generations in self._generations.values():
+            field_generations.pop(key, None)
+
+    def _prune(self):
+        """Drop the generations of objects that no longer exist."""
+        for key in [key for key, obj_ref in self._refs.items() if obj_ref() is None]:
+            self._forget(key)
+        self._prune_size = max(self.prune_threshold, 2 * len(self._refs))
+
+    def generation_of(self, obj, name: str | None = None) -> int:
+        """
+        Return the generation at which the object, or the given field of it,
+        last changed. Returns 0 if no change has been recorded.
+
+        """
+        class_generation = self._class_generations.get((type(obj), name), 0)
+        key = id(obj)
+        obj_ref = self._refs.get(key)
+        if obj_ref is None or obj_ref() is not obj:
+            return class_generation
+        return max(self._generations.get(name, {}).get(key, 0), class_generation)
+
+    def flush(self):
+        """Emit any pending coalesced update now."""
+        if self._pending_flags is None:
+            return
+        flags, self._pending_flags = self._pending_flags, None
+        self._emit_updated(flags)
+
     def updated(self, flags: Flag | None = None, dirty=True):
+        if not flags and isinstance(self.content, ObservableContentBase):
+            flags = self.content.flags_for(self.content.tracker.since_update)
         flags = flags or self.default_flags
+        if self.app().action_manager.defer_update(flags, dirty):
+            return
         if dirty:
             self.dirty = dirty
-        self._emit_updated(flags)
+        if not self.coalesce_updates:
+            self._emit_updated(flags)
+        elif self._pending_flags is None:
+            self._pending_flags = flags
+            QTimer.single_shot(0, self.flush)
+        else:
+            self._pending_flags |= flags
@@ -0,0 +1,63 @@
+import hashlib
+import os
+import tempfile
+from contextlib import contextmanager
+
+
+CHUNK_SIZE = 1024 * 1024
+
+# The umask can only be read by setting it, which isn't safe while other
+# threads create files, so it's read once on import.
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+
+def hash_file(file_path: str) -> str:
+    h = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        while chunk := f.read(CHUNK_SIZE):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def hash_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _fsync(file_path: str):
+    with open(file_path, 'rb+') as f:
+        os.fsync(f.fileno())
+
+
+@contextmanager
+def atomic_path(file_path: str):
+    """
+    Yield a temporary path next to the given file. If the body succeeds the
+    temporary file is synced to disk and renamed over the target, so the target
+    is never left half written. On failure the temporary file is removed.
+
+    """
+    dir_path = os.path.dirname(os.path.abspath(file_path))
+    fd, temp_path = tempfile.mkstemp(prefix=f'.{os.path.basename(file_path)}.', suffix='.tmp', dir=dir_path)
+    os.close(fd)
+
+    # mkstemp creates the file as owner only, match the file being replaced.
+    if os.path.exists(file_path):
+        mode = os.stat(file_path).st_mode & 0o777
+    else:
+        mode = 0o666 & ~UMASK
+    os.chmod(temp_path, mode)
+    try:
+        yield temp_path
+        if os.path.exists(temp_path):
+            _fsync(temp_path)
+            os.replace(temp_path, file_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def atomic_write(file_path: str, data: bytes):
+    with atomic_path(file_path) as temp_path:
+        with open(temp_path, 'wb') as f:
+            f.write(data)
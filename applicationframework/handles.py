@@ -0,0 +1,206 @@
+import abc
+import array
+import copyreg
+import io
+import logging
+import pickle
+import sys
+import weakref
+import zlib
+from typing import Any, Callable
+
+from PySide6.QtGui import QColor
+
+from propertygrid.types import FilePathQImage
+
+# noinspection PyUnresolvedReferences
+from __feature__ import snake_case
+
+
+logger = logging.getLogger(__name__)
+
+
+# Values at least this big are compressed when stored in the undo history.
+COMPRESS_THRESHOLD = 64 * 1024
+
+
+def _reduce_qcolor(colour: QColor):
+    """
+    The default QColor reduction calls setRgbF by name which doesn't exist when
+    the snake_case feature is enabled, so reduce to the constructor instead.
+
+    """
+    return QColor, (colour.red(), colour.green(), colour.blue(), colour.alpha())
+
+
+# Reducers for types whose default pickling is broken or too heavy.
+dispatch_table = copyreg.dispatch_table.copy()
+dispatch_table[QColor] = _reduce_qcolor
+
+
+class Pickler(pickle.Pickler):
+
+    dispatch_table = dispatch_table
+
+
+class Handle(metaclass=abc.ABCMeta):
+
+    """
+    Lightweight stand-in for a heavy value stored in the undo history. The
+    value is rehydrated when the action is undone or redone.
+
+    """
+
+    __slots__ = ()
+
+    @abc.abstractmethod
+    def resolve(self) -> Any:
+        ...
+
+    def size(self) -> int:
+        return sys.getsizeof(self)
+
+
+class FactoryHandle(Handle):
+
+    """Rebuilds the value by calling a factory, eg an image from its path."""
+
+    __slots__ = ('factory', 'args')
+
+    def __init__(self, factory: Callable, *args):
+        self.factory = factory
+        self.args = args
+
+    def resolve(self) -> Any:
+        return self.factory(*self.args)
+
+
+class PickledHandle(Handle):
+
+    """Holds the value as compressed pickled bytes."""
+
+    __slots__ = ('data',)
+
+    def __init__(self, value: Any):
+        buffer = io.BytesIO()
+        Pickler(buffer, protocol=pickle.HIGHEST_PROTOCOL).dump(value)
+        self.data = zlib.compress(buffer.getvalue())
+
+    def resolve(self) -> Any:
+        return pickle.loads(zlib.decompress(self.data))
+
+    def size(self) -> int:
+        return super().size() + sys.getsizeof(self.data)
+
+
+_handlers: dict[type, Callable[[Any], Any]] = {}
+
+
+def register(type_: type, to_handle: Callable[[Any], Any]):
+    """
+    Register a function that converts values of the given type to a handle. The
+    function may return the value itself if it isn't worth converting.
+
+    """
+    _handlers[type_] = to_handle
+
+
+def to_handle(value: Any) -> Any:
+    to_handle_fn = _handlers.get(type(value))
+    if to_handle_fn is None:
+        return value
+    try:
+        return to_handle_fn(value)
+    except Exception as e:
+        logger.error(f'Failed to create handle for value: {value} error: {e}')
+        return value
+
+
+def from_handle(value: Any) -> Any:
+    return value.resolve() if isinstance(value, Handle) else value
+
+
+# Values whose size is their own and that hold no other objects.
+_ATOMIC_TYPES = (str, bytes, bytearray, int, float, complex, bool, type(None), type, array.array)
+
+
+def sizeof(value: Any, seen: set | None = None, include_shared: bool = False) -> int:
+    """
+    Return an estimate of the memory held by a value in bytes. Containers and
+    object attributes are measured recursively, and buffers that live outside
+    the Python object, eg numpy arrays and QImages, are measured through
+    nbytes / size_in_bytes(). Objects nested in the value that are weakly
+    referenced are shared with the document or other actions and so aren't
+    counted, the same way the journal shares them, unless include_shared is
+    set, eg to measure the document content itself.
+
+    """
+    if isinstance(value, Handle):
+        return value.size()
+    if seen is None:
+        seen = set()
+    elif id(value) in seen or (
+        not include_shared and not isinstance(value, _ATOMIC_TYPES) and weakref.getweakrefcount(value)
+    ):
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, _ATOMIC_TYPES):
+        return size
+    nbytes = getattr(value, 'nbytes', None)
+    if isinstance(nbytes, int):
+        return max(size, nbytes)
+    size_in_bytes = getattr(value, 'size_in_bytes', None)
+    if callable(size_in_bytes):
+        return size + size_in_bytes()
+    if isinstance(value, dict):
+        return size + sum(sizeof(k, seen, include_shared) + sizeof(v, seen, include_shared) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return size + sum(sizeof(item, seen, include_shared) for item in value)
+    for cls in type(value).__mro__:
+        slots = getattr(cls, '__slots__', ())
+        for name in (slots,) if isinstance(slots, str) else slots:
+            if name not in ('__dict__', '__weakref__'):
+                size += sizeof(getattr(value, name, None), seen, include_shared)
+    if isinstance(getattr(value, '__dict__', None), dict):
+        size += sizeof(value.__dict__, seen, include_shared)
+    return size
+
+
+def _compress_large(value: bytes):
+    return PickledHandle(value) if len(value) >= COMPRESS_THRESHOLD else value
+
+
+# Only values whose identity doesn't matter are registered. Mutable values, eg
+# gradients or arrays, are kept live as later actions may edit them in place
+# and must find the same object on undo / redo.
+register(FilePathQImage, lambda value: FactoryHandle(FilePathQImage, value.file_path))
+register(bytes, _compress_large)
+
+
+class _StrongRef:
+
+    """Fallback for objects that don't support weak references."""
+
+    __slots__ = ('obj',)
+
+    def __init__(self, obj):
+        self.obj = obj
+
+    def __call__(self):
+        return self.obj
+
+
+def ref(obj) -> Callable[[], Any]:
+    """
+    Return a reference to an object edited by an action. Weak references are
+    used where possible so that objects removed from the document are not kept
+    alive by the history. Any action that removes an object holds it as a value
+    so it can be restored. CPython shares one weakref per object, so the
+    weakref module itself acts as the registry.
+
+    """
+    try:
+        return weakref.ref(obj)
+    except TypeError:
+        return _StrongRef(obj)
@@ -0,0 +1,138 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from applicationframework.fileutils import hash_file
+
+
+logger = logging.getLogger(__name__)
+
+
+def stat_key(st: os.stat_result) -> tuple[int, int, int, int]:
+    return st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns
+
+
+class HashCache:
+
+    """
+    Verifies that files reported as modified really changed by comparing
+    content hashes. A file whose size changed is reported straight away, one
+    whose size is the same is hashed with chunked reads on a thread pool and
+    reported only if the hash differs from the last one seen for it.
+
+    Hashes are cached per (device, inode, size, mtime) so a file is read again
+    only once its stat changes. A file is reported unverified if no previous
+    hash is known for it, use track() to record hashes for files ahead of
+    their first modification.
+
+    A file modified within racy_window nanoseconds of being hashed may change
+    again without its stat changing, so its hash isn't cached and it's hashed
+    again when next reported.
+
+    """
+
+    racy_window = 2_000_000_000
+
+    def __init__(self, max_workers: int | None = None, max_entries: int = 100_000):
+        self.max_workers = max_workers
+        self.max_entries = max_entries
+        self._executor = None
+        self._lock = threading.Lock()
+        self._hashes: OrderedDict[tuple, str] = OrderedDict()
+        self._files: dict[str, tuple[tuple, str | None]] = {}
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix='HashCache')
+        return self._executor
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _is_racy(self, key: tuple) -> bool:
+        return time.time_ns() - key[3] < self.racy_window
+
+    def _hash(self, file_path: str, key: tuple) -> str | None:
+        with self._lock:
+            file_hash = self._hashes.get(key)
+            if file_hash is not None:
+                self._hashes.move_to_end(key)
+                return file_hash
+        try:
+            file_hash = hash_file(file_path)
+        except OSError as e:
+            logger.debug(f'Failed to hash file: {file_path} error: {e}')
+            return None
+        if self._is_racy(key):
+            return file_hash
+        with self._lock:
+            self._hashes[key] = file_hash
+            while len(self._hashes) > self.max_entries:
+                self._hashes.popitem(last=False)
+        return file_hash
+
+    def _submit(self, file_path: str, key: tuple) -> Future:
+        with self._lock:
+            self._files[file_path] = (key, None)
+        return self._get_executor().submit(self._record, file_path, key)
+
+    def _record(self, file_path: str, key: tuple) -> str | None:
+        file_hash = self._hash(file_path, key)
+        with self._lock:
+
+            # Skip if forgotten or submitted again meanwhile.
+            if self._files.get(file_path) != (key, None):
+                return file_hash
+            if self._is_racy(key):
+
+                # Never matches a future stat, so the file is hashed again.
+                key = key[:3] + (-1,)
+            self._files[file_path] = (key, file_hash)
+        return file_hash
+
+    def track(self, file_paths: list[str]) -> list[Future]:
+        """Record the hashes of the given files in the background."""
+        futures = []
+        for file_path in file_paths:
+            try:
+                key = stat_key(os.stat(file_path))
+            except OSError:
+                continue
+            futures.append(self._submit(file_path, key))
+        return futures
+
+    def forget(self, file_paths: list[str]):
+        with self._lock:
+            for file_path in file_paths:
+                self._files.pop(file_path, None)
+
+    def verify(self, file_paths: list[str]) -> list[str]:
+        """Return those of the given files whose content changed."""
+        changed, pending = [], []
+        for file_path in file_paths:
+            try:
+                key = stat_key(os.stat(file_path))
+            except OSError:
+
+                # Gone, will be reported as removed.
+                continue
+            with self._lock:
+                old_key, old_hash = self._files.get(file_path, (None, None))
+            if old_key == key:
+                continue
+            elif old_key is None or old_hash is None or old_key[2] != key[2]:
+                changed.append(file_path)
+                self._submit(file_path, key)
+            else:
+                pending.append((file_path, old_hash, self._submit(file_path, key)))
+        for file_path, old_hash, future in pending:
+            if future.result() != old_hash:
+                changed.append(file_path)
+            else:
+                logger.debug(f'Content unchanged, ignoring modification: {file_path}')
+        return changed
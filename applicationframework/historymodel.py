@@ -0,0 +1,56 @@
+from enum import Flag
+
+from PySide6.QtCore import QAbstractListModel, QModelIndex, Qt
+from PySide6.QtGui import QFont
+
+from applicationframework.actions import Base, Manager
+from applicationframework.document import Document
+from applicationframework.mixins import HasAppMixin
+
+# noinspection PyUnresolvedReferences
+from __feature__ import snake_case
+
+
+class HistoryModel(HasAppMixin, QAbstractListModel):
+
+    """
+    List model exposing an action manager's history to a view. Rows are read
+    through Manager.history() so the queues are never copied. Row 0 is the
+    clean state before any actions, row n is the state after the nth action.
+    Actions that can be redone are displayed in italics.
+
+    """
+
+    def __init__(self, manager: Manager, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.manager = manager
+        self.app().updated.connect(self.update_event)
+
+    def action(self, index: QModelIndex) -> Base | None:
+        if not index.is_valid() or index.row() == 0:
+            return None
+        return self.manager.history()[index.row() - 1]
+
+    def current_row(self) -> int:
+        return self.manager.index
+
+    def row_count(self, parent=None, *args, **kwargs):
+        if parent is not None and parent.is_valid():
+            return 0
+        return len(self.manager.history()) + 1
+
+    def data(self, index, role=None):
+        if not index.is_valid():
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            action = self.action(index)
+            return '<clean>' if action is None else action.action_type().__name__
+        elif role == Qt.ItemDataRole.FontRole and index.row() > self.current_row():
+            font = QFont()
+            font.set_italic(True)
+            return font
+
+    def update_event(self, doc: Document, flags: Flag):
+        self.begin_reset_model()
+        self.end_reset_model()
@@ -0,0 +1,113 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import struct
+import sys
+
+
+IN_ACCESS = 0x00000001
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_ISDIR = 0x40000000
+
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+EVENT = struct.Struct('iIII')
+
+
+class InotifyError(OSError):
+
+    pass
+
+
+class InotifyLimitError(InotifyError):
+
+    """Raised when the per user instance or watch limit has been reached."""
+
+
+def _load_libc():
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+_libc = _load_libc()
+
+
+def is_available() -> bool:
+    return _libc is not None
+
+
+def _raise_errno(msg: str):
+    code = ctypes.get_errno()
+    cls = InotifyLimitError if code in (errno.ENOSPC, errno.EMFILE, errno.ENFILE) else InotifyError
+    raise cls(code, f'{msg}: {os.strerror(code)}')
+
+
+class Inotify:
+
+    """
+    Minimal ctypes wrapper around the Linux inotify API. The file descriptor
+    is non-blocking, use fileno() with select to wait for events.
+
+    """
+
+    def __init__(self):
+        if _libc is None:
+            raise InotifyError(errno.ENOSYS, 'inotify is not available on this platform')
+        self.fd = _libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            _raise_errno('Failed to initialise inotify')
+
+    def fileno(self) -> int:
+        return self.fd
+
+    def add_watch(self, path: str, mask: int) -> int:
+        wd = _libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            _raise_errno(f'Failed to watch: {path}')
+        return wd
+
+    def rm_watch(self, wd: int):
+        _libc.inotify_rm_watch(self.fd, wd)
+
+    def read(self, size: int = 64 * 1024) -> list[tuple[int, int, int, str]]:
+        """Return the pending (wd, mask, cookie, name) events, if any."""
+        try:
+            data = os.read(self.fd, size)
+        except BlockingIOError:
+            return []
+        events = []
+        pos = 0
+        while pos < len(data):
+            wd, mask, cookie, length = EVENT.unpack_from(data, pos)
+            pos += EVENT.size
+            name = os.fsdecode(data[pos:pos + length].rstrip(b'\0'))
+            pos += length
+            events.append((wd, mask, cookie, name))
+        return events
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
@@ -0,0 +1,208 @@
+import io
+import logging
+import os
+import pickle
+import tempfile
+import weakref
+
+from applicationframework.actions import Base
+from applicationframework.handles import Pickler, ref
+
+
+logger = logging.getLogger(__name__)
+
+
+class _Pickler(Pickler):
+
+    """
+    Writes the action's references by index. So do any other objects in its
+    values that are weakly referenced, ie that other actions edit by
+    identity, eg an object removed by this action but edited by an older one.
+    These are collected in shared and held strongly by the journal entry,
+    otherwise the removed object would die and undo would restore a copy the
+    older actions don't point at.
+
+    """
+
+    def __init__(self, file, references: tuple, *args, **kwargs):
+        super().__init__(file, *args, **kwargs)
+
+        self._ids = {id(obj): i for i, obj in enumerate(references)}
+        self._num_references = len(references)
+        self.root = None
+        self.shared = []
+
+    def dump(self, obj):
+        self.root = obj
+        super().dump(obj)
+
+    def persistent_id(self, obj):
+        pid = self._ids.get(id(obj))
+        if pid is not None or obj is self.root or isinstance(obj, type) or not weakref.getweakrefcount(obj):
+            return pid
+        pid = self._ids[id(obj)] = self._num_references + len(self.shared)
+        self.shared.append(obj)
+        return pid
+
+
+class _Unpickler(pickle.Unpickler):
+
+    def __init__(self, file, references: tuple, *args, **kwargs):
+        super().__init__(file, *args, **kwargs)
+
+        self._references = references
+
+    def persistent_load(self, pid):
+        return self._references[pid]
+
+
+class JournalEntry(Base):
+
+    """
+    Placeholder for an action that has been spilled to a journal. References
+    to the objects the action edits are held here so they keep their identity
+    when the action is reloaded, while the action's values only live on disk.
+
+    """
+
+    __slots__ = ('journal', 'offset', 'length', 'action_class', '_references', '_shared')
+
+    spilled = True
+
+    def __init__(
+        self,
+        journal: 'Journal',
+        offset: int,
+        length: int,
+        action_class: type,
+        references: tuple,
+        shared: tuple = (),
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+
+        self.journal = journal
+        self.offset = offset
+        self.length = length
+        self.action_class = action_class
+        self._references = tuple(ref(obj) for obj in references)
+        self._shared = shared
+
+    def __repr__(self) -> str:
+        return f'<spilled {self.action_class.__module__}.{self.action_class.__qualname__} at {hex(id(self))}>'
+
+    def action_type(self) -> type:
+        return self.action_class
+
+    def references(self) -> list:
+        return [obj_ref() for obj_ref in self._references]
+
+    def load(self) -> Base:
+        return self.journal.read(self)
+
+    def undo(self):
+        return self.load().undo()
+
+    def redo(self):
+        return self.load().redo()
+
+    def destroy(self):
+        self.journal.release(self)
+
+
+class Journal:
+
+    """
+    Append-only file of pickled actions. Used by the action manager to move
+    older undo actions out of memory. Values are written by value while the
+    objects returned by Base.references() are written by reference so that
+    reloaded actions still edit the live objects.
+
+    Space is reclaimed as entries are destroyed, eg when evicted or reloaded
+    by undo. The file is truncated once no entries are left, and compacted
+    once less than compact_ratio of it is still in use.
+
+    """
+
+    compact_ratio = 0.5
+
+    # Files smaller than this are not worth compacting.
+    compact_threshold = 1024 * 1024
+
+    def __init__(self, dir_path: str | None = None):
+        self.dir_path = dir_path
+        self.file = self._open()
+        self._entries: dict[int, JournalEntry] = {}
+        self._live_bytes = 0
+
+    def __len__(self) -> int:
+        self.file.seek(0, os.SEEK_END)
+        return self.file.tell()
+
+    def _open(self):
+        return tempfile.TemporaryFile(prefix='undo-', suffix='.journal', dir=self.dir_path)
+
+    def live_bytes(self) -> int:
+        """Return the number of bytes held by entries that are still in use."""
+        return self._live_bytes
+
+    def write(self, action: Base) -> JournalEntry:
+        references = tuple(action.references())
+        buffer = io.BytesIO()
+        pickler = _Pickler(buffer, references, protocol=pickle.HIGHEST_PROTOCOL)
+        pickler.dump(action)
+        data = buffer.getvalue()
+        self.file.seek(0, os.SEEK_END)
+        offset = self.file.tell()
+        self.file.write(data)
+        entry = JournalEntry(
+            self,
+            offset,
+            len(data),
+            action.action_type(),
+            references,
+            tuple(pickler.shared),
+            flags=action.flags,
+        )
+        self._entries[id(entry)] = entry
+        self._live_bytes += len(data)
+        return entry
+
+    def read(self, entry: JournalEntry) -> Base:
+        self.file.seek(entry.offset)
+        data = self.file.read(entry.length)
+        references = tuple(entry.references()) + entry._shared
+        return _Unpickler(io.BytesIO(data), references).load()
+
+    def release(self, entry: JournalEntry):
+        """Mark the entry's space as free."""
+        if self._entries.pop(id(entry), None) is None:
+            return
+        self._live_bytes -= entry.length
+        if not self._entries:
+            self.clear()
+            return
+        num_bytes = len(self)
+        if num_bytes >= self.compact_threshold and self._live_bytes < num_bytes * self.compact_ratio:
+            self.compact()
+
+    def compact(self):
+        """Rewrite the file with only the entries still in use."""
+        logger.debug(f'Compacting journal: {len(self)} bytes live: {self._live_bytes}')
+        file = self._open()
+        for entry in sorted(self._entries.values(), key=lambda entry: entry.offset):
+            self.file.seek(entry.offset)
+            data = self.file.read(entry.length)
+            entry.offset = file.tell()
+            file.write(data)
+        self.file.close()
+        self.file = file
+
+    def clear(self):
+        self.file.seek(0)
+        self.file.truncate()
+        self._entries.clear()
+        self._live_bytes = 0
+
+    def close(self):
+        self.file.close()
@@ -1,13 +1,19 @@
+import os
 from enum import Flag
+from functools import partial
 from pathlib import Path
 
+from PySide6.QtCore import Qt
 from PySide6.QtGui import QAction, QIcon, QKeySequence
-from PySide6.QtWidgets import QApplication, QFileDialog, QMainWindow, QMessageBox, QToolBar
+from PySide6.QtWidgets import QApplication, QFileDialog, QMainWindow, QMessageBox, QProgressDialog, QToolBar
 
 from applicationframework.application import Application
+from applicationframework.contentcache import ContentCache
 from applicationframework.document import Document
 from applicationframework.openrecentmenu import OpenRecentMenu
 from applicationframework.preferencesmanager import PreferencesManager
+from applicationframework.recoverylog import RecoveryLog
+from applicationframework.task import Task
 
 # noinspection PyUnresolvedReferences
 from __feature__ import snake_case
@@ -15,6 +21,18 @@ from __feature__ import snake_case
 
 class MainWindow(QMainWindow):
 
+    # Record the action stream next to the document so that unsaved changes
+    # can be replayed after a crash.
+    use_recovery_log = False
+
+    # Load and save documents on a worker thread, showing a progress dialog
+    # instead of blocking the GUI.
+    use_async_io = False
+
+    # Cache parsed content on disk so reopening an unchanged file skips the
+    # parse.
+    use_content_cache = False
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
@@ -32,6 +50,9 @@ class MainWindow(QMainWindow):
         self.app().preferences_manager.register_widget('main_window', self)
         self.app().preferences_manager.register_widget('open_recent_menu', self.open_recent_menu)
 
+        if self.use_content_cache and self.app().content_cache is None:
+            self.app().content_cache = ContentCache()
+
         # Default state is an empty document.
         self.app().doc = self.create_document()
 
@@ -76,8 +97,8 @@ class MainWindow(QMainWindow):
         self.exit_action.triggered.connect(self.exit_event)
 
         # Edit actions.
-        self.undo_action.triggered.connect(self.app().action_manager.undo)
-        self.redo_action.triggered.connect(self.app().action_manager.redo)
+        self.undo_action.triggered.connect(self.undo_event)
+        self.redo_action.triggered.connect(self.redo_event)
         self.copy_action.triggered.connect(self.copy_event)
         self.paste_action.triggered.connect(self.paste_event)
 
@@ -118,10 +139,8 @@ class MainWindow(QMainWindow):
 
     def update_actions(self):
 
-        # File actions.
-        self.open_recent_menu.update_actions()
-
-        # Edit actions.
+        # Edit actions. The open recent menu updates itself when its paths
+        # change so doesn't need rebuilding here.
         undo_enabled = bool(self.app().action_manager.undos)
         self.undo_action.set_enabled(undo_enabled)
         redo_enabled = bool(self.app().action_manager.redos)
@@ -144,15 +163,87 @@ class MainWindow(QMainWindow):
                 QMessageBox.StandardButton.No,
             )
             if result == QMessageBox.StandardButton.Yes:
-                self.save_event()
+                return self.save_event(wait=True)
             elif result == QMessageBox.StandardButton.Cancel:
                 return False
         return True
 
+    def prefetch_recent(self):
+        """
+        Read the cache entry of the most recently opened file in the background
+        so that reopening it is quick. Call once the preferences are loaded.
+
+        """
+        paths = self.open_recent_menu.paths()
+        if self.app().content_cache is not None and paths:
+            self.app().content_cache.prefetch(str(paths[-1]))
+
+    def start_recovery_log(self):
+        self.stop_recovery_log()
+        doc = self.app().doc
+        if not self.use_recovery_log or doc.file_path is None:
+            return
+        log_path = RecoveryLog.get_log_path(doc.file_path)
+        self.app().action_manager.recovery_log = RecoveryLog(log_path, doc.content)
+
+    def stop_recovery_log(self, remove: bool = False):
+        manager = self.app().action_manager
+        if manager.recovery_log is not None:
+            manager.recovery_log.close(remove=remove)
+            manager.recovery_log = None
+
+    def recover(self) -> bool:
+        """
+        Offer to replay the recovery log of the current document on top of its
+        saved content. All logged actions are applied with a single update.
+
+        """
+        doc = self.app().doc
+        if not self.use_recovery_log or doc.file_path is None or not RecoveryLog.exists(doc.file_path):
+            return False
+        log_path = RecoveryLog.get_log_path(doc.file_path)
+        msg = f'The document "{doc.title}" has unsaved changes from a previous session.\nRecover them?'
+        result = QMessageBox.question(
+            self,
+            'Recover Changes?',
+            msg,
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+            QMessageBox.StandardButton.Yes,
+        )
+        if result != QMessageBox.StandardButton.Yes:
+            os.remove(log_path)
+            return False
+        manager = self.app().action_manager
+        manager.reset()
+        flags = RecoveryLog.replay(log_path, doc.content, manager)
+        doc.updated(flags, dirty=True)
+        return True
+
+    def set_busy(self, label: str, task: Task):
+        """
+        Show a modal progress dialog while the task runs. Cancelling the dialog
+        cancels the task. The dialog is shown straight away so that the document
+        can't be edited while the task is using it.
+
+        """
+        dialog = QProgressDialog(label, 'Cancel', 0, 100, self)
+        dialog.set_window_modality(Qt.WindowModality.WindowModal)
+        dialog.set_minimum_duration(0)
+        dialog.canceled.connect(task.cancel)
+        task.signals.progress.connect(lambda fraction: dialog.set_value(int(fraction * 100)))
+        for signal in (task.signals.finished, task.signals.cancelled, task.signals.failed):
+            signal.connect(dialog.reset)
+            signal.connect(dialog.delete_later)
+        task.signals.failed.connect(self.task_failed_event)
+
+    def task_failed_event(self, error: Exception):
+        QMessageBox.critical(self, 'Error', str(error))
+
     def close_event(self, event):
         if not self.check_for_save():
             event.ignore()
             return False
+        self.stop_recovery_log(remove=True)
         self.app().preferences_manager.save()
         return True
 
@@ -161,6 +252,7 @@ class MainWindow(QMainWindow):
             return False
         # TODO: Allow option box for creating document of specific type.
 
+        self.stop_recovery_log(remove=True)
         self.app().doc = self.create_document()
         self.app().doc.updated(flags=self.app().doc.new_flags, dirty=False)
         return True
@@ -174,18 +266,71 @@ class MainWindow(QMainWindow):
                 file_path, file_format = QFileDialog.get_open_file_name()
             if file_path:
                 self.open_recent_menu.add_file_path(file_path)
+
+                # The old document's recovery log is kept until the new one
+                # has loaded, in case the load fails or is cancelled.
+                old_doc = self.app().doc
                 self.app().doc = self.create_document(file_path)
-                self.app().doc.load()
+                if self.use_async_io:
+                    self.open_task = self.app().doc.load_async()
+                    self.open_task.signals.finished.connect(self.opened_event)
+                    for signal in (self.open_task.signals.cancelled, self.open_task.signals.failed):
+                        signal.connect(partial(self.open_cancelled_event, old_doc))
+                    self.set_busy(f'Opening {file_path}...', self.open_task)
+                else:
+                    try:
+                        self.app().doc.load()
+                    except BaseException:
+                        self.open_cancelled_event(old_doc)
+                        raise
+                    self.opened_event()
                 return True
         return False
 
-    def save_event(self, save_as: bool = False):
-        if self.app().doc.file_path is None or save_as:
+    def opened_event(self):
+        self.stop_recovery_log(remove=True)
+        self.recover()
+        self.start_recovery_log()
+
+    def open_cancelled_event(self, old_doc: Document, *args):
+
+        # Go back to the document that was open before. Its recovery log was
+        # never stopped so it carries on recording.
+        self.app().doc = old_doc
+
+    def save_event(self, save_as: bool = False, wait: bool = False):
+        """
+        Save the document, asking for a file path if it doesn't have one. When
+        saving in the background and wait is True a local event loop is run
+        until the save is done, and only a successful save returns True.
+
+        """
+        file_path = self.app().doc.file_path
+        if file_path is None or save_as:
             file_path, file_format = QFileDialog.get_save_file_name()
             if not file_path:
                 return False
-            self.app().doc.file_path = file_path
-        self.app().doc.save()
+        if self.use_async_io:
+            self.save_task = self.app().doc.save_async(file_path)
+            self.save_task.signals.finished.connect(partial(self.saved_event, file_path))
+            self.set_busy(f'Saving {file_path}...', self.save_task)
+            return self.save_task.wait() if wait else True
+        self.app().doc.save(file_path)
+        self.saved_event(file_path)
+        return True
+
+    def saved_event(self, file_path: str | None = None):
+
+        # The document only takes the new path once it has been written to, so
+        # a failed save as leaves the old path and recovery log in place.
+        doc = self.app().doc
+        if file_path is not None and file_path != doc.file_path:
+            self.stop_recovery_log(remove=True)
+            doc.file_path = file_path
+        if self.app().action_manager.recovery_log is not None:
+            self.app().action_manager.recovery_log.clear()
+        else:
+            self.start_recovery_log()
 
         # Don't call doc.updated here as we only really want to update the
         # window title. What we would really want is a base update flag that
@@ -193,11 +338,18 @@ class MainWindow(QMainWindow):
         # clases...
         self.update_window_title()
 
-        return True
-
     def save_as_event(self):
         self.save_event(save_as=True)
 
+    def undo_event(self):
+
+        # Looked up when triggered as a workspace swaps the manager when the
+        # active document changes.
+        self.app().action_manager.undo()
+
+    def redo_event(self):
+        self.app().action_manager.redo()
+
     def copy_event(self):
         pass
 
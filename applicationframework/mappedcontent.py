@@ -0,0 +1,246 @@
+import array
+import dataclasses
+import io
+import json
+import logging
+import mmap
+import os
+import pickle
+import struct
+import zlib
+
+from applicationframework.contentbase import ContentBase
+from applicationframework.fileutils import atomic_path
+from applicationframework.handles import Pickler
+
+
+logger = logging.getLogger(__name__)
+
+
+MAGIC = b'QXMC'
+VERSION = 1
+HEADER = struct.Struct('<4sIQQ')
+
+PICKLE = 'pickle'
+ARRAY = 'array'
+
+
+def _encode(value) -> tuple[bytes, str, str]:
+    if isinstance(value, array.array):
+        return value.tobytes(), ARRAY, value.typecode
+    buffer = io.BytesIO()
+    Pickler(buffer, protocol=pickle.HIGHEST_PROTOCOL).dump(value)
+    return buffer.getvalue(), PICKLE, ''
+
+
+def _decode(data, kind: str, typecode: str):
+    if kind == ARRAY:
+        value = array.array(typecode)
+        value.frombytes(data)
+        return value
+    return pickle.loads(data)
+
+
+class MappedField:
+
+    """
+    Data descriptor installed on the class for each mapped field. Takes
+    precedence over class level defaults, eg those of a dataclass, so a field
+    that hasn't been accessed yet is decoded from the mapping rather than
+    read from the class.
+
+    """
+
+    def __init__(self, name: str, default=dataclasses.MISSING):
+        self.name = name
+        self.default = default
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            if self.default is dataclasses.MISSING:
+                raise AttributeError(self.name)
+            return self.default
+        try:
+            return instance.__dict__[self.name]
+        except KeyError:
+            return instance._materialise(self.name, self.default)
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.name] = value
+
+    def __delete__(self, instance):
+        del instance.__dict__[self.name]
+
+
+class MappedContentBase(ContentBase):
+
+    """
+    Content backed by a memory-mapped binary file. Opening only reads the
+    header and index. Each field listed in mapped_fields is decoded from the
+    mapping the first time it is accessed, so untouched fields stay on disk.
+    array.array fields are stored as raw bytes, everything else is pickled.
+    Subclasses may be dataclasses, fields are replaced by MappedField
+    descriptors when the first instance is created.
+
+    Saving back to the same file appends only the fields that were accessed
+    and whose encoded bytes differ, then appends a new index and finally
+    updates the header to point at it, so a crash never leaves the file
+    inconsistent. The file is compacted once the dead space outgrows the live
+    data.
+
+    """
+
+    writes_atomically = True
+    cacheable = False
+    mapped_fields: tuple[str, ...] = ()
+
+    def __new__(cls, *args, **kwargs):
+
+        # Set up here rather than in __init__ as a dataclass's generated
+        # __init__ doesn't call the base class's.
+        if '_mapped_installed' not in cls.__dict__:
+            cls._install_fields()
+        self = super().__new__(cls)
+        self._file_path = None
+        self._file = None
+        self._mmap = None
+        self._index = {}
+        return self
+
+    @classmethod
+    def _install_fields(cls):
+        for name in cls.mapped_fields:
+            default = dataclasses.MISSING
+            for base in cls.__mro__:
+                if name in base.__dict__:
+                    default = base.__dict__[name]
+                    break
+            if not isinstance(default, MappedField):
+                setattr(cls, name, MappedField(name, default))
+        cls._mapped_installed = True
+
+    def _materialise(self, name: str, default):
+        entry = self._index.get(name)
+        if entry is None:
+            if default is dataclasses.MISSING:
+                raise AttributeError(name)
+            return default
+        offset, length, kind, typecode, crc = entry
+        value = _decode(self._mmap[offset:offset + length], kind, typecode)
+        self.__dict__[name] = value
+        return value
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self.__dict__
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _open(self, file_path: str):
+        self.close()
+        self._file = open(file_path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, index_offset, index_length = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'Not a mapped content file: {file_path}')
+        self._index = json.loads(self._mmap[index_offset:index_offset + index_length])
+        self._file_path = file_path
+
+    def load(self, file_path: str):
+        for name in self.mapped_fields:
+            self.__dict__.pop(name, None)
+        self._open(file_path)
+
+    def _live_bytes(self) -> int:
+        return sum(entry[1] for entry in self._index.values())
+
+    def _write_full(self, file_path: str):
+        with atomic_path(file_path) as temp_path:
+            with open(temp_path, 'wb') as f:
+                f.write(HEADER.pack(MAGIC, VERSION, 0, 0))
+                index = {}
+                for name in self.mapped_fields:
+                    if self.is_loaded(name) or name not in self._index:
+                        data, kind, typecode = _encode(getattr(self, name))
+                    else:
+                        offset, length, kind, typecode, crc = self._index[name]
+                        data = self._mmap[offset:offset + length]
+                    index[name] = [f.tell(), len(data), kind, typecode, zlib.crc32(data)]
+                    f.write(data)
+                index_data = json.dumps(index).encode()
+                index_offset = f.tell()
+                f.write(index_data)
+                f.seek(0)
+                f.write(HEADER.pack(MAGIC, VERSION, index_offset, len(index_data)))
+
+            # A mapped file can't be replaced on Windows.
+            self.close()
+
+    def _write_incremental(self):
+        changed = {}
+        for name in self.mapped_fields:
+            if not self.is_loaded(name):
+                continue
+            data, kind, typecode = _encode(self.__dict__[name])
+            crc = zlib.crc32(data)
+            entry = self._index.get(name)
+            if entry is not None and entry[1] == len(data) and entry[4] == crc:
+                continue
+            changed[name] = (data, kind, typecode, crc)
+        if not changed:
+            logger.debug(f'No fields changed, skipping save: {self._file_path}')
+            return
+        logger.debug(f'Writing changed fields: {list(changed)}')
+        index = dict(self._index)
+        with open(self._file_path, 'r+b') as f:
+            f.seek(0, os.SEEK_END)
+            for name, (data, kind, typecode, crc) in changed.items():
+                index[name] = [f.tell(), len(data), kind, typecode, crc]
+                f.write(data)
+            index_data = json.dumps(index).encode()
+            index_offset = f.tell()
+            f.write(index_data)
+            f.flush()
+            os.fsync(f.fileno())
+
+            # Only now point the header at the new index.
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, VERSION, index_offset, len(index_data)))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def save(self, file_path: str):
+        old_file_path = self._file_path
+        try:
+            self._save(file_path)
+        except BaseException:
+
+            # Fields that weren't accessed still need the old mapping.
+            if self._mmap is None and old_file_path is not None and os.path.exists(old_file_path):
+                self._open(old_file_path)
+            raise
+
+    def _save(self, file_path: str):
+        same_file = (
+            self._file_path is not None and
+            os.path.exists(file_path) and
+            os.path.samefile(file_path, self._file_path) and
+            set(self._index) == set(self.mapped_fields)
+        )
+        if same_file:
+            self._write_incremental()
+            self._open(file_path)
+            if os.path.getsize(file_path) > 2 * self._live_bytes() + HEADER.size:
+                logger.debug(f'Compacting mapped content: {file_path}')
+                self._write_full(file_path)
+        else:
+            self._write_full(file_path)
+
+        # Reopen so fields that were never accessed now point into the file
+        # that was just written.
+        self._open(file_path)
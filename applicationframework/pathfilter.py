@@ -0,0 +1,111 @@
+import functools
+import os
+import re
+from typing import Iterable
+
+
+def translate_glob(pattern: str) -> str:
+    """
+    Translate a glob to a regex. * and ? don't match across directories, **
+    matches any number of directories.
+
+    """
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if pattern.startswith('**/', i):
+            out.append('(?:.*/)?')
+            i += 3
+            continue
+        elif pattern.startswith('**', i):
+            out.append('.*')
+            i += 2
+            continue
+        elif c == '*':
+            out.append('[^/]*')
+        elif c == '?':
+            out.append('[^/]')
+        elif c == '[' and pattern.find(']', i + 2) != -1:
+            j = pattern.find(']', i + 2)
+            chars = pattern[i + 1:j].replace('\\', '\\\\')
+            if chars.startswith('!'):
+                chars = '^' + chars[1:]
+            out.append(f'[{chars}]')
+            i = j
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return ''.join(out)
+
+
+def _rule_regex(rule: str | re.Pattern, dir_prefix: bool = False) -> str:
+    if isinstance(rule, re.Pattern):
+        return f'(?:{rule.pattern})'
+    elif rule.startswith('re:'):
+        return f'(?:{rule[3:]})'
+
+    # Like .gitignore, a glob without a slash matches the name at any depth,
+    # otherwise it's anchored to the root. A glob ending in a slash matches
+    # paths below the directory if dir_prefix is set.
+    glob = rule.rstrip('/')
+    end = '/' if dir_prefix and rule.endswith('/') else '$'
+    if '/' in glob:
+        return f'^{translate_glob(glob.lstrip("/"))}{end}'
+    return f'(?:^|/){translate_glob(glob)}{end}'
+
+
+@functools.lru_cache(maxsize=64)
+def compile_rules(rules: tuple[str | re.Pattern, ...], dir_prefix: bool = False) -> re.Pattern | None:
+    """
+    Combine the rules into a single regex searched against '/' separated
+    paths relative to the root. The result is cached per rule set.
+
+    """
+    if not rules:
+        return None
+    return re.compile('|'.join(_rule_regex(rule, dir_prefix) for rule in rules))
+
+
+class PathFilter:
+
+    """
+    Include and exclude rules for paths below a root. Rules are globs, or
+    regexes if prefixed with 're:' or given as compiled patterns. A glob
+    ending in a slash only matches directories; as an include rule it accepts
+    every file below a matching directory. Excluded directories are not
+    descended into. If there are include rules only files matching one of
+    them are accepted.
+
+    """
+
+    def __init__(
+        self,
+        include: Iterable[str | re.Pattern] = (),
+        exclude: Iterable[str | re.Pattern] = (),
+    ):
+        include, exclude = tuple(include), tuple(exclude)
+        self._include = compile_rules(include, dir_prefix=True)
+        self._exclude = compile_rules(tuple(rule for rule in exclude if not self._dir_only(rule)))
+        self._exclude_dirs = compile_rules(exclude)
+
+    def __bool__(self) -> bool:
+        return self._include is not None or self._exclude_dirs is not None
+
+    @staticmethod
+    def _dir_only(rule: str | re.Pattern) -> bool:
+        return isinstance(rule, str) and not rule.startswith('re:') and rule.endswith('/')
+
+    @staticmethod
+    def relative(root: str, path: str) -> str:
+        """Return the path relative to the root with '/' separators."""
+        rel_path = os.path.relpath(path, root)
+        return rel_path.replace(os.sep, '/') if os.sep != '/' else rel_path
+
+    def accepts_dir(self, rel_path: str) -> bool:
+        return self._exclude_dirs is None or self._exclude_dirs.search(rel_path) is None
+
+    def accepts_file(self, rel_path: str) -> bool:
+        if self._exclude is not None and self._exclude.search(rel_path) is not None:
+            return False
+        return self._include is None or self._include.search(rel_path) is not None
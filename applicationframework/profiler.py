@@ -0,0 +1,88 @@
+import json
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+
+
+@dataclass
+class Stats:
+
+    count: int = 0
+    total: float = 0.0
+    min: float = float('inf')
+    max: float = 0.0
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def add(self, duration: float):
+        self.count += 1
+        self.total += duration
+        self.min = min(self.min, duration)
+        self.max = max(self.max, duration)
+
+
+@dataclass
+class Sample:
+
+    time: float
+    undo_depth: int
+    redo_depth: int
+    memory: int
+
+
+class Profiler:
+
+    """
+    Opt-in instrumentation for the action manager. Records wall time per
+    action class for execute, undo and redo, the time spent in the resulting
+    document update, and samples of history depth and memory over time.
+
+    Enable by assigning an instance to Manager.profiler.
+
+    """
+
+    def __init__(self, max_samples: int = 10000):
+        self.stats: dict[tuple[str, str], Stats] = {}
+        self.samples = deque(maxlen=max_samples)
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def timer(self, name: str, op: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, op, time.perf_counter() - start)
+
+    def add(self, name: str, op: str, duration: float):
+        stats = self.stats.get((name, op))
+        if stats is None:
+            stats = self.stats[(name, op)] = Stats()
+        stats.add(duration)
+
+    def sample(self, undo_depth: int, redo_depth: int, memory: int):
+        self.samples.append(Sample(time.perf_counter() - self._start, undo_depth, redo_depth, memory))
+
+    def reset(self):
+        self.stats.clear()
+        self.samples.clear()
+        self._start = time.perf_counter()
+
+    def report(self) -> dict:
+        return {
+            'stats': [
+                {'name': name, 'op': op, 'mean': stats.mean, **asdict(stats)}
+                for (name, op), stats in sorted(self.stats.items(), key=lambda item: -item[1].total)
+            ],
+            'samples': [asdict(sample) for sample in self.samples],
+        }
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.report(), **kwargs)
+
+    def export(self, file_path: str):
+        with open(file_path, 'w') as f:
+            f.write(self.to_json(indent=4))
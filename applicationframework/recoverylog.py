@@ -0,0 +1,342 @@
+import dataclasses
+import io
+import logging
+import os
+import pickle
+import queue
+import struct
+import time
+import weakref
+
+from PySide6 import QtCore
+
+from applicationframework.actions import Base, Manager, union_flags
+from applicationframework.contentbase import ContentBase
+from applicationframework.handles import Pickler, ref
+
+
+logger = logging.getLogger(__name__)
+
+
+RECOVERY_SUFFIX = '.recovery'
+HEADER = struct.Struct('<IB')
+OPS = ('push', 'merge', 'undo', 'redo')
+
+# Values that are never edited in place so aren't worth indexing.
+_SCALAR_TYPES = (str, bytes, int, float, complex, bool, type(None))
+
+
+class ContentIndex:
+
+    """
+    Maps objects reachable from a content object to paths and back, so that
+    logged actions can be pointed at the equivalent objects of a freshly
+    loaded document. Paths are tuples of attribute names and sequence indices.
+
+    The paths of all reachable objects are found in one walk and held by id.
+    Edits can move an object, eg by inserting before it in a list, so a path
+    is checked against the content before it's used and the index is only
+    rebuilt once a path has gone stale.
+
+    """
+
+    def __init__(self, content: ContentBase):
+        self.content = content
+        self._paths = None
+
+    def _children(self, obj):
+        if isinstance(obj, (list, tuple)):
+            yield from enumerate(obj)
+        elif isinstance(obj, dict):
+            yield from obj.items()
+        elif dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+            for field in dataclasses.fields(obj):
+                yield field.name, getattr(obj, field.name)
+        elif hasattr(obj, '__dict__') and isinstance(obj, ContentBase):
+            yield from vars(obj).items()
+
+    def _walk(self) -> dict[int, tuple]:
+        paths = {}
+        stack = [(self.content, ())]
+        while stack:
+            obj, path = stack.pop()
+            if isinstance(obj, _SCALAR_TYPES) or id(obj) in paths:
+                continue
+            paths[id(obj)] = path
+            for key, child in self._children(obj):
+                stack.append((child, path + (key,)))
+        return paths
+
+    def rebuild(self):
+        self._paths = self._walk()
+
+    def path(self, obj) -> tuple | None:
+        """Return the current path of the object, or None if it's not reachable."""
+        if self._paths is not None:
+            path = self._paths.get(id(obj))
+            if path is not None:
+                if self._resolves_to(path, obj):
+                    return path
+
+                # Most moves are an insert or removal in the list holding the
+                # object, so look for it there before walking everything.
+                path = self._find_in_parent(path, obj)
+                if path is not None:
+                    self._paths[id(obj)] = path
+                    return path
+        self.rebuild()
+        return self._paths.get(id(obj))
+
+    def _find_in_parent(self, path: tuple, obj) -> tuple | None:
+        if not path or not isinstance(path[-1], int):
+            return None
+        try:
+            parent = self.resolve(path[:-1])
+        except (LookupError, AttributeError, TypeError):
+            return None
+        if not isinstance(parent, list):
+            return None
+        for i, item in enumerate(parent):
+            if item is obj:
+                return path[:-1] + (i,)
+        return None
+
+    def _resolves_to(self, path: tuple, obj) -> bool:
+        try:
+            return self.resolve(path) is obj
+        except (LookupError, AttributeError, TypeError):
+            return False
+
+    def resolve(self, path: tuple):
+        obj = self.content
+        for key in path:
+            if isinstance(obj, (list, tuple, dict)):
+                obj = obj[key]
+            else:
+                obj = getattr(obj, key)
+        return obj
+
+
+class _Pickler(Pickler):
+
+    """
+    Persists the objects an action edits as (token, path) pairs. An object
+    gets a token the first time it's logged and only that record carries its
+    path, later records refer to it by token alone so don't need to look it up
+    in the content.
+
+    """
+
+    def __init__(self, file, log: 'RecoveryLog', references: list, *args, **kwargs):
+        super().__init__(file, *args, **kwargs)
+
+        self._log = log
+        self._references = {id(obj) for obj in references if obj is not None}
+
+    def persistent_id(self, obj):
+
+        # Objects that already have a token are referred to by it wherever they
+        # appear, eg inside a list that's set by value, so that replay keeps
+        # them identical to the ones later records edit.
+        token = self._log.token_of(obj)
+        if token is not None:
+            return token, None
+        if id(obj) not in self._references:
+            return None
+        path = self._log.index.path(obj)
+        if path is None:
+            raise pickle.PicklingError(f'Object is not reachable from content: {obj}')
+        return self._log.add_token(obj), path
+
+
+class _Unpickler(pickle.Unpickler):
+
+    def __init__(self, file, index: ContentIndex, objects: dict, *args, **kwargs):
+        super().__init__(file, *args, **kwargs)
+
+        self._index = index
+        self._objects = objects
+
+    def persistent_load(self, pid):
+        token, path = pid
+        if path is not None:
+            self._objects[token] = self._index.resolve(path)
+        return self._objects[token]
+
+
+class RecoveryLogWriter(QtCore.QThread):
+
+    """
+    Writes queued records to the log file. Records are written as they arrive
+    but fsync is only called once per batch, at most every fsync_interval
+    seconds, so a burst of edits costs a single sync.
+
+    """
+
+    def __init__(self, file_path: str, fsync_interval: float = 1.0, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.file_path = file_path
+        self.fsync_interval = fsync_interval
+        self.queue = queue.Queue()
+
+    def run(self):
+        with open(self.file_path, 'ab') as f:
+            deadline = None
+            while True:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    data = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    data = b''
+                if data is None:
+                    break
+                if data:
+                    f.write(data)
+                    if deadline is None:
+                        deadline = time.monotonic() + self.fsync_interval
+                if deadline is not None and time.monotonic() >= deadline:
+                    f.flush()
+                    os.fsync(f.fileno())
+                    deadline = None
+            f.flush()
+            os.fsync(f.fileno())
+
+    def stop(self):
+        if self.isRunning():
+            self.queue.put(None)
+            self.wait()
+
+
+class RecoveryLog:
+
+    """
+    Append-only log of the action stream for a document, stored next to it.
+    Actions are serialised on the calling thread so that they capture the
+    values at the time of the edit, the file I/O happens on a writer thread.
+
+    If an action can't be serialised the rest of the log would replay against
+    the wrong actions, so the log is removed and nothing more is recorded until
+    it's cleared, eg by the next save.
+
+    """
+
+    def __init__(self, file_path: str, content: ContentBase, fsync_interval: float = 1.0):
+        self.file_path = file_path
+        self.index = ContentIndex(content)
+        self.index.rebuild()
+        self.failed = False
+        self._tokens = {}
+        self._next_token = 0
+        self.writer = RecoveryLogWriter(file_path, fsync_interval)
+        self.writer.start()
+
+    @staticmethod
+    def get_log_path(doc_file_path: str) -> str:
+        return doc_file_path + RECOVERY_SUFFIX
+
+    @classmethod
+    def exists(cls, doc_file_path: str) -> bool:
+        log_path = cls.get_log_path(doc_file_path)
+        return os.path.isfile(log_path) and os.path.getsize(log_path) > 0
+
+    def token_of(self, obj) -> int | None:
+        entry = self._tokens.get(id(obj))
+        if entry is not None and entry[0]() is obj:
+            return entry[1]
+        return None
+
+    def add_token(self, obj) -> int:
+        token = self._next_token
+        self._next_token += 1
+        key = id(obj)
+        try:
+            obj_ref = weakref.ref(obj, lambda r: self._drop_token(key, r))
+        except TypeError:
+            obj_ref = ref(obj)
+        self._tokens[key] = (obj_ref, token)
+        return token
+
+    def _drop_token(self, key: int, obj_ref):
+        entry = self._tokens.get(key)
+        if entry is not None and entry[0] is obj_ref:
+            del self._tokens[key]
+
+    def record(self, op: str, action: Base | None = None):
+        if self.failed:
+            return
+        payload = b''
+        if action is not None:
+            buffer = io.BytesIO()
+            try:
+                _Pickler(buffer, self, action.references(), protocol=pickle.HIGHEST_PROTOCOL).dump(action)
+            except Exception as e:
+                logger.error(f'Failed to record action, discarding recovery log: {action} error: {e}')
+                self._invalidate()
+                return
+            payload = buffer.getvalue()
+        self.writer.queue.put(HEADER.pack(len(payload), OPS.index(op)) + payload)
+
+    def _invalidate(self):
+        self.failed = True
+        self.writer.stop()
+        if os.path.exists(self.file_path):
+            os.remove(self.file_path)
+
+    def clear(self):
+        """Truncate the log, eg after the document has been saved."""
+        self.writer.stop()
+        open(self.file_path, 'wb').close()
+        self.failed = False
+        self._tokens.clear()
+        self.writer.start()
+
+    def close(self, remove: bool = False):
+        self.writer.stop()
+        if remove and os.path.exists(self.file_path):
+            os.remove(self.file_path)
+
+    @staticmethod
+    def read(file_path: str, content: ContentBase):
+        """
+        Yield (op, action) tuples from the log. A truncated trailing record,
+        eg from a crash mid-write, ends the stream.
+
+        """
+        index, objects = ContentIndex(content), {}
+        with open(file_path, 'rb') as f:
+            data = f.read()
+        offset = 0
+        while offset + HEADER.size <= len(data):
+            length, op_index = HEADER.unpack_from(data, offset)
+            offset += HEADER.size
+            if offset + length > len(data):
+                logger.warning(f'Truncated record in recovery log: {file_path}')
+                break
+            action = None
+            if length:
+                action = _Unpickler(io.BytesIO(data[offset:offset + length]), index, objects).load()
+            offset += length
+            yield OPS[op_index], action
+
+    @classmethod
+    def replay(cls, file_path: str, content: ContentBase, manager: Manager):
+        """
+        Apply the log to the content and rebuild the manager's history. No
+        updates are emitted, the union of the applied flags is returned so the
+        caller can emit a single update.
+
+        """
+        flags = None
+        for op, action in cls.read(file_path, content):
+            if op == 'push':
+                flags = union_flags(flags, action.redo())
+                manager.push(action, merge=False)
+            elif op == 'merge':
+                flags = union_flags(flags, action.redo())
+                manager.undos[-1].merge(action)
+            elif op == 'undo':
+                flags = union_flags(flags, manager.undo_once())
+            elif op == 'redo':
+                flags = union_flags(flags, manager.redo_once())
+        return flags
@@ -0,0 +1,168 @@
+import array
+import logging
+import os
+import sys
+import time
+
+from applicationframework.pathfilter import PathFilter
+
+
+logger = logging.getLogger(__name__)
+
+
+class _Dir:
+
+    """
+    Compact record of one directory: its mtime, the interned names of its
+    files with their mtimes in a parallel array, and the names of its
+    subdirectories.
+
+    """
+
+    __slots__ = ('mtime', 'names', 'mtimes', 'subdirs')
+
+    def __init__(self, mtime: int, names: tuple[str, ...], mtimes: array.array, subdirs: tuple[str, ...]):
+        self.mtime = mtime
+        self.names = names
+        self.mtimes = mtimes
+        self.subdirs = subdirs
+
+
+class Scanner:
+
+    """
+    Incremental polling scanner built on os.scandir. Each scan returns the
+    file paths added, removed and modified since the previous one.
+
+    A directory's mtime only changes when entries are added, removed or
+    renamed directly inside it, so a directory whose mtime is unchanged isn't
+    listed again and its cached names are reused. Its files are still stat'ed
+    to detect modifications unless stat_files is False, in which case only
+    added and removed files are reported. Subdirectories are always visited as
+    their changes don't propagate to the parent's mtime.
+
+    A directory modified within racy_window nanoseconds of being listed is
+    listed again next scan, as a change in the same mtime tick would otherwise
+    go unnoticed.
+
+    If a path filter is given, excluded directories are never descended into
+    and only accepted files are reported.
+
+    """
+
+    racy_window = 2_000_000_000
+
+    def __init__(self, root: str, stat_files: bool = True, path_filter: PathFilter | None = None):
+        self.root = os.fspath(root)
+        self.stat_files = stat_files
+        self.path_filter = path_filter or None
+        self._dirs: dict[str, _Dir] = {}
+
+    def __len__(self) -> int:
+        """Return the number of files known to the scanner."""
+        return sum(len(record.names) for record in self._dirs.values())
+
+    def file_paths(self) -> list[str]:
+        return [os.path.join(dir_path, name) for dir_path, record in self._dirs.items() for name in record.names]
+
+    def reset(self):
+        self._dirs.clear()
+
+    def scan(self) -> tuple[list[str], list[str], list[str]]:
+        added, removed, modified = [], [], []
+        try:
+            mtime = os.stat(self.root).st_mtime_ns
+        except OSError:
+            self._forget(self.root, removed)
+            return added, removed, modified
+        self._scan(self.root, mtime, added, removed, modified)
+        return added, removed, modified
+
+    def _forget(self, dir_path: str, removed: list):
+        record = self._dirs.pop(dir_path, None)
+        if record is None:
+            return
+        removed.extend(os.path.join(dir_path, name) for name in record.names)
+        for subdir in record.subdirs:
+            self._forget(os.path.join(dir_path, subdir), removed)
+
+    def _list(self, dir_path: str, mtime: int) -> tuple[_Dir, dict[str, int]]:
+        """List a directory, returning a new record and the mtimes of its subdirectories."""
+        names, mtimes, subdirs = [], array.array('q'), {}
+        try:
+            entries = list(os.scandir(dir_path))
+        except OSError as e:
+            logger.debug(f'Failed to scan directory: {dir_path} error: {e}')
+            entries = []
+        path_filter = self.path_filter
+        prefix = PathFilter.relative(self.root, dir_path) + '/' if dir_path != self.root else ''
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if path_filter is not None and not path_filter.accepts_dir(prefix + entry.name):
+                        continue
+                    subdirs[sys.intern(entry.name)] = entry.stat(follow_symlinks=False).st_mtime_ns
+                elif entry.is_dir():
+
+                    # Like os.walk, symlinks to directories are not followed.
+                    continue
+                else:
+                    if path_filter is not None and not path_filter.accepts_file(prefix + entry.name):
+                        continue
+                    mtimes.append(entry.stat().st_mtime_ns)
+                    names.append(sys.intern(entry.name))
+            except OSError as e:
+                logger.debug(f'Failed to stat: {entry.path} error: {e}')
+        return _Dir(mtime, tuple(names), mtimes, tuple(subdirs)), subdirs
+
+    def _scan(self, dir_path: str, mtime: int, added: list, removed: list, modified: list):
+        record = self._dirs.get(dir_path)
+        if record is not None and record.mtime == mtime:
+            if self.stat_files:
+                self._stat_files(dir_path, record, modified)
+            subdirs = {}
+            for subdir in record.subdirs:
+                try:
+                    subdirs[subdir] = os.stat(os.path.join(dir_path, subdir)).st_mtime_ns
+                except OSError:
+                    self._forget(os.path.join(dir_path, subdir), removed)
+        else:
+            new_record, subdirs = self._list(dir_path, mtime)
+            self._diff(dir_path, record, new_record, added, removed, modified)
+            if time.time_ns() - mtime < self.racy_window:
+                new_record.mtime = -1
+            self._dirs[dir_path] = new_record
+        for subdir, subdir_mtime in subdirs.items():
+            self._scan(os.path.join(dir_path, subdir), subdir_mtime, added, removed, modified)
+
+    def _stat_files(self, dir_path: str, record: _Dir, modified: list):
+        mtimes = record.mtimes
+        for i, name in enumerate(record.names):
+            try:
+                mtime = os.stat(os.path.join(dir_path, name)).st_mtime_ns
+            except OSError:
+
+                # Removed within the directory's mtime granularity, so force
+                # a relist next time.
+                record.mtime = -1
+                continue
+            if mtime != mtimes[i]:
+                mtimes[i] = mtime
+                modified.append(os.path.join(dir_path, name))
+
+    def _diff(self, dir_path: str, old: _Dir | None, new: _Dir, added: list, removed: list, modified: list):
+        if old is None:
+            added.extend(os.path.join(dir_path, name) for name in new.names)
+            return
+        old_mtimes = dict(zip(old.names, old.mtimes))
+        for name, mtime in zip(new.names, new.mtimes):
+            old_mtime = old_mtimes.pop(name, None)
+            if old_mtime is None:
+                added.append(os.path.join(dir_path, name))
+            elif old_mtime != mtime:
+                modified.append(os.path.join(dir_path, name))
+        removed.extend(os.path.join(dir_path, name) for name in old_mtimes)
+        new_subdirs = set(new.subdirs)
+        for subdir in old.subdirs:
+            if subdir not in new_subdirs:
+                self._forget(os.path.join(dir_path, subdir), removed)
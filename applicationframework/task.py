@@ -0,0 +1,89 @@
+import logging
+from functools import partial
+from typing import Callable
+
+from PySide6.QtCore import QEventLoop, QObject, QRunnable, Signal
+
+from applicationframework.contentbase import Cancelled, Progress
+
+# noinspection PyUnresolvedReferences
+from __feature__ import snake_case
+
+
+logger = logging.getLogger(__name__)
+
+
+FINISHED = 'finished'
+CANCELLED = 'cancelled'
+FAILED = 'failed'
+
+
+class TaskSignals(QObject):
+
+    progress = Signal(float)
+    finished = Signal()
+    failed = Signal(object)
+    cancelled = Signal()
+
+
+class Task(QRunnable):
+
+    """
+    Runs a function on a thread pool. The function is passed a Progress which
+    it can use to report progress and check for cancellation. Signals are
+    emitted from the worker thread and so are delivered on the thread that
+    created the task, usually the GUI thread.
+
+    """
+
+    def __init__(self, fn: Callable[[Progress], None]):
+        super().__init__()
+
+        self.fn = fn
+        self.signals = TaskSignals()
+        self.progress = Progress(self.signals.progress.emit)
+        self.set_auto_delete(False)
+
+        # Set when the outcome signal is delivered, ie after the worker thread
+        # is done. Connected first so it's set before any other slot runs.
+        self.outcome = None
+        self._loop = None
+        self.signals.finished.connect(partial(self._set_outcome, FINISHED))
+        self.signals.cancelled.connect(partial(self._set_outcome, CANCELLED))
+        self.signals.failed.connect(partial(self._set_outcome, FAILED))
+
+    def _set_outcome(self, outcome: str, *args):
+        self.outcome = outcome
+        if self._loop is not None:
+            self._loop.quit()
+
+    def cancel(self):
+        self.progress.cancel()
+
+    def wait(self) -> bool:
+        """
+        Run a local event loop until the task's outcome has been delivered.
+        Returns True if the task finished, False if it failed or was
+        cancelled.
+
+        """
+        # The loop is quit by the slot connected in the constructor, as a
+        # signal already queued by the worker isn't delivered to new slots.
+        if self.outcome is None:
+            self._loop = QEventLoop()
+            self._loop.exec()
+            self._loop = None
+        return self.outcome == FINISHED
+
+    def run(self):
+        try:
+            self.fn(self.progress)
+            self.progress.check()
+        except Cancelled:
+            logger.debug(f'Task cancelled: {self.fn}')
+            self.signals.cancelled.emit()
+        except Exception as e:
+            logger.exception(f'Task failed: {self.fn}')
+            self.signals.failed.emit(e)
+        else:
+            self.signals.finished.emit()
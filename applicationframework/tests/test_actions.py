@@ -0,0 +1,435 @@
+import json
+import weakref
+from enum import Flag, auto
+from unittest import TestCase
+from unittest.mock import patch
+
+from PySide6.QtGui import QColor, QImage
+
+from applicationframework.actions import Base, Manager, SetAttribute, SetAttributes
+from applicationframework.application import Application
+from applicationframework.contentbase import ContentBase
+from applicationframework.document import Document
+from applicationframework.handles import Handle
+from applicationframework.profiler import Profiler
+from gradientwidget.widget import Gradient
+from propertygrid.types import FilePathQImage
+
+
+class UpdateFlag(Flag):
+
+    FOO = auto()
+    BAR = auto()
+
+
+class Content(ContentBase):
+
+    def load(self, file_path: str):
+        pass
+
+    def save(self, file_path: str):
+        pass
+
+
+class Obj:
+
+    def __init__(self):
+        self.value = 0
+
+
+class DestroyCounter(SetAttribute):
+
+    destroyed = 0
+
+    def destroy(self):
+        DestroyCounter.destroyed += 1
+
+
+class UnmergedSetAttribute(SetAttribute):
+
+    def merge(self, other: SetAttribute) -> bool:
+        return Base.merge(self, other)
+
+
+class ManagerTestCase(TestCase):
+
+    def setUp(self):
+        DestroyCounter.destroyed = 0
+        self.app = Application.instance()
+        if self.app is None:
+            self.app = Application('mycompany', 'Test Application')
+        self.app.doc = Document(None, Content(), UpdateFlag)
+        self.emitted = []
+        self.app.updated.connect(self.on_updated)
+
+    def tearDown(self):
+        self.app.updated.disconnect(self.on_updated)
+        self.app.doc = None
+        self.app.action_manager = Manager()
+
+    def on_updated(self, doc: Document, flags: Flag):
+        self.emitted.append(flags)
+
+    def test_max_depth(self):
+
+        # Set up test data.
+        obj = Obj()
+        manager = Manager(max_depth=3)
+        actions = [DestroyCounter('value', i, obj) for i in range(5)]
+
+        # Start test.
+        for action in actions:
+            manager.push(action)
+
+        # Assert results.
+        self.assertListEqual(actions[2:], manager.undos)
+        self.assertEqual(2, DestroyCounter.destroyed)
+
+    def test_max_bytes(self):
+
+        # Set up test data.
+        obj = Obj()
+        action_size = DestroyCounter('value', 'x' * 1000, obj).size()
+        manager = Manager(max_bytes=action_size * 2)
+        actions = [DestroyCounter('value', 'x' * 1000, obj) for _ in range(4)]
+
+        # Start test.
+        for action in actions:
+            manager.push(action)
+
+        # Assert results.
+        self.assertListEqual(actions[2:], manager.undos)
+        self.assertEqual(2, DestroyCounter.destroyed)
+        self.assertLessEqual(manager.memory_usage(), action_size * 2)
+
+    def test_size_nested(self):
+
+        # Set up test data.
+        obj = Obj()
+        shared = Obj()
+        shared.value = 'x' * 1000
+        shared_ref = weakref.ref(shared)
+        nested = SetAttribute('value', [['x' * 1000], {'key': 'y' * 1000}], obj)
+        with_shared = SetAttribute('value', [shared], obj)
+        image = SetAttribute('value', QImage(100, 100, QImage.Format.Format_ARGB32), obj)
+
+        # Start test.
+        nested_size = nested.size()
+        shared_size = with_shared.size()
+        image_size = image.size()
+
+        # Assert results.
+        self.assertGreater(nested_size, 2000)
+        self.assertLess(shared_size, 1000)
+        self.assertGreater(image_size, 100 * 100 * 4)
+
+    def test_memory_usage(self):
+
+        # Set up test data.
+        obj = Obj()
+        manager = Manager()
+        action = SetAttribute('value', 1, obj)
+
+        # Start test.
+        manager.push(action)
+
+        # Assert results.
+        self.assertEqual(action.size(), manager.memory_usage())
+        manager.reset()
+        self.assertEqual(0, manager.memory_usage())
+
+    def test_merge_interaction(self):
+
+        # Set up test data.
+        obj = Obj()
+        manager = Manager()
+
+        # Start test.
+        with manager.interaction():
+            for i in range(1, 4):
+                action = SetAttribute('value', i, obj)
+                manager.push(action)
+                action()
+        action = SetAttribute('value', 4, obj)
+        manager.push(action)
+
+        # Assert results.
+        self.assertEqual(2, len(manager.undos))
+        self.assertEqual(0, manager.undos[0].old_value)
+        self.assertEqual(3, manager.undos[0].value)
+
+    def test_merge_window(self):
+
+        # Set up test data.
+        obj = Obj()
+        manager = Manager(merge_window=60)
+        other = Obj()
+
+        # Start test.
+        manager.push(SetAttributes('value', 1, obj, other))
+        manager.push(SetAttributes('value', 2, obj, other))
+        manager.push(SetAttributes('value', 3, obj))
+
+        # Assert results.
+        self.assertEqual(2, len(manager.undos))
+        self.assertEqual(2, manager.undos[0].value)
+
+    def test_no_merge_without_window(self):
+
+        # Set up test data.
+        obj = Obj()
+        manager = Manager()
+
+        # Start test.
+        manager.push(SetAttribute('value', 1, obj))
+        manager.push(SetAttribute('value', 2, obj))
+
+        # Assert results.
+        self.assertEqual(2, len(manager.undos))
+
+    def test_merge_refused(self):
+
+        # Set up test data.
+        obj = Obj()
+        manager = Manager(merge_window=60)
+
+        # Start test.
+        manager.push(UnmergedSetAttribute('value', 1, obj))
+        manager.push(UnmergedSetAttribute('value', 2, obj))
+
+        # Assert results.
+        self.assertEqual(2, len(manager.undos))
+        self.assertListEqual([1, 2], [action.value for action in manager.undos])
+
+    def test_transaction(self):
+
+        # Set up test data.
+        objs = [Obj() for _ in range(10)]
+        manager = Manager()
+        self.app.action_manager = manager
+
+        # Start test.
+        with manager.transaction():
+            for i, obj in enumerate(objs):
+                action = SetAttribute('value', i, obj, flags=UpdateFlag.FOO if i % 2 else UpdateFlag.BAR)
+                manager.push(action)
+                action()
+                self.app.doc.updated(action.flags)
+
+        # Assert results.
+        self.assertEqual(1, len(manager.undos))
+        self.assertEqual(10, len(manager.undos[0].actions))
+        self.assertListEqual([UpdateFlag.FOO | UpdateFlag.BAR], self.emitted)
+        self.assertTrue(self.app.doc.dirty)
+
+    def test_transaction_rollback(self):
+
+        # Set up test data.
+        objs = [Obj() for _ in range(3)]
+        manager = Manager()
+        self.app.action_manager = manager
+
+        # Start test.
+        with self.assertRaises(ValueError):
+            with manager.transaction():
+                for i, obj in enumerate(objs):
+                    action = SetAttribute('value', i + 1, obj)
+                    manager.push(action)
+                    action()
+                    self.app.doc.updated()
+                raise ValueError()
+
+        # Assert results.
+        self.assertListEqual([], manager.undos)
+        self.assertListEqual([0, 0, 0], [obj.value for obj in objs])
+        self.assertListEqual([], self.emitted)
+        self.assertFalse(self.app.doc.dirty)
+
+    def test_undo_to_redo_to(self):
+
+        # Set up test data.
+        obj = Obj()
+        manager = Manager()
+        self.app.action_manager = manager
+        for i in range(1, 6):
+            action = SetAttribute('value', i, obj, flags=UpdateFlag.FOO if i % 2 else UpdateFlag.BAR)
+            manager.push(action)
+            action()
+
+        # Start test.
+        manager.undo_to(1)
+
+        # Assert results.
+        self.assertEqual(1, obj.value)
+        self.assertEqual(1, manager.index)
+        self.assertListEqual([UpdateFlag.FOO | UpdateFlag.BAR], self.emitted)
+
+        # Start test.
+        manager.redo_to(4)
+
+        # Assert results.
+        self.assertEqual(4, obj.value)
+        self.assertEqual(2, len(self.emitted))
+        self.assertRaises(IndexError, manager.redo_to, 6)
+
+    def test_history(self):
+
+        # Set up test data.
+        obj = Obj()
+        manager = Manager()
+        self.app.action_manager = manager
+        actions = [SetAttribute('value', i, obj) for i in range(4)]
+        for action in actions:
+            manager.push(action)
+        history = manager.history()
+
+        # Start test.
+        manager.undo_to(2)
+
+        # Assert results.
+        self.assertEqual(4, len(history))
+        self.assertListEqual(actions, list(history))
+        self.assertIs(actions[-1], history[-1])
+
+    def test_weak_reference(self):
+
+        # Set up test data.
+        manager = Manager()
+        obj = Obj()
+        action = SetAttribute('value', 1, obj)
+        manager.push(action)
+
+        # Start test.
+        del obj
+
+        # Assert results.
+        self.assertIsNone(action.obj)
+        action.undo()
+
+    def test_value_handle(self):
+
+        # Set up test data.
+        obj = Obj()
+        obj.value = FilePathQImage('')
+        action = SetAttribute('value', FilePathQImage(''), obj)
+
+        # Start test.
+        action()
+        action.undo()
+
+        # Assert results.
+        self.assertIsInstance(action.old_value, Handle)
+        self.assertIsInstance(obj.value, FilePathQImage)
+
+    def test_mutable_value_kept(self):
+
+        # Set up test data.
+        obj = Obj()
+        gradient = Gradient([(0.0, QColor(255, 0, 0)), (1.0, QColor(0, 0, 255))])
+        manager = Manager()
+        self.app.action_manager = manager
+        manager.execute(SetAttribute('value', gradient, obj))
+        manager.execute(SetAttribute('position', 0.5, obj.value[0]))
+
+        # Start test.
+        manager.undo_to(0)
+        manager.redo_to(2)
+
+        # Assert results.
+        self.assertIs(gradient, obj.value)
+        self.assertEqual(0.5, obj.value[0].position)
+
+    def test_handle_abstract(self):
+
+        # Start test.
+        with self.assertRaises(TypeError):
+            Handle()
+
+    def test_profiler(self):
+
+        # Set up test data.
+        obj = Obj()
+        manager = Manager()
+        manager.profiler = Profiler()
+        self.app.action_manager = manager
+
+        # Start test.
+        manager.execute(SetAttribute('value', 1, obj, flags=UpdateFlag.FOO))
+        manager.execute(SetAttributes('value', 2, obj, flags=UpdateFlag.FOO))
+        manager.undo()
+        manager.undo()
+        report = json.loads(manager.profiler.to_json())
+
+        # Assert results.
+        counts = {(stats['name'], stats['op']): stats['count'] for stats in report['stats']}
+        self.assertEqual(1, counts[('SetAttribute', 'execute')])
+        self.assertEqual(1, counts[('SetAttributes', 'undo')])
+        self.assertEqual(2, counts[('SetAttribute', 'update')])
+        self.assertEqual(0, obj.value)
+        self.assertEqual(6, len(report['samples']))
+
+    def test_generations(self):
+
+        # Set up test data.
+        obj = Obj()
+        other = Obj()
+        doc = self.app.doc
+        manager = Manager()
+        self.app.action_manager = manager
+
+        # Start test.
+        manager.execute(SetAttribute('value', 1, obj))
+        obj_generation = doc.generation_of(obj, 'value')
+        manager.execute(SetAttributes('value', 2, other))
+
+        # Assert results.
+        self.assertGreater(obj_generation, 0)
+        self.assertEqual(obj_generation, doc.generation_of(obj, 'value'))
+        self.assertGreater(doc.generation_of(other, 'value'), obj_generation)
+        self.assertEqual(doc.generation_of(other), doc.generation_of(other, 'value'))
+        self.assertEqual(0, doc.generation_of(other, 'foo'))
+        self.assertGreater(doc.generation, doc.generation_of(other))
+        manager.undo()
+        self.assertGreater(doc.generation_of(other, 'value'), obj_generation + 1)
+
+    def test_generations_bulk(self):
+
+        # Set up test data.
+        doc = self.app.doc
+        doc.bulk_threshold = 2
+        objs = [Obj() for _ in range(3)]
+        other = Obj()
+        manager = Manager()
+        self.app.action_manager = manager
+
+        # Start test.
+        start = doc.generation
+        manager.execute(SetAttributes('value', 1, *objs))
+        manager.execute(SetAttribute('value', 2, objs[0]))
+
+        # Assert results.
+        self.assertEqual(start + 4, doc.generation)
+        self.assertEqual(start + 1, doc.generation_of(objs[1], 'value'))
+        self.assertEqual(start + 3, doc.generation_of(objs[0], 'value'))
+        self.assertEqual(start + 1, doc.generation_of(other, 'value'))
+        self.assertEqual(0, doc.generation_of(other, 'foo'))
+
+    def test_generations_pruned(self):
+
+        # Set up test data.
+        with patch.object(Document, 'prune_threshold', 4):
+            doc = Document(None, Content(), UpdateFlag)
+        dead = [Obj() for _ in range(4)]
+        for obj in dead:
+            doc.bump(obj, 'value')
+        objs = [Obj() for _ in range(4)]
+        del dead, obj
+
+        # Start test.
+        for obj in objs:
+            doc.bump(obj, 'value')
+
+        # Assert results.
+        self.assertEqual(4, len(doc._refs))
+        self.assertEqual(4, len(doc._generations['value']))
+        self.assertEqual(doc.generation, doc.generation_of(objs[3], 'value'))
@@ -0,0 +1,128 @@
+from enum import Flag, auto
+from unittest import TestCase
+
+from applicationframework.application import Application
+from applicationframework.contentbase import ContentBase
+from applicationframework.document import Document
+
+
+class UpdateFlag(Flag):
+
+    FOO = auto()
+    BAR = auto()
+    BAZ = auto()
+
+
+class Content(ContentBase):
+
+    def load(self, file_path: str):
+        pass
+
+    def save(self, file_path: str):
+        pass
+
+
+class Listener:
+
+    def __init__(self):
+        self.error = None
+
+    def on_updated(self, doc: Document, flags: Flag):
+        if self.error is not None:
+            raise self.error
+
+
+class ApplicationTestCase(TestCase):
+
+    def setUp(self):
+        self.app = Application.instance()
+        if self.app is None:
+            self.app = Application('mycompany', 'Test Application')
+        self.app.doc = Document(None, Content(), UpdateFlag)
+        self.foo_calls = []
+        self.all_calls = []
+
+    def tearDown(self):
+        self.app.unsubscribe(self.on_foo)
+        self.app.unsubscribe(self.on_all)
+        self.app.doc = None
+
+    def on_foo(self, doc: Document, flags: Flag):
+        self.foo_calls.append(flags)
+
+    def on_all(self, doc: Document, flags: Flag):
+        self.all_calls.append(flags)
+
+    def test_subscribe(self):
+
+        # Set up test data.
+        self.app.subscribe(self.on_foo, UpdateFlag.FOO)
+        self.app.subscribe(self.on_all)
+
+        # Start test.
+        self.app.doc.updated(UpdateFlag.BAR)
+        self.app.doc.updated(UpdateFlag.FOO | UpdateFlag.BAZ)
+
+        # Assert results.
+        self.assertListEqual([UpdateFlag.FOO | UpdateFlag.BAZ], self.foo_calls)
+        self.assertListEqual([UpdateFlag.BAR, UpdateFlag.FOO | UpdateFlag.BAZ], self.all_calls)
+        report = {item['handler']: item['count'] for item in self.app.subscriber_report()}
+        self.assertEqual(1, report['ApplicationTestCase.on_foo'])
+        self.assertEqual(2, report['ApplicationTestCase.on_all'])
+
+    def test_unsubscribe(self):
+
+        # Set up test data.
+        self.app.subscribe(self.on_foo, UpdateFlag.FOO)
+
+        # Start test.
+        self.app.unsubscribe(self.on_foo)
+        self.app.doc.updated(UpdateFlag.FOO)
+
+        # Assert results.
+        self.assertListEqual([], self.foo_calls)
+
+    def test_subscriber_collected(self):
+
+        # Set up test data.
+        listener = Listener()
+        self.app.subscribe(listener.on_updated)
+
+        # Start test.
+        del listener
+        self.app.doc.updated(UpdateFlag.FOO)
+
+        # Assert results.
+        self.assertNotIn('Listener.on_updated', [item['handler'] for item in self.app.subscriber_report()])
+
+    def test_subscriber_error(self):
+
+        # Set up test data.
+        listener = Listener()
+        listener.error = ValueError('foo')
+        self.app.subscribe(listener.on_updated)
+        self.app.subscribe(self.on_all)
+
+        # Start test.
+        with self.assertLogs('applicationframework.application', 'ERROR'):
+            self.app.doc.updated(UpdateFlag.FOO)
+
+        # Assert results.
+        self.assertListEqual([UpdateFlag.FOO], self.all_calls)
+        self.app.unsubscribe(listener.on_updated)
+
+    def test_resubscribe(self):
+
+        # Set up test data.
+        self.app.subscribe(self.on_foo, UpdateFlag.FOO)
+        self.app.doc.updated(UpdateFlag.FOO)
+
+        # Start test.
+        self.app.subscribe(self.on_foo, UpdateFlag.BAR)
+        self.app.doc.updated(UpdateFlag.FOO)
+        self.app.doc.updated(UpdateFlag.BAR)
+
+        # Assert results.
+        self.assertListEqual([UpdateFlag.FOO, UpdateFlag.BAR], self.foo_calls)
+        report = {item['handler']: item['count'] for item in self.app.subscriber_report()}
+        self.assertEqual(2, report['ApplicationTestCase.on_foo'])
@@ -0,0 +1,148 @@
+import os
+import tempfile
+from dataclasses import dataclass, field
+from enum import Enum, IntEnum
+from unittest import TestCase
+
+from PySide6.QtGui import QColor
+
+from applicationframework.codec import BinaryContentBase, get_codec
+from gradientwidget.widget import Gradient
+from propertygrid.types import FilePathQImage
+
+# noinspection PyUnresolvedReferences
+from __feature__ import snake_case
+
+
+class Colour(Enum):
+
+    RED = 'red'
+    BLUE = 'blue'
+
+
+class Size(IntEnum):
+
+    SMALL = 1
+    LARGE = 2
+
+
+@dataclass
+class Node:
+
+    name: str = ''
+    children: list['Node'] = field(default_factory=list)
+
+
+@dataclass
+class Data:
+
+    bool_value: bool = False
+    int_value: int = 0
+    float_value: float = 0.0
+    string_value: str = ''
+    enum_value: Colour = Colour.RED
+    int_enum_value: Size = Size.SMALL
+    colour: QColor = field(default_factory=lambda: QColor(0, 0, 0))
+    gradient: Gradient = field(default_factory=Gradient)
+    image: FilePathQImage = field(default_factory=FilePathQImage)
+    floats: list[float] = field(default_factory=list)
+    optional: int | None = None
+    node: Node = field(default_factory=Node)
+
+
+@dataclass
+class Content(BinaryContentBase):
+
+    items: list[Data] = field(default_factory=list)
+
+
+class CodecTestCase(TestCase):
+
+    def make_data(self) -> Data:
+        return Data(
+            True,
+            -42,
+            1.5,
+            'héllo',
+            Colour.BLUE,
+            Size.LARGE,
+            QColor(1, 2, 3, 4),
+            Gradient([(0.0, QColor(255, 0, 0)), (0.5, QColor(0, 255, 0, 128))]),
+            FilePathQImage(),
+            [1.0, 2.0, 3.0],
+            7,
+            Node('root', [Node('child')]),
+        )
+
+    def assert_data_equal(self, data: Data, expected: Data):
+        self.assertEqual(data.bool_value, expected.bool_value)
+        self.assertEqual(data.int_value, expected.int_value)
+        self.assertEqual(data.float_value, expected.float_value)
+        self.assertEqual(data.string_value, expected.string_value)
+        self.assertIs(data.enum_value, expected.enum_value)
+        self.assertIs(data.int_enum_value, expected.int_enum_value)
+        self.assertEqual(data.colour, expected.colour)
+        self.assertEqual(
+            [(stop.position, stop.colour) for stop in data.gradient],
+            [(stop.position, stop.colour) for stop in expected.gradient],
+        )
+        self.assertEqual(data.image.file_path, expected.image.file_path)
+        self.assertEqual(data.floats, expected.floats)
+        self.assertEqual(data.optional, expected.optional)
+        self.assertEqual(data.node, expected.node)
+
+    def test_round_trip(self):
+
+        # Set up test data.
+        codec = get_codec(Data)
+
+        # Start test.
+        results = {}
+        for compression in (None, 'zlib', 'lzma'):
+            data = self.make_data()
+            results[compression] = (codec.decode(codec.encode(data, compression)), data)
+        default = codec.decode(codec.encode(Data()))
+
+        # Assert results.
+        self.assertIs(get_codec(Data), codec)
+        for decoded, data in results.values():
+            self.assert_data_equal(decoded, data)
+        self.assert_data_equal(default, Data())
+
+    def test_content_load_save(self):
+
+        # Set up test data.
+        content = Content([self.make_data(), Data()])
+        content.compression = 'zlib'
+        loaded = Content()
+
+        # Start test.
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_path = os.path.join(temp_dir, 'content.bin')
+            content.save(file_path)
+            loaded.load(file_path)
+
+        # Assert results.
+        self.assertEqual(len(loaded.items), 2)
+        self.assert_data_equal(loaded.items[0], content.items[0])
+
+    def test_layout_mismatch(self):
+
+        # Set up test data.
+        data = get_codec(Node).encode(Node())
+
+        # Start test.
+        with self.assertRaises(ValueError):
+            get_codec(Data).decode(data)
+
+    def test_unsupported_type(self):
+
+        # Set up test data.
+        @dataclass
+        class Unsupported:
+
+            value: dict
+
+        # Start test.
+        with self.assertRaises(TypeError):
+            get_codec(Unsupported)
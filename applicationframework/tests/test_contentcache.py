@@ -0,0 +1,117 @@
+import os
+import tempfile
+import time
+from dataclasses import dataclass, field
+from enum import Flag, auto
+from unittest import TestCase
+
+from applicationframework.application import Application
+from applicationframework.codec import BinaryContentBase
+from applicationframework.contentbase import ContentBase
+from applicationframework.contentcache import ContentCache
+from applicationframework.document import Document
+
+
+class UpdateFlag(Flag):
+
+    FOO = auto()
+
+
+class Content(ContentBase):
+
+    num_loads = 0
+
+    def __init__(self):
+        self.text = None
+
+    def load(self, file_path: str):
+        Content.num_loads += 1
+        with open(file_path) as f:
+            self.text = f.read()
+
+    def save(self, file_path: str):
+        with open(file_path, 'w') as f:
+            f.write(self.text)
+
+
+@dataclass
+class DataclassContent(BinaryContentBase):
+
+    values: list[int] = field(default_factory=list)
+
+
+class ContentCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.app = Application.instance()
+        if self.app is None:
+            self.app = Application('mycompany', 'Test Application')
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = ContentCache(os.path.join(self.temp_dir.name, 'cache'))
+        self.app.content_cache = self.cache
+        self.file_path = os.path.join(self.temp_dir.name, 'doc.txt')
+        with open(self.file_path, 'w') as f:
+            f.write('foo')
+        Content.num_loads = 0
+
+    def tearDown(self):
+        self.app.content_cache = None
+        self.temp_dir.cleanup()
+
+    def load(self) -> Document:
+        doc = Document(self.file_path, Content(), UpdateFlag)
+        doc.load()
+        return doc
+
+    def test_hit(self):
+
+        # Set up test data.
+        self.load()
+
+        # Start test.
+        doc = self.load()
+
+        # Assert results.
+        self.assertEqual(1, Content.num_loads)
+        self.assertEqual('foo', doc.content.text)
+
+    def test_invalidated_by_change(self):
+
+        # Set up test data.
+        self.load()
+        time.sleep(0.01)
+        with open(self.file_path, 'w') as f:
+            f.write('barbaz')
+
+        # Start test.
+        doc = self.load()
+
+        # Assert results.
+        self.assertEqual(2, Content.num_loads)
+        self.assertEqual('barbaz', doc.content.text)
+
+    def test_dataclass_content(self):
+
+        # Set up test data.
+        file_path = os.path.join(self.temp_dir.name, 'doc.bin')
+        DataclassContent([1, 2, 3]).save(file_path)
+        self.cache.store(file_path, DataclassContent([1, 2, 3]), os.stat(file_path))
+        content = DataclassContent()
+
+        # Start test.
+        loaded = self.cache.load(file_path, content)
+
+        # Assert results.
+        self.assertTrue(loaded)
+        self.assertListEqual([1, 2, 3], content.values)
+
+    def test_evict(self):
+
+        # Set up test data.
+        self.cache.max_bytes = 0
+
+        # Start test.
+        self.load()
+
+        # Assert results.
+        self.assertEqual(0, self.cache.disk_usage())
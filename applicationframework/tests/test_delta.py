@@ -0,0 +1,231 @@
+import threading
+from dataclasses import dataclass, field
+from enum import Flag, auto
+from unittest import TestCase
+
+from PySide6.QtGui import QColor
+
+from applicationframework.actions import Manager
+from applicationframework.application import Application
+from applicationframework.contentbase import ContentBase
+from applicationframework.delta import Delta, SET, SPLICE, UPDATE, diff, snapshot
+from applicationframework.document import Document
+from gradientwidget.widget import Gradient
+
+# noinspection PyUnresolvedReferences
+from __feature__ import snake_case
+
+
+@dataclass
+class Item:
+
+    name: str
+    value: int = 0
+
+
+@dataclass
+class Data:
+
+    title: str = 'untitled'
+    count: int = 0
+    items: list = field(default_factory=list)
+    child: Item = field(default_factory=lambda: Item('child'))
+    tags: dict = field(default_factory=dict)
+    members: set = field(default_factory=set)
+    gradient: Gradient = field(default_factory=Gradient)
+
+
+class UpdateFlag(Flag):
+
+    FOO = auto()
+
+
+class Content(ContentBase):
+
+    def load(self, file_path: str):
+        pass
+
+    def save(self, file_path: str):
+        pass
+
+
+class DeltaTestCase(TestCase):
+
+    def setUp(self):
+        self.data = Data(items=[Item(str(i), i) for i in range(10)])
+
+    def test_diff_fields(self):
+
+        # Set up test data.
+        before = snapshot(self.data)
+
+        # Start test.
+        self.data.title = 'foo'
+        self.data.child.value = 5
+        self.data.items[3].value = 30
+        ops = diff(before, self.data)
+
+        # Assert results.
+        self.assertCountEqual(
+            [(SET, ('title',), 'untitled', 'foo'), (SET, ('items', 3, 'value'), 3, 30), (SET, ('child', 'value'), 0, 5)],
+            ops,
+        )
+
+    def test_diff_splice(self):
+
+        # Set up test data.
+        before = snapshot(self.data)
+        inserted = Item('new')
+
+        # Start test.
+        self.data.items.insert(4, inserted)
+        del self.data.items[7:9]
+        ops = diff(before, self.data)
+
+        # Assert results.
+        self.assertEqual(1, len(ops))
+        self.assertEqual(SPLICE, ops[0][0])
+        self.assertEqual(4, ops[0][2])
+
+    def test_undo_redo(self):
+
+        # Set up test data.
+        expected_before = [(item.name, item.value) for item in self.data.items]
+        before = snapshot(self.data)
+        self.data.count = 3
+        self.data.items[0].value = 100
+        self.data.items.append(Item('appended'))
+        del self.data.items[5]
+        expected_after = [(item.name, item.value) for item in self.data.items]
+        action = Delta(self.data, diff(before, self.data))
+
+        # Start test.
+        action.undo()
+
+        # Assert results.
+        self.assertEqual(0, self.data.count)
+        self.assertListEqual(expected_before, [(item.name, item.value) for item in self.data.items])
+        action.redo()
+        self.assertEqual(3, self.data.count)
+        self.assertListEqual(expected_after, [(item.name, item.value) for item in self.data.items])
+
+    def test_undo_redo_kept(self):
+
+        # Set up test data.
+        a, b, c = self.data.items[:3]
+        self.data.items = [a, b, c]
+        before = snapshot(self.data)
+        x = Item('x')
+        self.data.items[:] = [x, b]
+        b.value = 99
+        action = Delta(self.data, diff(before, self.data))
+
+        # Start test.
+        action.undo()
+
+        # Assert results.
+        self.assertListEqual([a, b, c], self.data.items)
+        self.assertEqual(1, b.value)
+        action.redo()
+        self.assertListEqual([x, b], self.data.items)
+        self.assertEqual(99, b.value)
+
+    def test_undo_redo_swapped(self):
+
+        # Set up test data.
+        a, b, c = self.data.items[:3]
+        self.data.items = [a, b, c]
+        before = snapshot(self.data)
+        self.data.items[:] = [c, b, a]
+        c.value = 20
+
+        # Start test.
+        action = Delta(self.data, diff(before, self.data))
+        action.undo()
+
+        # Assert results.
+        self.assertListEqual([a, b, c], self.data.items)
+        self.assertEqual(2, c.value)
+        action.redo()
+        self.assertListEqual([c, b, a], self.data.items)
+        self.assertEqual(20, c.value)
+
+    def test_undo_redo_in_place(self):
+
+        # Set up test data.
+        self.data.tags.update({'a': 1, 'b': 2})
+        self.data.members.update({1, 2})
+        colour = self.data.gradient[0].colour
+        before = snapshot(self.data)
+        self.data.tags['a'] = 10
+        del self.data.tags['b']
+        self.data.tags['c'] = 3
+        self.data.members.discard(1)
+        self.data.members.add(5)
+        self.data.gradient[1].position = 0.5
+        colour.set_red(128)
+        action = Delta(self.data, diff(before, self.data))
+
+        # Start test.
+        action.undo()
+
+        # Assert results.
+        self.assertIn((UPDATE, ('members',), (1,), (5,)), action.ops)
+        self.assertDictEqual({'a': 1, 'b': 2}, self.data.tags)
+        self.assertSetEqual({1, 2}, self.data.members)
+        self.assertEqual(1.0, self.data.gradient[1].position)
+        self.assertEqual(QColor(0, 0, 0), self.data.gradient[0].colour)
+        action.redo()
+        self.assertDictEqual({'a': 10, 'c': 3}, self.data.tags)
+        self.assertSetEqual({2, 5}, self.data.members)
+        self.assertEqual(0.5, self.data.gradient[1].position)
+        self.assertEqual(128, self.data.gradient[0].colour.red())
+
+    def test_untrackable(self):
+
+        # Set up test data.
+        self.data.tags['lock'] = threading.Lock()
+
+        # Start test.
+        with self.assertRaises(TypeError):
+            snapshot(self.data)
+
+
+class RecordTestCase(TestCase):
+
+    def setUp(self):
+        self.app = Application.instance()
+        if self.app is None:
+            self.app = Application('mycompany', 'Test Application')
+        self.app.doc = Document(None, Content(), UpdateFlag)
+        self.app.action_manager = Manager()
+
+    def tearDown(self):
+        self.app.doc = None
+        self.app.action_manager = Manager()
+
+    def test_bumps_generations(self):
+
+        # Set up test data.
+        doc = self.app.doc
+        data = Data(items=[Item(str(i), i) for i in range(3)])
+        item = data.items[2]
+
+        # Start test.
+        with Delta.record(data):
+            data.items.insert(0, Item('new'))
+            item.value = 20
+            data.tags['a'] = 1
+        recorded = [doc.generation_of(item, 'value'), doc.generation_of(data, 'items'), doc.generation_of(data, 'tags')]
+        self.app.action_manager.undo()
+        undone = doc.generation_of(item, 'value')
+        self.app.action_manager.redo()
+
+        # Assert results.
+        self.assertLess(0, recorded[0])
+        self.assertListEqual([recorded[0]] * 3, recorded)
+        self.assertEqual(0, doc.generation_of(data, 'title'))
+        self.assertGreater(undone, recorded[0])
+        self.assertGreater(doc.generation_of(item, 'value'), undone)
+        self.assertEqual(doc.generation_of(item, 'value'), doc.generation_of(data, 'items'))
+        self.assertEqual(20, item.value)
@@ -0,0 +1,177 @@
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest import TestCase, skipUnless
+from unittest.mock import patch
+
+from PySide6.QtCore import QCoreApplication
+
+from applicationframework import inotify
+from applicationframework.application import Application
+from applicationframework.directorywatcher import DirectoryWatcher, FileChanges, INOTIFY, POLL
+
+# noinspection PyUnresolvedReferences
+from __feature__ import snake_case
+
+
+class DirectoryWatcherTestCase(TestCase):
+
+    def setUp(self):
+        self.app = Application.instance()
+        if self.app is None:
+            self.app = Application('mycompany', 'Test Application')
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.dir_path = Path(self.temp_dir.name)
+        self.dir_path.joinpath('existing.txt').write_text('foo')
+        self.events = []
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def start(self, backend: str, **kwargs) -> DirectoryWatcher:
+        watcher = DirectoryWatcher(
+            self.dir_path,
+            lambda paths: self.events.extend(('added', path) for path in paths),
+            lambda paths: self.events.extend(('removed', path) for path in paths),
+            lambda paths: self.events.extend(('modified', path) for path in paths),
+            backend=backend,
+            **kwargs,
+        )
+        watcher.poll_interval = 10
+        watcher.start()
+        time.sleep(0.2)
+        return watcher
+
+    def wait_for(self, event: tuple, timeout: float = 2.0):
+        end = time.monotonic() + timeout
+        while event not in self.events and time.monotonic() < end:
+            time.sleep(0.01)
+
+    def exercise(self, backend: str):
+
+        # Set up test data.
+        watcher = self.start(backend)
+        sub_dir_path = self.dir_path.joinpath('sub')
+        new_path = sub_dir_path.joinpath('new.txt')
+        existing_path = self.dir_path.joinpath('existing.txt')
+
+        # Start test.
+        try:
+            os.mkdir(sub_dir_path)
+            time.sleep(0.1)
+            new_path.write_text('foo')
+            self.wait_for(('added', new_path))
+            os.utime(existing_path, (0, 0))
+            self.wait_for(('modified', existing_path))
+            existing_path.unlink()
+            self.wait_for(('removed', existing_path))
+        finally:
+            watcher.stop()
+
+        # Assert results.
+        self.assertIn(('added', new_path), self.events)
+        self.assertIn(('modified', existing_path), self.events)
+        self.assertIn(('removed', existing_path), self.events)
+
+    @skipUnless(inotify.is_available(), 'inotify is not available')
+    def test_inotify(self):
+        self.exercise(INOTIFY)
+
+    def test_poll(self):
+        self.exercise(POLL)
+
+    @skipUnless(inotify.is_available(), 'inotify is not available')
+    def test_inotify_limit(self):
+
+        # Set up test data.
+        add_watch = inotify.Inotify.add_watch
+
+        def limited_add_watch(notifier: inotify.Inotify, path: str, mask: int) -> int:
+            if os.path.basename(path) == 'limit':
+                raise inotify.InotifyLimitError('Failed to watch: limit')
+            return add_watch(notifier, path, mask)
+
+        staging_path = Path(tempfile.mkdtemp(dir=self.temp_dir.name, prefix='.'))
+        for name in ('first', 'limit'):
+            os.mkdir(staging_path.joinpath(name))
+            staging_path.joinpath(name, f'{name}.txt').write_text('foo')
+        first_path = self.dir_path.joinpath('first', 'first.txt')
+        limit_path = self.dir_path.joinpath('limit', 'limit.txt')
+
+        # Start test.
+        with patch.object(inotify.Inotify, 'add_watch', limited_add_watch):
+            watcher = self.start(INOTIFY, exclude=('.*/',))
+            try:
+                os.rename(staging_path.joinpath('first'), self.dir_path.joinpath('first'))
+                os.rename(staging_path.joinpath('limit'), self.dir_path.joinpath('limit'))
+                self.wait_for(('added', first_path))
+                self.wait_for(('added', limit_path))
+            finally:
+                watcher.stop()
+
+        # Assert results.
+        self.assertIn(('added', first_path), self.events)
+        self.assertIn(('added', limit_path), self.events)
+
+    def test_debounced_signals(self):
+
+        # Set up test data.
+        received = []
+
+        def on_changed(changes: FileChanges):
+            received.append((changes, threading.current_thread()))
+
+        watcher = self.start(POLL, debounce=0.3)
+        watcher.changed.connect(on_changed)
+
+        # Start test.
+        try:
+            file_path = self.dir_path.joinpath('new.txt')
+            for i in range(5):
+                file_path.write_text(str(i))
+                time.sleep(0.05)
+            temp_path = self.dir_path.joinpath('temp.txt')
+            temp_path.write_text('foo')
+            time.sleep(0.05)
+            temp_path.unlink()
+            end = time.monotonic() + 2.0
+            while not received and time.monotonic() < end:
+                QCoreApplication.process_events()
+                time.sleep(0.01)
+        finally:
+            watcher.stop()
+
+        # Assert results.
+        self.assertEqual(1, len(received))
+        changes, thread = received[0]
+        self.assertListEqual([file_path], changes.added)
+        self.assertListEqual([], changes.removed)
+        self.assertListEqual([], changes.modified)
+        self.assertIs(threading.main_thread(), thread)
+
+    def test_verify_content(self):
+
+        # Set up test data.
+        watcher = self.start(POLL, verify_content=True)
+        file_path = self.dir_path.joinpath('new.txt')
+        file_path.write_text('foo')
+        self.wait_for(('added', file_path))
+        time.sleep(0.2)
+
+        # Start test.
+        try:
+            os.utime(file_path, (0, 0))
+            file_path.write_text('foo')
+            time.sleep(0.5)
+            touched_events = list(self.events)
+            file_path.write_text('bar')
+            self.wait_for(('modified', file_path))
+        finally:
+            watcher.stop()
+
+        # Assert results.
+        self.assertIn(('added', file_path), touched_events)
+        self.assertNotIn(('modified', file_path), touched_events)
+        self.assertIn(('modified', file_path), self.events)
@@ -0,0 +1,434 @@
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from enum import Flag, auto
+from unittest import TestCase
+from unittest.mock import patch
+
+from PySide6.QtCore import QEventLoop, QTimer
+
+from applicationframework import contentbase
+from applicationframework.application import Application
+from applicationframework.contentbase import ChunkedContentBase, ContentBase, Observable, ObservableContentBase, Progress
+from applicationframework.contentcache import ContentCache
+from applicationframework.document import Document
+from applicationframework.fileutils import UMASK, hash_bytes
+
+# noinspection PyUnresolvedReferences
+from __feature__ import snake_case
+
+
+class UpdateFlag(Flag):
+
+    FOO = auto()
+    BAR = auto()
+
+
+class Content(ContentBase):
+
+    def __init__(self):
+        self.value = None
+        self.thread = None
+
+    def load(self, file_path: str):
+        self.value = file_path
+
+    def save(self, file_path: str):
+        pass
+
+    def load_with_progress(self, file_path: str, progress: Progress):
+        self.thread = threading.current_thread()
+        for i in range(10):
+            time.sleep(0.01)
+            progress.report(i / 10)
+        self.load(file_path)
+
+
+class DocumentTestCase(TestCase):
+
+    def setUp(self):
+        self.app = Application.instance()
+        if self.app is None:
+            self.app = Application('mycompany', 'Test Application')
+        self.emitted = []
+        self.app.updated.connect(self.on_updated)
+
+    def tearDown(self):
+        self.app.updated.disconnect(self.on_updated)
+
+    def on_updated(self, doc: Document, flags: Flag):
+        self.emitted.append((doc, threading.current_thread()))
+
+    def wait(self, task):
+        loop = QEventLoop()
+        task.signals.finished.connect(loop.quit)
+        task.signals.cancelled.connect(loop.quit)
+        task.signals.failed.connect(loop.quit)
+        QTimer.single_shot(5000, loop.quit)
+        loop.exec()
+
+    def test_load_async(self):
+
+        # Set up test data.
+        doc = Document('foo', Content(), UpdateFlag)
+        progress = []
+
+        # Start test.
+        task = doc.load_async()
+        task.signals.progress.connect(progress.append)
+        self.wait(task)
+
+        # Assert results.
+        self.assertEqual('foo', doc.content.value)
+        self.assertIsNot(threading.main_thread(), doc.content.thread)
+        self.assertListEqual([(doc, threading.main_thread())], self.emitted)
+        self.assertFalse(doc.dirty)
+
+    def test_load_async_cancel(self):
+
+        # Set up test data.
+        doc = Document('foo', Content(), UpdateFlag)
+
+        # Start test.
+        task = doc.load_async()
+        task.cancel()
+        self.wait(task)
+
+        # Assert results.
+        self.assertIsNone(doc.content.value)
+        self.assertListEqual([], self.emitted)
+
+
+class FileContent(ContentBase):
+
+    def __init__(self):
+        self.text = ''
+        self.num_saves = 0
+
+    def load(self, file_path: str):
+        with open(file_path) as f:
+            self.text = f.read()
+
+    def save(self, file_path: str):
+        self.num_saves += 1
+        with open(file_path, 'w') as f:
+            f.write(self.text)
+
+    def content_hash(self) -> str | None:
+        return hash_bytes(self.text.encode())
+
+
+class ChunkedContent(ChunkedContentBase):
+
+    def __init__(self):
+        super().__init__()
+        self.sections = {'a': b'foo', 'b': b'bar'}
+
+    def dump_sections(self) -> dict[str, bytes]:
+        return dict(self.sections)
+
+    def load_sections(self, sections: dict[str, bytes]):
+        self.sections = sections
+
+
+class SaveTestCase(TestCase):
+
+    def setUp(self):
+        self.app = Application.instance()
+        if self.app is None:
+            self.app = Application('mycompany', 'Test Application')
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_skip_unchanged(self):
+
+        # Set up test data.
+        file_path = os.path.join(self.temp_dir.name, 'doc.txt')
+        doc = Document(file_path, FileContent(), UpdateFlag)
+        doc.content.text = 'foo'
+
+        # Start test.
+        doc.save()
+        doc.save()
+        doc.content.text = 'bar'
+        doc.save()
+
+        # Assert results.
+        self.assertEqual(2, doc.content.num_saves)
+        with open(file_path) as f:
+            self.assertEqual('bar', f.read())
+        self.assertListEqual(['doc.txt'], os.listdir(self.temp_dir.name))
+
+    def test_atomic_failure(self):
+
+        # Set up test data.
+        file_path = os.path.join(self.temp_dir.name, 'doc.txt')
+        doc = Document(file_path, FileContent(), UpdateFlag)
+        doc.content.text = 'foo'
+        doc.save()
+        doc.content.text = 'bar'
+        doc.content.save = lambda path: 1 / 0
+
+        # Start test.
+        with self.assertRaises(ZeroDivisionError):
+            doc.save()
+
+        # Assert results.
+        with open(file_path) as f:
+            self.assertEqual('foo', f.read())
+        self.assertListEqual(['doc.txt'], os.listdir(self.temp_dir.name))
+
+    def test_new_file_mode(self):
+
+        # Set up test data.
+        file_path = os.path.join(self.temp_dir.name, 'doc.txt')
+        doc = Document(file_path, FileContent(), UpdateFlag)
+
+        # Start test.
+        with patch('applicationframework.fileutils.os.umask') as umask:
+            doc.save()
+
+        # Assert results.
+        umask.assert_not_called()
+        self.assertEqual(0o666 & ~UMASK, os.stat(file_path).st_mode & 0o777)
+
+    def test_save_async_wait(self):
+
+        # Set up test data.
+        file_path = os.path.join(self.temp_dir.name, 'doc.txt')
+        doc = Document(file_path, FileContent(), UpdateFlag)
+        doc.content.text = 'foo'
+        failing_doc = Document(file_path, FileContent(), UpdateFlag)
+        failing_doc.content.text = 'bar'
+        failing_doc.content.save = lambda path: 1 / 0
+
+        # Start test.
+        saved = doc.save_async().wait()
+        failed = failing_doc.save_async().wait()
+
+        # Assert results.
+        self.assertTrue(saved)
+        self.assertFalse(failed)
+        with open(file_path) as f:
+            self.assertEqual('foo', f.read())
+
+    def test_chunked(self):
+
+        # Set up test data.
+        file_path = os.path.join(self.temp_dir.name, 'doc')
+        doc = Document(file_path, ChunkedContent(), UpdateFlag)
+        doc.save()
+        path_a = os.path.join(file_path, ChunkedContent.section_file_name('a', hash_bytes(b'foo')))
+        mtime_a = os.stat(path_a).st_mtime_ns
+
+        # Start test.
+        doc.content.sections['b'] = b'baz'
+        doc.save()
+
+        # Assert results.
+        self.assertEqual(mtime_a, os.stat(path_a).st_mtime_ns)
+        self.assertCountEqual(
+            [
+                ChunkedContent.manifest_name,
+                ChunkedContent.section_file_name('a', hash_bytes(b'foo')),
+                ChunkedContent.section_file_name('b', hash_bytes(b'baz')),
+            ],
+            os.listdir(file_path),
+        )
+        loaded = Document(file_path, ChunkedContent(), UpdateFlag)
+        loaded.content.sections = {}
+        loaded.content.load(file_path)
+        self.assertDictEqual({'a': b'foo', 'b': b'baz'}, loaded.content.sections)
+
+    def test_chunked_interrupted(self):
+
+        # Set up test data.
+        file_path = os.path.join(self.temp_dir.name, 'doc')
+        doc = Document(file_path, ChunkedContent(), UpdateFlag)
+        doc.save()
+        doc.content.sections['b'] = b'baz'
+        manifest_path = os.path.join(file_path, ChunkedContent.manifest_name)
+        original_atomic_write = contentbase.atomic_write
+
+        def atomic_write(path: str, data: bytes):
+            if path == manifest_path:
+                raise OSError('Interrupted')
+            original_atomic_write(path, data)
+
+        # Start test.
+        with patch.object(contentbase, 'atomic_write', atomic_write), self.assertRaises(OSError):
+            doc.save()
+
+        # Assert results.
+        loaded = ChunkedContent()
+        loaded.load(file_path)
+        self.assertDictEqual({'a': b'foo', 'b': b'bar'}, loaded.sections)
+
+    def test_chunked_corrupt(self):
+
+        # Set up test data.
+        file_path = os.path.join(self.temp_dir.name, 'doc')
+        doc = Document(file_path, ChunkedContent(), UpdateFlag)
+        doc.save()
+        with open(os.path.join(file_path, ChunkedContent.section_file_name('b', hash_bytes(b'bar'))), 'wb') as f:
+            f.write(b'ba')
+
+        # Start test.
+        with self.assertRaises(ValueError):
+            ChunkedContent().load(file_path)
+
+
+class CoalesceTestCase(TestCase):
+
+    def setUp(self):
+        self.app = Application.instance()
+        if self.app is None:
+            self.app = Application('mycompany', 'Test Application')
+        self.emitted = []
+        self.app.updated.connect(self.on_updated)
+
+    def tearDown(self):
+        self.app.updated.disconnect(self.on_updated)
+
+    def on_updated(self, doc: Document, flags: Flag):
+        self.emitted.append(flags)
+
+    def test_coalesce(self):
+
+        # Set up test data.
+        doc = Document(None, Content(), UpdateFlag, coalesce_updates=True)
+
+        # Start test.
+        doc.updated(UpdateFlag.FOO, dirty=False)
+        doc.updated(UpdateFlag.BAR)
+        doc.updated(UpdateFlag.FOO)
+
+        # Assert results.
+        self.assertListEqual([], self.emitted)
+        self.assertTrue(doc.dirty)
+        self.app.process_events()
+        self.assertListEqual([UpdateFlag.FOO | UpdateFlag.BAR], self.emitted)
+        self.app.process_events()
+        self.assertEqual(1, len(self.emitted))
+
+    def test_flush(self):
+
+        # Set up test data.
+        doc = Document(None, Content(), UpdateFlag, coalesce_updates=True)
+        doc.updated(UpdateFlag.FOO)
+
+        # Start test.
+        doc.flush()
+        self.app.process_events()
+
+        # Assert results.
+        self.assertListEqual([UpdateFlag.FOO], self.emitted)
+
+
+@dataclass
+class Item(Observable):
+
+    value: int = 0
+
+
+@dataclass
+class ObservableContent(ObservableContentBase):
+
+    name: str = ''
+    count: int = 0
+    item: Item = field(default_factory=Item)
+
+    field_flags = {
+        'name': UpdateFlag.FOO,
+        'value': UpdateFlag.BAR,
+    }
+
+    def load(self, file_path: str):
+        self.name = file_path
+
+    def save(self, file_path: str):
+        pass
+
+
+class ChangeTrackingTestCase(TestCase):
+
+    def setUp(self):
+        self.app = Application.instance()
+        if self.app is None:
+            self.app = Application('mycompany', 'Test Application')
+        self.emitted = []
+        self.app.updated.connect(self.on_updated)
+
+    def tearDown(self):
+        self.app.updated.disconnect(self.on_updated)
+
+    def on_updated(self, doc: Document, flags: Flag):
+        self.emitted.append((flags, doc.changes.fields()))
+
+    def test_changed_flags(self):
+
+        # Set up test data.
+        content = ObservableContent()
+        doc = Document(None, content, UpdateFlag)
+        content.track(content.item)
+
+        # Start test.
+        content.name = 'foo'
+        content.item.value = 1
+        content.count = content.count
+        doc.updated()
+        content.count = 2
+        doc.updated()
+
+        # Assert results.
+        self.assertListEqual(
+            [
+                (UpdateFlag.FOO | UpdateFlag.BAR, {'name', 'value'}),
+                (UpdateFlag.FOO | UpdateFlag.BAR, {'count'}),
+            ],
+            self.emitted,
+        )
+        self.assertSetEqual({'name', 'value', 'count'}, doc.unsaved_changes.fields())
+        self.assertSetEqual({'value'}, doc.unsaved_changes.fields(content.item))
+
+    def test_load_clears_changes(self):
+
+        # Set up test data.
+        content = ObservableContent()
+        doc = Document('foo', content, UpdateFlag)
+
+        # Start test.
+        doc.load()
+
+        # Assert results.
+        self.assertEqual('foo', content.name)
+        self.assertFalse(doc.dirty)
+        self.assertFalse(doc.unsaved_changes)
+        self.assertFalse(doc.changes)
+
+    def test_cache_hit_clears_changes(self):
+
+        # Set up test data.
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        file_path = os.path.join(temp_dir.name, 'doc.dat')
+        with open(file_path, 'w') as f:
+            f.write('foo')
+        self.app.content_cache = ContentCache(os.path.join(temp_dir.name, 'cache'))
+        self.addCleanup(setattr, self.app, 'content_cache', None)
+        Document(file_path, ObservableContent(), UpdateFlag).load()
+        content = ObservableContent()
+        doc = Document(file_path, content, UpdateFlag)
+
+        # Start test.
+        with patch.object(ObservableContent, 'load') as load:
+            doc.load()
+
+        # Assert results.
+        load.assert_not_called()
+        self.assertEqual(file_path, content.name)
+        self.assertFalse(doc.unsaved_changes)
@@ -0,0 +1,73 @@
+import os
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from applicationframework.hashcache import HashCache
+
+
+class HashCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.temp_dir.name, 'file.txt')
+        Path(self.file_path).write_text('foo')
+        self.cache = HashCache()
+
+    def tearDown(self):
+        self.cache.close()
+        self.temp_dir.cleanup()
+
+    def track(self):
+        for future in self.cache.track([self.file_path]):
+            future.result()
+
+    def test_verify_untracked(self):
+
+        # Start test.
+        changed = self.cache.verify([self.file_path])
+
+        # Assert results.
+        self.assertListEqual([self.file_path], changed)
+
+    def test_verify_unchanged(self):
+
+        # Set up test data.
+        self.track()
+
+        # Start test.
+        unchanged = self.cache.verify([self.file_path])
+        os.utime(self.file_path, (0, 0))
+        touched = self.cache.verify([self.file_path])
+
+        # Assert results.
+        self.assertListEqual([], unchanged)
+        self.assertListEqual([], touched)
+
+    def test_verify_edited(self):
+
+        # Set up test data.
+        self.track()
+
+        # Start test.
+        Path(self.file_path).write_text('bar')
+        os.utime(self.file_path, (1, 1))
+        edited = self.cache.verify([self.file_path])
+        Path(self.file_path).write_text('foobar')
+        resized = self.cache.verify([self.file_path])
+
+        # Assert results.
+        self.assertListEqual([self.file_path], edited)
+        self.assertListEqual([self.file_path], resized)
+
+    def test_forget(self):
+
+        # Set up test data.
+        self.track()
+
+        # Start test.
+        self.cache.forget([self.file_path])
+        forgotten = self.cache.verify([self.file_path])
+
+        # Assert results.
+        self.assertListEqual([self.file_path], forgotten)
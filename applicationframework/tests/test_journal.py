@@ -0,0 +1,161 @@
+from enum import Flag, auto
+from unittest import TestCase
+
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QColor
+
+from applicationframework.actions import Manager, SetAttribute, SetAttributes
+from applicationframework.application import Application
+from applicationframework.contentbase import ContentBase
+from applicationframework.document import Document
+from applicationframework.historymodel import HistoryModel
+from applicationframework.journal import Journal
+
+# noinspection PyUnresolvedReferences
+from __feature__ import snake_case
+
+
+class UpdateFlag(Flag):
+
+    FOO = auto()
+
+
+class Content(ContentBase):
+
+    def load(self, file_path: str):
+        pass
+
+    def save(self, file_path: str):
+        pass
+
+
+class Obj:
+
+    def __init__(self):
+        self.value = 0
+        self.colour = QColor(0, 0, 0)
+        self.children = []
+
+
+class JournalTestCase(TestCase):
+
+    def setUp(self):
+        self.app = Application.instance()
+        if self.app is None:
+            self.app = Application('mycompany', 'Test Application')
+        self.journal = Journal()
+
+    def tearDown(self):
+        self.journal.close()
+        self.app.doc = None
+        self.app.action_manager = Manager()
+
+    def test_round_trip(self):
+
+        # Set up test data.
+        obj = Obj()
+        action = SetAttributes('colour', QColor(255, 0, 0), obj)
+
+        # Start test.
+        entry = self.journal.write(action)
+        loaded = entry.load()
+
+        # Assert results.
+        self.assertIs(obj, loaded.objs[0])
+        self.assertEqual(QColor(255, 0, 0), loaded.value)
+        self.assertEqual(QColor(0, 0, 0), loaded.old_values[0])
+
+    def test_manager_spill(self):
+
+        # Set up test data.
+        obj = Obj()
+        manager = Manager(journal=self.journal, max_resident=2)
+        self.app.action_manager = manager
+        self.app.doc = Document(None, Content(), UpdateFlag)
+
+        # Start test.
+        for i in range(1, 6):
+            action = SetAttribute('value', i, obj)
+            manager.push(action)
+            action()
+
+        # Assert results.
+        self.assertListEqual([True, True, True, False, False], [a.spilled for a in manager.undos])
+        self.assertGreater(len(self.journal), 0)
+        manager.undo_to(0)
+        self.assertEqual(0, obj.value)
+        self.assertFalse(any(a.spilled for a in manager.redos))
+        manager.redo_to(5)
+        self.assertEqual(5, obj.value)
+
+    def test_spill_removed_object(self):
+
+        # Set up test data.
+        parent, child = Obj(), Obj()
+        parent.children = [child]
+        manager = Manager(journal=self.journal, max_resident=2)
+        self.app.action_manager = manager
+        self.app.doc = Document(None, Content(), UpdateFlag)
+        for action in (
+            SetAttribute('value', 5, child),
+            SetAttribute('children', [], parent),
+            SetAttribute('value', 1, parent),
+            SetAttribute('value', 2, parent),
+        ):
+            manager.push(action)
+            action()
+        del child
+
+        # Start test.
+        manager.undo_to(0)
+
+        # Assert results.
+        self.assertListEqual([0], [child.value for child in parent.children])
+
+    def test_spilled_name(self):
+
+        # Set up test data.
+        obj = Obj()
+        manager = Manager(journal=self.journal, max_resident=1)
+        self.app.action_manager = manager
+        self.app.doc = Document(None, Content(), UpdateFlag)
+        model = HistoryModel(manager)
+
+        # Start test.
+        for i in range(1, 3):
+            action = SetAttribute('value', i, obj)
+            manager.push(action)
+            action()
+
+        # Assert results.
+        self.assertTrue(manager.undos[0].spilled)
+        self.assertIs(SetAttribute, manager.undos[0].action_type())
+        self.assertEqual('SetAttribute', model.data(model.index(1), Qt.ItemDataRole.DisplayRole))
+
+    def test_reclaim(self):
+
+        # Set up test data.
+        obj = Obj()
+        manager = Manager(max_depth=4, journal=self.journal, max_resident=1)
+        self.app.action_manager = manager
+        self.app.doc = Document(None, Content(), UpdateFlag)
+        self.journal.compact_threshold = 0
+        self.journal.compact_ratio = 1.0
+
+        # Start test.
+        for i in range(1, 11):
+            action = SetAttribute('value', i, obj)
+            manager.push(action)
+            action()
+        evicted_len = len(self.journal)
+        evicted_live_bytes = self.journal.live_bytes()
+        manager.undo_to(1)
+        undone_len = len(self.journal)
+        undone_live_bytes = self.journal.live_bytes()
+        manager.undo_to(0)
+
+        # Assert results.
+        self.assertEqual(evicted_live_bytes, evicted_len)
+        self.assertEqual(undone_live_bytes, undone_len)
+        self.assertEqual(0, len(self.journal))
+        self.assertEqual(6, obj.value)
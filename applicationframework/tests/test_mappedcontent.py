@@ -0,0 +1,145 @@
+import array
+import os
+import tempfile
+from dataclasses import dataclass, field
+from unittest import TestCase
+from unittest.mock import patch
+
+from applicationframework.mappedcontent import MappedContentBase
+
+
+class Content(MappedContentBase):
+
+    mapped_fields = ('name', 'values', 'items')
+
+    def __init__(self):
+        super().__init__()
+        self.name = 'foo'
+        self.values = array.array('d', range(1000))
+        self.items = [1, 2, 3]
+
+
+@dataclass
+class DataContent(MappedContentBase):
+
+    mapped_fields = ('name', 'items')
+
+    name: str = 'default'
+    items: list = field(default_factory=list)
+
+
+class MappedContentTestCase(TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.temp_dir.name, 'content.bin')
+        Content().save(self.file_path)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def open(self, cls=Content) -> MappedContentBase:
+        content = cls()
+        content.load(self.file_path)
+        return content
+
+    def test_fields_materialised_on_access(self):
+
+        # Set up test data.
+        content = self.open()
+
+        # Start test.
+        is_loaded_before = content.is_loaded('values')
+        value = content.values[999]
+
+        # Assert results.
+        self.assertFalse(is_loaded_before)
+        self.assertEqual(999.0, value)
+        self.assertTrue(content.is_loaded('values'))
+        self.assertFalse(content.is_loaded('items'))
+        content.close()
+
+    def test_dataclass_fields(self):
+
+        # Set up test data.
+        DataContent(name='saved', items=[1, 2]).save(self.file_path)
+
+        # Start test.
+        content = self.open(DataContent)
+
+        # Assert results.
+        self.assertFalse(content.is_loaded('name'))
+        self.assertEqual('saved', content.name)
+        self.assertListEqual([1, 2], content.items)
+        self.assertEqual('default', DataContent().name)
+        content.close()
+
+    def test_save_appends_only_changed_fields(self):
+
+        # Set up test data.
+        content = self.open()
+        content.name = 'bar'
+        size = os.path.getsize(self.file_path)
+
+        # Start test.
+        content.save(self.file_path)
+        content.close()
+
+        # Assert results.
+        self.assertLess(os.path.getsize(self.file_path) - size, 1000)
+        content = self.open()
+        self.assertEqual('bar', content.name)
+        self.assertListEqual([1, 2, 3], content.items)
+        self.assertEqual(1000, len(content.values))
+        content.close()
+
+    def test_unchanged_save_is_skipped(self):
+
+        # Set up test data.
+        content = self.open()
+        content.items
+        mtime = os.stat(self.file_path).st_mtime_ns
+
+        # Start test.
+        content.save(self.file_path)
+
+        # Assert results.
+        self.assertEqual(mtime, os.stat(self.file_path).st_mtime_ns)
+        content.close()
+
+    def test_compaction(self):
+
+        # Set up test data.
+        content = self.open()
+
+        # Start test.
+        for i in range(3):
+            content.values.append(i)
+            content.save(self.file_path)
+        content.close()
+
+        # Assert results.
+        self.assertLess(os.path.getsize(self.file_path), 2 * 8 * 1003 + 1000)
+        content = self.open()
+        self.assertEqual(1003, len(content.values))
+        content.close()
+
+    def test_mapping_closed_before_replace(self):
+
+        # Set up test data.
+        content = self.open()
+        content.name
+        mapped = []
+
+        def replace(src, dst):
+            mapped.append(content._mmap is not None)
+            os.rename(src, dst)
+
+        # Start test.
+        with patch('applicationframework.fileutils.os.replace', replace):
+            content.save(os.path.join(self.temp_dir.name, 'other.bin'))
+
+        # Assert results.
+        self.assertListEqual([False], mapped)
+        self.assertEqual(1000, len(content.values))
+        content.close()
@@ -0,0 +1,59 @@
+import re
+from unittest import TestCase
+
+from applicationframework.pathfilter import PathFilter, compile_rules
+
+
+class PathFilterTestCase(TestCase):
+
+    def test_exclude(self):
+
+        # Start test.
+        path_filter = PathFilter(exclude=('.git/', '*.tmp', 'docs/build', re.compile(r'~$')))
+
+        # Assert results.
+        self.assertFalse(path_filter.accepts_dir('.git'))
+        self.assertFalse(path_filter.accepts_dir('sub/.git'))
+        self.assertTrue(path_filter.accepts_file('.git'))
+        self.assertFalse(path_filter.accepts_file('sub/foo.tmp'))
+        self.assertFalse(path_filter.accepts_dir('docs/build'))
+        self.assertTrue(path_filter.accepts_dir('src/docs/build'))
+        self.assertFalse(path_filter.accepts_file('foo.txt~'))
+        self.assertTrue(path_filter.accepts_file('foo.txt'))
+
+    def test_include(self):
+
+        # Start test.
+        path_filter = PathFilter(include=('*.png', 'assets/**/*.json', 're:^scripts/.*\\.py$'))
+
+        # Assert results.
+        self.assertTrue(path_filter.accepts_file('textures/foo.png'))
+        self.assertTrue(path_filter.accepts_file('assets/a/b/foo.json'))
+        self.assertTrue(path_filter.accepts_file('assets/foo.json'))
+        self.assertFalse(path_filter.accepts_file('foo.json'))
+        self.assertTrue(path_filter.accepts_file('scripts/foo.py'))
+        self.assertFalse(path_filter.accepts_file('foo.py'))
+        self.assertTrue(path_filter.accepts_dir('anything'))
+
+    def test_include_dir(self):
+
+        # Start test.
+        path_filter = PathFilter(include=('textures/', 'assets/models/'))
+
+        # Assert results.
+        self.assertTrue(path_filter.accepts_file('textures/foo.png'))
+        self.assertTrue(path_filter.accepts_file('sub/textures/a/foo.png'))
+        self.assertTrue(path_filter.accepts_file('assets/models/foo.obj'))
+        self.assertFalse(path_filter.accepts_file('sub/assets/models/foo.obj'))
+        self.assertFalse(path_filter.accepts_file('textures'))
+        self.assertFalse(path_filter.accepts_file('foo.png'))
+
+    def test_compiled_once(self):
+
+        # Start test.
+        rules = compile_rules(('*.png', 'foo/'))
+
+        # Assert results.
+        self.assertIs(rules, compile_rules(('*.png', 'foo/')))
+        self.assertIsNone(compile_rules(()))
+        self.assertFalse(PathFilter())
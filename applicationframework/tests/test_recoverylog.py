@@ -0,0 +1,184 @@
+import os
+import tempfile
+from dataclasses import dataclass
+from enum import Flag, auto
+from unittest import TestCase
+from unittest.mock import patch
+
+from applicationframework.actions import Manager, SetAttribute, SetAttributes
+from applicationframework.application import Application
+from applicationframework.contentbase import ContentBase
+from applicationframework.recoverylog import ContentIndex, RecoveryLog
+
+
+class UpdateFlag(Flag):
+
+    FOO = auto()
+    BAR = auto()
+
+
+@dataclass
+class Data:
+
+    value: int
+    name: str
+
+
+class Content(ContentBase):
+
+    def __init__(self):
+        self.data = [Data(0, 'zero'), Data(1, 'one')]
+
+    def load(self, file_path: str):
+        pass
+
+    def save(self, file_path: str):
+        pass
+
+
+class RecoveryLogTestCase(TestCase):
+
+    def setUp(self):
+        self.app = Application.instance()
+        if self.app is None:
+            self.app = Application('mycompany', 'Test Application')
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.log_path = RecoveryLog.get_log_path(os.path.join(self.temp_dir.name, 'doc.dat'))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_replay(self):
+
+        # Set up test data.
+        content = Content()
+        manager = Manager()
+        manager.recovery_log = RecoveryLog(self.log_path, content)
+        for action in (
+            SetAttribute('value', 10, content.data[0], flags=UpdateFlag.FOO),
+            SetAttributes('name', 'foo', *content.data, flags=UpdateFlag.BAR),
+            SetAttribute('value', 20, content.data[1], flags=UpdateFlag.FOO),
+        ):
+            manager.push(action)
+            action()
+        manager.undo_once()
+        manager.recovery_log.close()
+
+        # Start test.
+        new_content = Content()
+        new_manager = Manager()
+        flags = RecoveryLog.replay(self.log_path, new_content, new_manager)
+
+        # Assert results.
+        self.assertEqual(UpdateFlag.FOO | UpdateFlag.BAR, flags)
+        self.assertEqual(10, new_content.data[0].value)
+        self.assertEqual(1, new_content.data[1].value)
+        self.assertListEqual(['foo', 'foo'], [data.name for data in new_content.data])
+        self.assertEqual(2, len(new_manager.undos))
+        self.assertEqual(1, len(new_manager.redos))
+        self.assertIs(new_content.data[1], new_manager.redos[0].obj)
+
+    def test_replay_moved(self):
+
+        # Set up test data.
+        content = Content()
+        manager = Manager()
+        manager.recovery_log = RecoveryLog(self.log_path, content)
+        one = content.data[1]
+        action = SetAttribute('value', 10, one)
+        manager.push(action)
+        action()
+        action = SetAttribute('data', [Data(-1, 'new')] + content.data, content)
+        manager.push(action)
+        action()
+        action = SetAttribute('value', 99, one)
+        manager.push(action)
+        action()
+        manager.recovery_log.close()
+
+        # Start test.
+        new_content = Content()
+        RecoveryLog.replay(self.log_path, new_content, Manager())
+
+        # Assert results.
+        self.assertListEqual(['new', 'zero', 'one'], [data.name for data in new_content.data])
+        self.assertListEqual([-1, 0, 99], [data.value for data in new_content.data])
+
+    def test_edits_skip_walk(self):
+
+        # Set up test data.
+        content = Content()
+        content.data = [Data(i, str(i)) for i in range(100)]
+        manager = Manager()
+        manager.recovery_log = RecoveryLog(self.log_path, content)
+        items = list(content.data)
+
+        # Start test.
+        with patch.object(ContentIndex, '_walk', autospec=True, side_effect=ContentIndex._walk) as walk:
+            for i, item in enumerate(items[:50]):
+                action = SetAttribute('value', -i, item)
+                manager.push(action)
+                action()
+            action = SetAttribute('data', [Data(-1, 'new')] + content.data, content)
+            manager.push(action)
+            action()
+            for item in items:
+                action = SetAttribute('value', 1, item)
+                manager.push(action)
+                action()
+        manager.recovery_log.close()
+
+        # Assert results.
+        self.assertEqual(0, walk.call_count)
+        new_content = Content()
+        new_content.data = [Data(i, str(i)) for i in range(100)]
+        RecoveryLog.replay(self.log_path, new_content, Manager())
+        self.assertListEqual([-1] + [1] * 100, [data.value for data in new_content.data])
+
+    def test_unreachable_discards_log(self):
+
+        # Set up test data.
+        content = Content()
+        manager = Manager()
+        manager.recovery_log = RecoveryLog(self.log_path, content)
+        action = SetAttribute('value', 10, content.data[0])
+        manager.push(action)
+        action()
+        detached = Data(0, 'detached')
+
+        # Start test.
+        with self.assertLogs('applicationframework.recoverylog', 'ERROR'):
+            action = SetAttribute('value', 1, detached)
+            manager.push(action)
+            action()
+        manager.undo_once()
+        discarded = os.path.exists(self.log_path)
+        manager.recovery_log.clear()
+        action = SetAttribute('value', 20, content.data[1])
+        manager.push(action)
+        action()
+        manager.recovery_log.close()
+
+        # Assert results.
+        self.assertFalse(discarded)
+        new_content = Content()
+        RecoveryLog.replay(self.log_path, new_content, Manager())
+        self.assertListEqual([0, 20], [data.value for data in new_content.data])
+
+    def test_truncated(self):
+
+        # Set up test data.
+        content = Content()
+        log = RecoveryLog(self.log_path, content)
+        log.record('push', SetAttribute('value', 10, content.data[0]))
+        log.record('push', SetAttribute('value', 20, content.data[0]))
+        log.close()
+        with open(self.log_path, 'r+b') as f:
+            f.truncate(os.path.getsize(self.log_path) - 1)
+
+        # Start test.
+        records = list(RecoveryLog.read(self.log_path, Content()))
+
+        # Assert results.
+        self.assertEqual(1, len(records))
+        self.assertEqual(10, records[0][1].value)
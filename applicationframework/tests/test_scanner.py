@@ -0,0 +1,77 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from applicationframework.pathfilter import PathFilter
+from applicationframework.scanner import Scanner
+
+
+class ScannerTestCase(TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = self.temp_dir.name
+        os.makedirs(os.path.join(self.root, 'sub', 'deep'))
+        for file_path in ('a.txt', 'b.txt', os.path.join('sub', 'c.txt'), os.path.join('sub', 'deep', 'd.txt')):
+            self.write(file_path)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def path(self, file_path: str) -> str:
+        return os.path.join(self.root, file_path)
+
+    def write(self, file_path: str):
+        with open(self.path(file_path), 'w') as f:
+            f.write('foo')
+
+    def test_initial_scan(self):
+        scanner = Scanner(self.root)
+        added, removed, modified = scanner.scan()
+        self.assertEqual(4, len(added))
+        self.assertEqual(4, len(scanner))
+        self.assertListEqual([], removed)
+        self.assertListEqual([], modified)
+
+    def test_changes(self):
+
+        # Set up test data.
+        scanner = Scanner(self.root)
+        scanner.scan()
+
+        # Start test.
+        self.write('e.txt')
+        os.remove(self.path('b.txt'))
+        os.utime(self.path(os.path.join('sub', 'c.txt')), (0, 0))
+        shutil.rmtree(self.path(os.path.join('sub', 'deep')))
+        added, removed, modified = scanner.scan()
+
+        # Assert results.
+        self.assertListEqual([self.path('e.txt')], added)
+        self.assertCountEqual([self.path('b.txt'), self.path(os.path.join('sub', 'deep', 'd.txt'))], removed)
+        self.assertListEqual([self.path(os.path.join('sub', 'c.txt'))], modified)
+        self.assertEqual(([], [], []), scanner.scan())
+
+    def test_unchanged_directory_not_listed(self):
+
+        # Set up test data.
+        scanner = Scanner(self.root, stat_files=False)
+        scanner.racy_window = 0
+        scanner.scan()
+        os.utime(self.path('a.txt'), (0, 0))
+
+        # Assert results.
+        self.assertEqual(([], [], []), scanner.scan())
+
+    def test_path_filter(self):
+
+        # Set up test data.
+        scanner = Scanner(self.root, path_filter=PathFilter(exclude=('deep/', 'b.*')))
+
+        # Start test.
+        added, removed, modified = scanner.scan()
+
+        # Assert results.
+        self.assertCountEqual([self.path('a.txt'), self.path(os.path.join('sub', 'c.txt'))], added)
+        self.assertNotIn(self.path(os.path.join('sub', 'deep')), scanner._dirs)
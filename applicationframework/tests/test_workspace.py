@@ -0,0 +1,150 @@
+from enum import Flag, auto
+from unittest import TestCase
+
+from applicationframework.actions import Manager, SetAttribute
+from applicationframework.application import Application
+from applicationframework.contentbase import ContentBase
+from applicationframework.document import Document
+from applicationframework.mainwindow import MainWindow
+from applicationframework.workspace import Workspace
+
+# noinspection PyUnresolvedReferences
+from __feature__ import snake_case
+
+
+class UpdateFlag(Flag):
+
+    FOO = auto()
+
+
+class Obj:
+
+    def __init__(self):
+        self.value = 0
+
+
+class Content(ContentBase):
+
+    def __init__(self):
+        self.obj = Obj()
+
+    def load(self, file_path: str):
+        pass
+
+    def save(self, file_path: str):
+        pass
+
+    def memory_usage(self) -> int:
+        return 100
+
+
+class UnsizedContent(ContentBase):
+
+    def __init__(self):
+        self.data = [Obj() for _ in range(1000)]
+
+    def load(self, file_path: str):
+        pass
+
+    def save(self, file_path: str):
+        pass
+
+
+class Window(MainWindow):
+
+    def create_document(self, file_path: str = None, **kwargs) -> Document:
+        return Document(file_path, Content(), UpdateFlag)
+
+
+class WorkspaceTestCase(TestCase):
+
+    def setUp(self):
+        self.app = Application.instance()
+        if self.app is None:
+            self.app = Application('mycompany', 'Test Application')
+        self.old_doc = self.app.doc
+        self.old_manager = self.app.action_manager
+
+    def tearDown(self):
+        self.app.doc = self.old_doc
+        self.app.action_manager = self.old_manager
+
+    def test_activate(self):
+
+        # Set up test data.
+        workspace = Workspace()
+        doc1 = workspace.add(Document('foo', Content(), UpdateFlag))
+        doc2 = workspace.add(Document('bar', Content(), UpdateFlag))
+
+        # Start test.
+        self.assertIs(doc2, self.app.doc)
+        workspace.activate(doc1)
+
+        # Assert results.
+        self.assertIs(doc1, self.app.doc)
+        self.assertIs(workspace.manager_for(doc1), self.app.action_manager)
+        self.assertIsNot(workspace.manager_for(doc1), workspace.manager_for(doc2))
+        self.assertListEqual([doc2, doc1], workspace.documents)
+
+    def test_page_out_and_in(self):
+
+        # Set up test data.
+        workspace = Workspace(max_resident=1)
+        doc1 = workspace.add(Document('foo', Content(), UpdateFlag))
+        self.app.action_manager.execute(SetAttribute('value', 1, doc1.content.obj))
+        doc2 = workspace.add(Document('bar', Content(), UpdateFlag))
+        workspace.add(Document('baz', Content(), UpdateFlag))
+
+        # Start test.
+        self.assertTrue(workspace.is_paged(doc1))
+        self.assertFalse(workspace.is_paged(doc2))
+        self.assertIsNone(doc1.content)
+        workspace.activate(doc1)
+
+        # Assert results.
+        self.assertFalse(workspace.is_paged(doc1))
+        self.assertTrue(workspace.is_paged(doc2))
+        self.assertEqual(1, doc1.content.obj.value)
+        self.app.action_manager.undo()
+        self.assertEqual(0, doc1.content.obj.value)
+
+    def test_max_bytes(self):
+
+        # Set up test data.
+        workspace = Workspace(max_bytes=150, manager_factory=lambda: Manager(max_depth=10))
+        doc1 = workspace.add(Document('foo', Content(), UpdateFlag))
+        doc2 = workspace.add(Document('bar', Content(), UpdateFlag))
+
+        # Assert results.
+        self.assertTrue(workspace.is_paged(doc1))
+        self.assertFalse(workspace.is_paged(doc2))
+        self.assertEqual(10, workspace.manager_for(doc1).max_depth)
+
+    def test_max_bytes_measured(self):
+
+        # Set up test data.
+        workspace = Workspace(max_bytes=10000)
+        doc1 = workspace.add(Document('foo', UnsizedContent(), UpdateFlag))
+        doc2 = workspace.add(Document('bar', Content(), UpdateFlag))
+
+        # Assert results.
+        self.assertTrue(workspace.is_paged(doc1))
+        self.assertFalse(workspace.is_paged(doc2))
+
+    def test_window_undo(self):
+
+        # Set up test data.
+        window = Window()
+        self.addCleanup(window.delete_later)
+        workspace = Workspace()
+        doc1 = workspace.add(Document('foo', Content(), UpdateFlag))
+        self.app.action_manager.execute(SetAttribute('value', 1, doc1.content.obj))
+        doc2 = workspace.add(Document('bar', Content(), UpdateFlag))
+        self.app.action_manager.execute(SetAttribute('value', 2, doc2.content.obj))
+
+        # Start test.
+        window.undo_action.trigger()
+
+        # Assert results.
+        self.assertEqual(1, doc1.content.obj.value)
+        self.assertEqual(0, doc2.content.obj.value)
@@ -0,0 +1,185 @@
+import io
+import logging
+import pickle
+import tempfile
+import zlib
+from collections import OrderedDict
+from typing import Callable
+
+from applicationframework.actions import Manager
+from applicationframework.document import Document
+from applicationframework.handles import Pickler, sizeof
+from applicationframework.mixins import HasAppMixin
+
+
+logger = logging.getLogger(__name__)
+
+
+class _Entry:
+
+    __slots__ = ('doc', 'manager', 'page', 'content_size', 'measured_generation')
+
+    def __init__(self, doc: Document, manager: Manager):
+        self.doc = doc
+        self.manager = manager
+        self.page = None
+        self.content_size = 0
+        self.measured_generation = None
+
+
+class Workspace(HasAppMixin):
+
+    """
+    Keeps several documents open, each with its own undo manager. Activating a
+    document makes it and its manager the application's doc and
+    action_manager.
+
+    Inactive documents beyond max_resident, or beyond max_bytes of estimated
+    memory, are paged out least recently used first. Their content and undo
+    history are pickled together, so actions keep editing the same objects,
+    and compressed to an anonymous temporary file. They are restored when
+    activated again. Content memory is estimated by ContentBase.memory_usage()
+    or, failing that, by measuring the content, which is only repeated once
+    the document's generation has moved on.
+
+    """
+
+    def __init__(
+        self,
+        max_resident: int | None = None,
+        max_bytes: int | None = None,
+        manager_factory: Callable[[], Manager] = Manager,
+    ):
+        self.max_resident = max_resident
+        self.max_bytes = max_bytes
+        self.manager_factory = manager_factory
+        self._entries: OrderedDict[int, _Entry] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, doc: Document) -> bool:
+        return id(doc) in self._entries
+
+    @property
+    def documents(self) -> list[Document]:
+        """Return the open documents, most recently active last."""
+        return [entry.doc for entry in self._entries.values()]
+
+    @property
+    def active(self) -> Document | None:
+        doc = getattr(self.app(), 'doc', None)
+        return doc if doc in self else None
+
+    def manager_for(self, doc: Document) -> Manager:
+        return self._entries[id(doc)].manager
+
+    def is_paged(self, doc: Document) -> bool:
+        return self._entries[id(doc)].page is not None
+
+    def add(self, doc: Document, manager: Manager | None = None, activate: bool = True) -> Document:
+        if doc not in self:
+            self._entries[id(doc)] = _Entry(doc, manager or self.manager_factory())
+        if activate:
+            self.activate(doc)
+        else:
+            self._enforce_budget()
+        return doc
+
+    def remove(self, doc: Document):
+        entry = self._entries.pop(id(doc))
+        if entry.page is not None:
+            entry.page.close()
+        if self.app().doc is doc:
+            self.app().doc = None
+            self.app().action_manager = self.manager_factory()
+
+    def activate(self, doc: Document):
+        entry = self._entries[id(doc)]
+        self._entries.move_to_end(id(doc))
+        if entry.page is not None:
+            self.page_in(doc)
+        app = self.app()
+        if app.doc is doc:
+            return
+        app.doc = doc
+        app.action_manager = entry.manager
+        self._enforce_budget()
+        doc.updated(doc.default_flags, dirty=False)
+
+    def _estimate(self, entry: _Entry) -> int:
+        if entry.page is not None:
+            return 0
+        size = entry.doc.content.memory_usage()
+        if size is None:
+            if entry.measured_generation != entry.doc.generation:
+                entry.content_size = sizeof(entry.doc.content, include_shared=True)
+                entry.measured_generation = entry.doc.generation
+            size = entry.content_size
+        return size + entry.manager.memory_usage()
+
+    def memory_usage(self) -> int:
+        """Return the estimated number of bytes held by resident documents."""
+        return sum(self._estimate(entry) for entry in self._entries.values())
+
+    def _enforce_budget(self):
+        active = self.active
+        resident = [entry for entry in self._entries.values() if entry.page is None and entry.doc is not active]
+        num_page = 0
+        if self.max_resident is not None:
+            num_page = max(0, len(resident) - self.max_resident)
+        if self.max_bytes is not None:
+            usage = self.memory_usage()
+            for entry in resident[:num_page]:
+                usage -= self._estimate(entry)
+            while usage > self.max_bytes and num_page < len(resident):
+                usage -= self._estimate(resident[num_page])
+                num_page += 1
+        for entry in resident[:num_page]:
+            self.page_out(entry.doc)
+
+    def page_out(self, doc: Document):
+        entry = self._entries[id(doc)]
+        if entry.page is not None:
+            return
+        if doc is self.active:
+            raise ValueError('Cannot page out the active document')
+        manager = entry.manager
+        if manager.in_transaction():
+            logger.warning(f'Not paging out document in a transaction: {doc.title}')
+            return
+        doc.flush()
+
+        # Actions spilled to a journal are brought back so the whole history
+        # is pickled against the same content objects.
+        buffer = io.BytesIO()
+        try:
+            Pickler(buffer, protocol=pickle.HIGHEST_PROTOCOL).dump(
+                (doc.content, [action.load() for action in manager.undos], manager.redos)
+            )
+        except Exception as e:
+            logger.error(f'Failed to page out document: {doc.title} error: {e}')
+            return
+        data = zlib.compress(buffer.getvalue())
+        entry.page = tempfile.TemporaryFile()
+        entry.page.write(data)
+        logger.debug(f'Paged out document: {doc.title} bytes: {len(data)}')
+
+        doc.content = None
+        manager.take_history()
+
+    def page_in(self, doc: Document):
+        entry = self._entries[id(doc)]
+        if entry.page is None:
+            return
+        entry.page.seek(0)
+        content, undos, redos = pickle.loads(zlib.decompress(entry.page.read()))
+        entry.page.close()
+        entry.page = None
+        logger.debug(f'Paged in document: {doc.title}')
+
+        doc.content = content
+        entry.manager.restore_history(undos, redos)
+
+        # Objects have new identities so caches keyed on the old ones are stale.
+        doc.bump()
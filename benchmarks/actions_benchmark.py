@@ -0,0 +1,68 @@
+"""
+Reports memory per action and push / undo / redo throughput for per-object
+SetAttribute actions versus a single columnar SetAttributes action.
+
+Usage: python benchmarks/actions_benchmark.py [num_objects ...]
+
+"""
+import gc
+import sys
+import time
+import tracemalloc
+
+from applicationframework.actions import Composite, Manager, SetAttribute, SetAttributes
+
+
+DEFAULT_SIZES = (1_000, 100_000, 1_000_000)
+
+
+class Obj:
+
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+
+def measure(build, num_objs: int):
+    objs = [Obj() for _ in range(num_objs)]
+    gc.collect()
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    action = build(objs)
+    num_bytes = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+
+    manager = Manager()
+    timings = {}
+    t = time.perf_counter()
+    manager.push(action)
+    action()
+    timings['push'] = time.perf_counter() - t
+    t = time.perf_counter()
+    manager.undo_once()
+    timings['undo'] = time.perf_counter() - t
+    t = time.perf_counter()
+    manager.redo_once()
+    timings['redo'] = time.perf_counter() - t
+    return num_bytes, timings
+
+
+def main(sizes):
+    builds = {
+        'SetAttribute x N': lambda objs: Composite([SetAttribute('value', 1, obj) for obj in objs]),
+        'SetAttributes': lambda objs: SetAttributes('value', 1, *objs),
+    }
+    print(f'{"objects":>10} {"action":<18} {"bytes/obj":>10} {"push/s":>12} {"undo/s":>12} {"redo/s":>12}')
+    for num_objs in sizes:
+        for name, build in builds.items():
+            num_bytes, timings = measure(build, num_objs)
+            rates = [num_objs / max(timings[key], 1e-9) for key in ('push', 'undo', 'redo')]
+            print(
+                f'{num_objs:>10} {name:<18} {num_bytes / num_objs:>10.1f} '
+                f'{rates[0]:>12.0f} {rates[1]:>12.0f} {rates[2]:>12.0f}'
+            )
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
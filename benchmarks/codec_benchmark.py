@@ -0,0 +1,110 @@
+"""
+Reports encode / decode time and encoded size of the generated binary codec
+versus JSON and pickle for documents with the given number of fields.
+
+Usage: python benchmarks/codec_benchmark.py [num_fields ...]
+
+"""
+import io
+import json
+import pickle
+import sys
+import time
+from dataclasses import dataclass, field
+from enum import Enum
+
+from PySide6.QtGui import QColor
+
+from applicationframework.codec import get_codec
+from applicationframework.handles import Pickler
+
+# noinspection PyUnresolvedReferences
+from __feature__ import snake_case
+
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+
+
+class Kind(Enum):
+
+    FOO = 'foo'
+    BAR = 'bar'
+
+
+@dataclass
+class Item:
+
+    flag: bool
+    count: int
+    weight: float
+    name: str
+    kind: Kind
+    colour: QColor
+    values: list[float]
+
+
+FIELDS_PER_ITEM = 7
+
+
+@dataclass
+class Document:
+
+    items: list[Item] = field(default_factory=list)
+
+
+def build(num_fields: int) -> Document:
+    return Document([
+        Item(i % 2 == 0, i, i * 0.5, f'item {i}', Kind.FOO, QColor(i % 256, 0, 0), [0.0, 1.0])
+        for i in range(num_fields // FIELDS_PER_ITEM)
+    ])
+
+
+def to_json(doc: Document) -> bytes:
+
+    # Not asdict() as deep copying a QColor crashes.
+    return json.dumps([
+        {**vars(item), 'kind': item.kind.name, 'colour': item.colour.rgba()}
+        for item in doc.items
+    ]).encode()
+
+
+def from_json(data: bytes) -> Document:
+    items = []
+    for values in json.loads(data):
+        values['kind'] = Kind[values['kind']]
+        values['colour'] = QColor.from_rgba(values['colour'])
+        items.append(Item(**values))
+    return Document(items)
+
+
+def to_pickle(doc: Document) -> bytes:
+    buffer = io.BytesIO()
+    Pickler(buffer, protocol=pickle.HIGHEST_PROTOCOL).dump(doc)
+    return buffer.getvalue()
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main(sizes):
+    codec = get_codec(Document)
+    formats = {
+        'codec': (codec.encode, codec.decode),
+        'codec zlib': (lambda doc: codec.encode(doc, 'zlib'), codec.decode),
+        'json': (to_json, from_json),
+        'pickle': (to_pickle, pickle.loads),
+    }
+    print(f'{"fields":>10} {"format":<12} {"bytes":>12} {"encode s":>10} {"decode s":>10}')
+    for num_fields in sizes:
+        doc = build(num_fields)
+        for name, (encode, decode) in formats.items():
+            data, encode_time = timed(encode, doc)
+            _, decode_time = timed(decode, data)
+            print(f'{num_fields:>10} {name:<12} {len(data):>12} {encode_time:>10.3f} {decode_time:>10.3f}')
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,76 @@
+"""
+Reports memory held and time per scan of the incremental Scanner versus the
+previous full walk that built a {Path: mtime} dict, for trees of the given
+numbers of files. Trees are generated in a temporary directory with 1000
+files per directory.
+
+Usage: python benchmarks/scanner_benchmark.py [num_files ...]
+
+"""
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from applicationframework.scanner import Scanner
+
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+FILES_PER_DIR = 1000
+
+
+def make_tree(root: str, num_files: int):
+    for i in range(num_files):
+        dir_path = os.path.join(root, f'dir{i // FILES_PER_DIR // 10}', f'sub{i // FILES_PER_DIR}')
+        if i % FILES_PER_DIR == 0:
+            os.makedirs(dir_path, exist_ok=True)
+        open(os.path.join(dir_path, f'file{i}.txt'), 'wb').close()
+
+
+def walk(root: str) -> dict:
+    file_dict = {}
+    for dir_path, dir_names, file_names in os.walk(root):
+        for file_name in file_names:
+            file_path = Path(dir_path).joinpath(file_name)
+            file_dict[file_path] = os.path.getmtime(file_path)
+    return file_dict
+
+
+def measure(build, scan):
+    gc.collect()
+    tracemalloc.start()
+    state = build()
+    num_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    start = time.perf_counter()
+    scan(state)
+    return num_bytes, time.perf_counter() - start
+
+
+def main(sizes):
+    print(f'{"files":>10} {"engine":<22} {"MB held":>10} {"scan s":>10}')
+    for num_files in sizes:
+        with tempfile.TemporaryDirectory() as root:
+            make_tree(root, num_files)
+
+            def build_scanner(stat_files: bool) -> Scanner:
+                scanner = Scanner(root, stat_files=stat_files)
+                scanner.racy_window = 0
+                scanner.scan()
+                return scanner
+
+            engines = {
+                'os.walk + Path dict': (lambda: walk(root), lambda state: walk(root)),
+                'Scanner': (lambda: build_scanner(True), Scanner.scan),
+                'Scanner (no file stat)': (lambda: build_scanner(False), Scanner.scan),
+            }
+            for name, (build, scan) in engines.items():
+                num_bytes, duration = measure(build, scan)
+                print(f'{num_files:>10} {name:<22} {num_bytes / 1e6:>10.1f} {duration:>10.3f}')
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
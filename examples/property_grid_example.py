@@ -137,9 +137,7 @@ class MainWindow(MainWindowBase):
         logger.debug(f'on_data_changed: {index}')
         prop = index.internal_pointer()
         action = SetAttributes(prop.name(), prop.value(), *prop.object())
-        self.app().action_manager.push(action)
-        action()
-        self.app().doc.updated()
+        self.app().action_manager.execute(action)
 
     def on_data_changing(self, index: QModelIndex):
         logger.debug(f'on_data_changed: {index}')
@@ -161,9 +161,7 @@ class MainWindow(MainWindowBase):
     def on_data_changed(self, index: QModelIndex):
         prop = index.internal_pointer()
         action = SetAttributes(prop.name(), prop.value(), prop.object())
-        self.app().action_manager.push(action)
-        action()
-        self.app().doc.updated()
+        self.app().action_manager.execute(action)
 
 
 if __name__ == '__main__':
@@ -21,6 +21,9 @@ class FilePathQImage:
     def __deepcopy__(self, memodict: dict = None):
         return self.__class__(self.file_path)
 
+    def __reduce__(self):
+        return self.__class__, (self.file_path,)
+
     @property
     def file_path(self):
         return self._file_path